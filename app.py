@@ -1,18 +1,38 @@
 import numpy as np
 import pandas as pd
 import re
+import time
+import uuid
+from functools import lru_cache
 from urllib.parse import quote
 import dash
 import dash_bootstrap_components as dbc
-from dash import dcc, html, dash_table
-from dash.dependencies import Input, Output, State
+from dash import dcc, html, DiskcacheManager, ClientsideFunction
+from dash.dependencies import Input, Output, State, MATCH
 from dash.exceptions import PreventUpdate
+from flask import Response, abort, g, jsonify, request
 
 from helpers import (create_dropdown, read_uploaded_data, parse_contents,
-                     make_predictions, text_intro, plotly_sales_by_category,
-                     plotly_sales_over_outlet, plotly_visibility_vs_sales, plot_visibility_boxplot)
-
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP, 'styles.css'], suppress_callback_exceptions=True)
+                     make_predictions, text_intro, enrich_outlet_attributes, predict_single, client_model_digest,
+                     warm_up_model, item_identifier_index, upload_store, table_page, make_paged_table,
+                     DOWNLOAD_FORMATS, iter_download, parquet_available,
+                     open_disk_cache, score_in_shards, ShardPool, model_registry, metrics, instrument_callback,
+                     sweep_predictions, plotly_sweep, SWEEP_MRP_RANGE, SWEEP_VISIBILITY_RANGE,
+                     compare_models, MODELS, validate_upload, validation_summary, describe_validation_errors,
+                     partial_sales_aggregates, batch_store, batch_status, batch_predictions, batch_predictions_head,
+                     batch_validation_errors, prediction_output, predict_records, API_MAX_RECORDS, USER_COLUMNS,
+                     batch_figure_keys, figure_cache)
+
+# Gerenciador dos callbacks em segundo plano (jobs executados fora do worker que atende as requisições)
+background_callback_manager = DiskcacheManager(open_disk_cache('jobs'))
+
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP, 'styles.css'], suppress_callback_exceptions=True,
+                background_callback_manager=background_callback_manager)
+
+# Carrega o modelo e os dados de referência uma única vez na inicialização do processo
+# (com o gunicorn em modo preload, antes do fork dos workers)
+warm_up_model()
+item_identifier_index.refresh()
 
 # Define um estilo específico para a guia "Sobre Este Web App"
 sobre_style = {
@@ -40,7 +60,8 @@ logo_empresa = html.Div([
     ),
 ], style={"margin": "0 0 10px", "overflow": "hidden"})
 
-# Conteúdo para a página inicial "Sobre Este App"
+# Conteúdo para a página inicial "Sobre Este App" (montado no primeiro acesso e reaproveitado)
+@lru_cache(maxsize=None)
 def get_inicio_content():
     return html.Div([
         logo_empresa,
@@ -53,9 +74,6 @@ def get_inicio_content():
     ], style=sobre_style)  # Aplica o estilo personalizado
 
 
-inicio_content = get_inicio_content()
-
-
 # Define um estilo com fundo branco e margem lateral configurada para a guia Dashboard
 pagina_style = {
     "background-color": "white",
@@ -66,7 +84,8 @@ pagina_style = {
     "padding": "20px"  # Adiciona espaço interno na página
 }
 
-# Conteúdo para a página "Dash Board De Previsões"
+# Conteúdo para a página "Dash Board De Previsões" (montado no primeiro acesso e reaproveitado)
+@lru_cache(maxsize=None)
 def get_previsoes_content():
     return html.Div([
         html.Div(style={'margin-top': '8px'}),  # Espaço adicional        
@@ -82,66 +101,79 @@ def get_previsoes_content():
         ]),
 
         # Aqui, estamos criando um conteiner com o id="tabs-content", 
-        # que será preenchido via callback com o conteúdo adequado de acordo 
-        # com a guia (tab) selecionada.
-        html.Div(id='tabs-content')
+        # que já contém o conteúdo de todas as guias; um callback clientside
+        # exibe apenas o da guia (tab) selecionada.
+        html.Div([
+            html.Div(get_tab_content('tab-1'), id='tab-1-content'),
+            html.Div(get_tab_content('tab-2'), id='tab-2-content', style={'display': 'none'}),
+        ], id='tabs-content')
 
         # Adicionar mais conteúdo conforme necessário
     ], style={**pagina_style, "margin-top": "10px"})
 
-previsoes_content = get_previsoes_content()
 
 
+def serve_layout():
+    return html.Div([
+        dcc.Location(id='url', refresh=False),  # Objeto para controlar a URL do aplicativo
+
+        # Identificador da sessão do navegador (chave dos uploads armazenados no servidor)
+        dcc.Store(id='session-id', data=str(uuid.uuid4()), storage_type='session'),
+
+        # Barra de navegação com melhor posicionamento
+        dbc.Navbar(
+            [
+                # Logotipo à esquerda
+                html.A(
+                    html.Img(
+                        src="https://raw.githubusercontent.com/wanderson42/Portfolio-DS/main/datasets/Big_Mart_Sales/turing_logo.png",
+                        height="50px",  # Ajusta o tamanho do logotipo
+                        style={"margin-right": "20px"}  # Espaçamento entre o logotipo e as guias
+                    ),
+                    href="/",
+                    style={"display": "flex", "align-items": "center"}
+                ),
+                # Itens de navegação centralizados
+                dbc.Nav(
+                    [
+                        dbc.NavItem(dbc.NavLink("Sobre Este App", href="/", id="nav_inicio")),
+                        dbc.NavItem(dbc.NavLink("DashBoard De Previsões", href="/predictions", id="nav_previsoes")),
+                    ],
+                    pills=True,
+                    style={"margin-left": "auto", "display": "flex", "align-items": "center"}  # Centraliza guias
+                ),
+            ],
+            color="white",
+            dark=False,
+            style={
+                "height": "70px",
+                "padding": "10px 30px",  # Ajusta o espaçamento interno
+                "box-shadow": "0px 2px 4px rgba(0, 0, 0, 0.1)",  # Sombra sutil
+                "border-radius": "0 0 5px 5px",  # Apenas bordas inferiores arredondadas
+                "display": "flex",  # Usa flexbox para alinhamento
+                "align-items": "center"  # Alinha verticalmente os itens
+            }
+        ),
 
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),  # Objeto para controlar a URL do aplicativo
+        # Conteúdo do NavItem: as duas páginas já vêm no layout e a navegação apenas alterna a visível
+        html.Div(
+            [
+                html.Div(get_inicio_content(), id="page-inicio"),
+                html.Div(get_previsoes_content(), id="page-previsoes", style={"display": "none"}),
+            ],
+            id="nav-content",
+            style={
+                "margin": "0 20px",
+                "min-height": "calc(100vh - 90px)",  # Altura mínima da página sem a barra de navegação
+                "padding": "20px",  # Adiciona espaço interno ao conteúdo
+                "background-color": "#f5f5f5"  # Fundo claro
+            }
+        )
+    ], style={"background-color": "#f5f5f5"})
 
-    # Barra de navegação com melhor posicionamento
-    dbc.Navbar(
-        [
-            # Logotipo à esquerda
-            html.A(
-                html.Img(
-                    src="https://raw.githubusercontent.com/wanderson42/Portfolio-DS/main/datasets/Big_Mart_Sales/turing_logo.png",
-                    height="50px",  # Ajusta o tamanho do logotipo
-                    style={"margin-right": "20px"}  # Espaçamento entre o logotipo e as guias
-                ),
-                href="/",
-                style={"display": "flex", "align-items": "center"}
-            ),
-            # Itens de navegação centralizados
-            dbc.Nav(
-                [
-                    dbc.NavItem(dbc.NavLink("Sobre Este App", href="/", id="nav_inicio")),
-                    dbc.NavItem(dbc.NavLink("DashBoard De Previsões", href="/predictions", id="nav_previsoes")),
-                ],
-                pills=True,
-                style={"margin-left": "auto", "display": "flex", "align-items": "center"}  # Centraliza guias
-            ),
-        ],
-        color="white",
-        dark=False,
-        style={
-            "height": "70px",
-            "padding": "10px 30px",  # Ajusta o espaçamento interno
-            "box-shadow": "0px 2px 4px rgba(0, 0, 0, 0.1)",  # Sombra sutil
-            "border-radius": "0 0 5px 5px",  # Apenas bordas inferiores arredondadas
-            "display": "flex",  # Usa flexbox para alinhamento
-            "align-items": "center"  # Alinha verticalmente os itens
-        }
-    ),
 
-    # Conteúdo do NavItem
-    html.Div(
-        id="nav-content",
-        style={
-            "margin": "0 20px",
-            "min-height": "calc(100vh - 90px)",  # Altura mínima da página sem a barra de navegação
-            "padding": "20px",  # Adiciona espaço interno ao conteúdo
-            "background-color": "#f5f5f5"  # Fundo claro
-        }
-    )
-], style={"background-color": "#f5f5f5"})
+# O layout é gerado a cada carregamento da página para criar um novo identificador de sessão
+app.layout = serve_layout
 
 
 
@@ -149,23 +181,103 @@ app.layout = html.Div([
 Aqui começa a parte dos callbacks
 '''
 
-# Callback para atualizar o conteúdo da página com base na URL
-@app.callback(
-    Output("nav-content", "children"),
+# Endpoint de prontidão para o balanceador de carga / orquestrador
+@app.server.route('/ready')
+def ready():
+    status = {
+        'model_loaded': model_registry.version() > 0,
+        'item_index_loaded': item_identifier_index.loaded,
+    }
+    return jsonify(status), 200 if all(status.values()) else 503
+
+
+# Métricas de desempenho no formato de texto do Prometheus
+@app.server.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Tempo total e tamanho da resposta de cada requisição de callback (inclui a serialização JSON feita pelo Dash)
+@app.server.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.server.after_request
+def record_callback_response(response):
+    if request.path.endswith('/_dash-update-component') and 'request_start' in g:
+        output = (request.get_json(silent=True) or {}).get('output', '')
+        callback = app.callback_map.get(output, {}).get('callback')
+        name = getattr(callback, '__name__', output)
+        metrics.observe('bigmart_callback_request_seconds', time.perf_counter() - g.request_start, callback=name)
+        metrics.observe('bigmart_callback_response_bytes', response.calculate_content_length() or 0, callback=name)
+    return response
+
+
+# Endpoint de download das previsões: gera o arquivo em blocos apenas quando o usuário pede
+@app.server.route('/download/predictions')
+def download_predictions():
+    batch_key = request.args.get('key', '')
+    file_format = request.args.get('format', 'csv')
+    if file_format not in DOWNLOAD_FORMATS or (file_format == 'parquet' and not parquet_available()):
+        abort(400)
+
+    # Previsões de todos os arquivos pontuados do lote da sessão
+    batch = batch_store.get(batch_key)
+    df_preds = batch_predictions(batch)[1] if batch is not None else None
+    if df_preds is None:
+        abort(404)
+
+    mimetype, filename = DOWNLOAD_FORMATS[file_format]
+    return Response(iter_download(df_preds, file_format), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+# Endpoint das figuras do lote já serializadas (ver FigureCache): os bytes em cache são entregues
+# como estão, e a chave depende só do conteúdo, então o navegador pode guardá-los
+@app.server.route('/figures/<key>')
+def batch_figure(key):
+    data = figure_cache.get(key)
+    if data is None:
+        abort(404)
+    return Response(data, mimetype='application/json',
+                    headers={'Cache-Control': 'private, max-age=86400, immutable'})
+
+
+# API JSON de previsões para outros serviços: um registro (objeto) ou vários (lista) com as chaves da
+# previsão individual. Requisições concorrentes são agrupadas em micro-lotes (ver MicroBatcher)
+@app.server.route('/api/predict', methods=['POST'])
+def api_predict():
+    payload = request.get_json(silent=True)
+    records = payload if isinstance(payload, list) else [payload]
+    if not records or not all(isinstance(record, dict) for record in records):
+        return jsonify({'error': f"Envie um objeto JSON ou uma lista de objetos com as chaves: {', '.join(USER_COLUMNS)}."}), 400
+    if len(records) > API_MAX_RECORDS:
+        return jsonify({'error': f"No máximo {API_MAX_RECORDS:,} registros por requisição."}), 413
+
+    try:
+        predictions, errors = predict_records(records)
+    except TimeoutError:
+        return jsonify({'error': 'A previsão não terminou a tempo; tente novamente.'}), 503
+    except Exception as e:  # noqa: BLE001 - a API responde sempre em JSON
+        return jsonify({'error': f"Erro ao realizar previsões: {str(e)}"}), 500
+
+    if isinstance(payload, dict):
+        if errors[0] is not None:
+            return jsonify({'error': errors[0]}), 422
+        return jsonify({'Item_Outlet_Sales': predictions[0]})
+    return jsonify({'Item_Outlet_Sales': predictions, 'errors': errors})
+
+
+# Callback (no navegador) para exibir a página correspondente à URL e destacar a guia da navegação
+app.clientside_callback(
+    ClientsideFunction(namespace='bigmart', function_name='navigate'),
+    Output("page-inicio", "style"),
+    Output("page-previsoes", "style"),
     Output("nav_inicio", "className"),
     Output("nav_previsoes", "className"),
     Input("url", "pathname"),  # Monitora a URL atual
-    prevent_initial_call=True
 )
-def update_nav_content(pathname):
-    class_name_inicio = "nav-link"
-    class_name_previsoes = "nav-link"
-    if pathname == "/predictions":
-        class_name_previsoes = "nav-link active"
-        return previsoes_content, class_name_inicio, class_name_previsoes
-    else:
-        class_name_inicio = "nav-link active"
-        return inicio_content, class_name_inicio, class_name_previsoes  # Página "Sobre Este App" como padrão
 
 
 # Callback exclusivo para filtrar as opções do Item_Identifier conforme o usuário digita:
@@ -174,39 +286,34 @@ def update_nav_content(pathname):
     Input('dropdown-Item_Identifier', 'search_value'),
     prevent_initial_call=True
 )
+@instrument_callback
 def update_item_identifier_options_from_csv(search_value):
     """
-    Filtra as opções de Item_Identifier dinamicamente usando um arquivo CSV.
+    Filtra as opções de Item_Identifier dinamicamente usando o índice em memória do arquivo CSV.
     """
     if not search_value:
         raise dash.exceptions.PreventUpdate
 
-    # Carregar o CSV com os identificadores
-    csv_path = './item_identifiers.csv'  # Caminho para o arquivo na raiz do projeto
-    df = pd.read_csv(csv_path)
-
-    # Filtrar os identificadores que contêm o valor buscado
-    filtered_options = df[df['Item_Identifier'].str.contains(search_value, case=False, na=False)]
+    # Busca no índice em memória (o CSV só é relido quando o arquivo muda)
+    matches = item_identifier_index.search(search_value)
 
     # Retornar as opções formatadas para o Dropdown
-    return [{'label': identifier, 'value': identifier} for identifier in filtered_options['Item_Identifier']]
+    return [{'label': identifier, 'value': identifier} for identifier in matches]
 
 
-# Callback principal do dashboard
-@app.callback(
-    Output('tabs-content', 'children'),
-    Input('tabs', 'value')
+# Callback principal do dashboard, executado no navegador: sempre que o usuário seleciona
+# uma guia (tab), exibe o conteúdo correspondente e oculta os demais, sem ida ao servidor
+app.clientside_callback(
+    ClientsideFunction(namespace='bigmart', function_name='switchTab'),
+    Output('tab-1-content', 'style'),
+    Output('tab-2-content', 'style'),
+    Input('tabs', 'value'),
 )
-def render_content(tab):
-    '''
-    A função render_content é o callback que responde à interação
-    do usuário com as guias (tabs).
-     
-    Este callback é ativado sempre que o valor de uma guia (tabs) muda,
-    ou seja, verifica qual guia o usuario seleciona e retorna o conteúdo
-    correspondente a essa guia.
-    '''
-    
+
+
+# O layout de cada guia é estático: é montado uma única vez e reaproveitado em todas as páginas servidas
+@lru_cache(maxsize=None)
+def get_tab_content(tab):
     if tab == 'tab-1':
         return html.Div([
             html.Div(style={'margin-top': '8px'}),  # Espaço adicional
@@ -256,8 +363,35 @@ def render_content(tab):
                 'border-radius': '5px', 'color': 'black',
                 'text-decoration': 'none', 'display': 'block'  # Criar um espaço abaixo do botão
                 }),
-            # Exibição da previsão
-            html.Div(id='individual-prediction')
+            # Exibição da previsão (calculada no navegador; ver assets/clientside.js)
+            html.Div(id='individual-prediction'),
+            dcc.Store(id='client-model-digest', data=client_model_digest()),
+            dcc.Store(id='individual-prediction-request'),
+
+            # Simulação de cenários: grade de preço x visibilidade pontuada de uma só vez
+            html.Hr(style={'border-top': '1px solid #616161'}),
+            html.H4('Simulação de cenários (preço x visibilidade):'),
+            html.Div([
+                html.Div([
+                    html.H6("Faixa de Item_MRP:"),
+                    dcc.RangeSlider(id='sweep-mrp-range', min=0, max=300, step=5,
+                                    value=list(SWEEP_MRP_RANGE), marks={v: str(v) for v in range(0, 301, 50)}),
+                ], style={"margin-right": "20px", "display": "inline-block", "width": "400px", "vertical-align": "top"}),
+                html.Div([
+                    html.H6("Faixa de Item_Visibility:"),
+                    dcc.RangeSlider(id='sweep-visibility-range', min=0, max=0.35, step=0.01,
+                                    value=list(SWEEP_VISIBILITY_RANGE), marks={v / 100: f"{v / 100:.2f}" for v in range(0, 36, 5)}),
+                ], style={"margin-right": "20px", "display": "inline-block", "width": "400px", "vertical-align": "top"}),
+                dcc.Checklist(id='sweep-all-outlets', options=[{'label': ' Comparar todas as lojas', 'value': 'all'}],
+                              value=[], style={"display": "inline-block", "vertical-align": "top", "margin-top": "30px"}),
+            ]),
+            html.Button('Simular Cenários', id='sweep-button', n_clicks=0, style={
+                'margin-top': '10px', 'background-color': '#f1863d',
+                'text-align': 'center', 'padding': '5px',
+                'border-radius': '5px', 'color': 'black',
+                'text-decoration': 'none', 'display': 'block'
+                }),
+            dcc.Loading(html.Div(id='sweep-output'))
         ])
     
     #Condicional para acessar a opção de multiplas previsões
@@ -283,26 +417,36 @@ def render_content(tab):
                         'textAlign': 'center',
                         'margin': '10px 0'
                     },
-                    # Permite upload de apenas um arquivo
-                    multiple=False
+                    # Permite enviar vários arquivos, que são acrescentados ao lote da sessão
+                    multiple=True
                 ),
+                # Descarta o lote atual (arquivos, previsões e gráficos acumulados)
+                html.Button('Novo lote', id='reset-batch-button', n_clicks=0,
+                            style={'border-radius': '5px', 'padding': '5px', 'margin-bottom': '10px'}),
                 html.Div(id='output-data-upload'),
+                # Chave do upload já lido e armazenado no servidor
+                dcc.Store(id='upload-key'),
             ]),
             # Adicione seu conteúdo da opção 2 aqui
             html.Div(style={'margin-top': '8px'}),  # Espaço adicional
             #html.Button('Fazer Previsões', id='submit-button', n_clicks=0, style={'background-color': '#f1863d',
             #                                                                      'position': 'relative', 'left':'750px'}),
 
-            html.Div(id='multiple-predictions')
+            html.Div(id='multiple-predictions'),
+            dcc.Loading(html.Div(id='model-comparison'))
 
         ])
 
 
-# Callback para receber os dados de previsão individual
-@app.callback(
+# Callback para receber os dados de previsão individual: avaliado no navegador com o modelo
+# exportado em assets/bigmart_model.json (ver export_client_model.py e assets/clientside.js)
+app.clientside_callback(
+    ClientsideFunction(namespace='bigmart', function_name='predictIndividual'),
     Output('individual-prediction', 'children'),
+    Output('individual-prediction-request', 'data'),
     Input('submit-button', 'n_clicks'),
     [
+    State('client-model-digest', 'data'),
     State('dropdown-Outlet_Identifier', 'value'),
     State('dropdown-Item_Identifier', 'value'),    
     State('dropdown-Item_Type', 'value'),
@@ -312,34 +456,80 @@ def render_content(tab):
     ],
     prevent_initial_call=True
 )
-def update_individual_prediction(n_clicks, outlet_identifier, item_identifier, 
-                                 item_type, item_fat_content, item_visibility, item_mrp):
-    if n_clicks == 0:
+
+
+# Previsão individual no servidor, pedida pelo navegador quando o modelo exportado está ausente
+# ou foi gerado para outro modelo
+@app.callback(
+    Output('individual-prediction', 'children', allow_duplicate=True),
+    Input('individual-prediction-request', 'data'),
+    prevent_initial_call=True
+)
+@instrument_callback
+def update_individual_prediction(prediction_request):
+    if not prediction_request:
         raise PreventUpdate
 
-    if not all([outlet_identifier, item_identifier, item_type, item_fat_content, item_visibility, item_mrp]):
-        return html.H5("Por favor, preencha todos os campos antes de realizar a previsão.", style={'color': 'red'})
+    # Fazer a previsão
+    try:
+        prediction = predict_single(prediction_request['input'])  # Previsão individual (com cache das entradas já consultadas)
+        prediction_rounded = np.round(prediction, 2)  # Arredondar resultado
+        result_text = f"**Resultado:**  \nItem_Outlet_Sales = R$ {prediction_rounded:,.2f}"
+    except Exception as e:
+        result_text = f"Erro ao realizar previsão: {str(e)}"
+
+    # Retornar resultado formatado
+    return html.H5(dcc.Markdown(result_text), style={'margin-top': '10px'})
 
 
+# Callback da simulação de cenários: toda a grade é pontuada em uma única chamada vetorizada
+@app.callback(
+    Output('sweep-output', 'children'),
+    Input('sweep-button', 'n_clicks'),
+    [
+    State('dropdown-Outlet_Identifier', 'value'),
+    State('dropdown-Item_Identifier', 'value'),
+    State('dropdown-Item_Type', 'value'),
+    State('dropdown-Item_Fat_Content', 'value'),
+    State('input-Item_Visibility', 'value'),
+    State('input-Item_MRP', 'value'),
+    State('sweep-mrp-range', 'value'),
+    State('sweep-visibility-range', 'value'),
+    State('sweep-all-outlets', 'value'),
+    ],
+    prevent_initial_call=True
+)
+@instrument_callback
+def update_sweep(n_clicks, outlet_identifier, item_identifier, item_type, item_fat_content,
+                 item_visibility, item_mrp, mrp_range, visibility_range, all_outlets):
+    if n_clicks == 0:
+        raise PreventUpdate
+
+    # Preço e visibilidade vêm da grade; os demais atributos são obrigatórios
+    if not all([outlet_identifier, item_identifier, item_type, item_fat_content]):
+        return html.H5("Por favor, selecione a loja, o produto, o tipo e o teor de gordura antes de simular.",
+                       style={'color': 'red'})
+
     user_input = {
         'Outlet_Identifier': outlet_identifier,
         'Item_Identifier': item_identifier,
         'Item_Type': item_type,
         'Item_Fat_Content': item_fat_content,
         'Item_Visibility': item_visibility,
-        'Item_MRP': item_mrp
+        'Item_MRP': item_mrp,
     }
-   
-    # Fazer a previsão
+
     try:
-        prediction = make_predictions(user_input)  # Função customizada para realizar as previsões
-        prediction_rounded = np.round(prediction, 2)  # Arredondar resultado
-        result_text = f"**Resultado:**  \nItem_Outlet_Sales = R$ {prediction_rounded[0]:,.2f}"
-    except Exception as e:
-        result_text = f"Erro ao realizar previsão: {str(e)}"
+        sweep = sweep_predictions(user_input, mrp_range=tuple(mrp_range), visibility_range=tuple(visibility_range),
+                                  all_outlets='all' in (all_outlets or []))
+        fig_heatmap, fig_curves = plotly_sweep(sweep, user_input)
+    except ValueError as e:
+        return html.H5(f"Erro ao simular cenários: {str(e)}", style={'color': 'red'})
 
-    # Retornar resultado formatado
-    return html.H5(dcc.Markdown(result_text), style={'margin-top': '10px'})
+    return dbc.Row([
+        dbc.Col(dcc.Graph(figure=fig_heatmap, id='sweep-heatmap'), width=6),
+        dbc.Col(dcc.Graph(figure=fig_curves, id='sweep-curves'), width=6),
+    ])
 
 
 # Visualização de múltiplas previsões
@@ -358,100 +548,388 @@ html.Div([
 # callback para chamar a função parse_contents quando um arquivo .csv for carregado:
 @app.callback(
     Output('output-data-upload', 'children'),
-    Input('upload-data', 'contents')
+    Output('upload-key', 'data'),
+    Input('upload-data', 'contents'),
+    State('upload-data', 'filename'),
+    State('session-id', 'data')
 )
-def update_output(contents):
-    if contents is None:
+@instrument_callback
+def update_output(contents, filenames, session_id):
+    if not contents:
         raise PreventUpdate
-    return parse_contents(contents)
 
-
-# Callback para múltiplas previsões
+    # Cada arquivo é lido uma única vez, validado e acrescentado ao lote da sessão; os próximos
+    # callbacks recebem apenas as chaves. A pré-visualização mostra o último arquivo lido
+    batch_key = batch_store.make_key(session_id)
+    messages, preview = [], None
+    for file_contents, filename in zip(contents, filenames or [None] * len(contents)):
+        filename = filename or f"arquivo {len(messages) + 1}"
+        upload_key = upload_store.make_key(session_id, file_contents)
+        loaded_data = upload_store.get(upload_key)
+        if loaded_data is None:
+            try:
+                loaded_data = read_uploaded_data(file_contents)
+            except ValueError as e:
+                messages.append(html.H5(f"Não foi possível ler {filename}: {str(e)}", style={'color': 'red'}))
+                continue
+            if not upload_store.put(upload_key, loaded_data):
+                messages.append(html.H5(f"{filename} excede o limite de memória do servidor.", style={'color': 'red'}))
+                continue
+
+        # Validação logo após a leitura: os erros aparecem antes de qualquer previsão
+        report = validate_upload(loaded_data)
+        batch_store.update(batch_key, lambda batch: batch.add_file(upload_key, filename, report))
+        preview = (loaded_data, upload_key, report)
+
+    children = messages + [batch_status(batch_store.get(batch_key))]
+    if preview is None:
+        return html.Div(children), dash.no_update
+    return html.Div(children + [parse_contents(*preview)]), preview[1]
+
+
+# Callback para descartar o lote da sessão e começar um novo
 @app.callback(
-    Output('multiple-predictions', 'children'),
-    Input('submit-button', 'n_clicks'),
-    State('upload-data', 'contents')  # Adicionando o conteúdo do arquivo
+    Output('output-data-upload', 'children', allow_duplicate=True),
+    Output('upload-key', 'data', allow_duplicate=True),
+    Output('upload-data', 'contents'),
+    Output('multiple-predictions', 'children', allow_duplicate=True),
+    Output('model-comparison', 'children', allow_duplicate=True),
+    Input('reset-batch-button', 'n_clicks'),
+    State('session-id', 'data'),
+    prevent_initial_call=True
 )
-def update_multiple_predictions(n_clicks, contents):
-
-    if n_clicks == 0 or contents is None:
+@instrument_callback
+def reset_batch(n_clicks, session_id):
+    if not n_clicks:
         raise PreventUpdate
+    batch_store.clear(batch_store.make_key(session_id))
+    return html.P('Lote descartado. Envie novos arquivos para começar outro.'), None, None, None, None
 
-    # Dados obtidos a partir do upload do usuario
-    user_inputs = read_uploaded_data(contents)
 
-    # Fazendo previsões com base nas entradas do usuário
-    predictions = make_predictions(user_inputs)
+def valid_upload_rows(upload_key):
+    '''
+    Retorna (linhas válidas do upload, relatório de validação), ou (None, None) se o upload expirou.
+    As linhas inválidas, com a descrição dos erros, ficam no servidor para a tabela de erros.
+    '''
+    user_inputs = upload_store.get(upload_key)
+    if user_inputs is None:
+        return None, None
+    report = validate_upload(user_inputs)
+    if report['n_invalid'] and not report['missing_columns']:
+        upload_store.put(f"{upload_key}:errors", describe_validation_errors(user_inputs, report))
+        user_inputs = user_inputs[report['valid']]
+    return user_inputs, report
 
-    predictions = np.round(predictions, 2)
 
-    # Criar uma Panda.Series para as previsões
-    item_outlet_sales = pd.Series(predictions, name='Item_Outlet_Sales')
+def batch_figure_graph(chart_id, figure_key):
+    """
+    Gráfico do lote carregado pelo navegador a partir de /figures (callback clientside loadFigure).
+    """
+    return html.Div([
+        dcc.Graph(id={'type': 'batch-figure', 'chart': chart_id}),
+        dcc.Store(id={'type': 'batch-figure-source', 'chart': chart_id}, data=f"figures/{figure_key}"),
+    ])
 
-    # Concatenar a série de previsões com o dataframe user_inputs
-    result_df = pd.concat([user_inputs.reset_index(drop=True), item_outlet_sales.reset_index(drop=True)], axis=1)
 
+def validation_errors_block(batch):
+    '''
+    Resumo da validação dos arquivos pontuados do lote e tabela paginada das linhas descartadas
+    (vazio se não houve erros).
+    '''
+    report = batch.validation_report()
+    if not report['n_invalid']:
+        return html.Div()
+    children = [validation_summary(report)]
+    errors_key, df_errors = batch_validation_errors(batch)
+    if df_errors is not None:
+        children.append(html.Details([
+            html.Summary('Linhas descartadas'),
+            make_paged_table(df_errors, 'errors-table', height='250px', cache_key=errors_key),
+        ]))
+    return html.Div(children)
+
+
+# Paginação, ordenação e filtragem da tabela de pré-visualização do upload
+@app.callback(
+    Output('upload-table', 'data'),
+    Output('upload-table', 'page_count'),
+    Input('upload-table', 'page_current'),
+    Input('upload-table', 'page_size'),
+    Input('upload-table', 'sort_by'),
+    Input('upload-table', 'filter_query'),
+    State('upload-key', 'data'),
+    prevent_initial_call=True
+)
+@instrument_callback
+def update_upload_table(page_current, page_size, sort_by, filter_query, upload_key):
+    loaded_data = upload_store.get(upload_key) if upload_key else None
+    if loaded_data is None:
+        raise PreventUpdate
+    return table_page(loaded_data, page_current, page_size, sort_by, filter_query, cache_key=upload_key)
 
-    # Criar o DataFrame final com apenas as colunas necessárias
-    df_preds = pd.concat([
-        user_inputs[['Outlet_Identifier', 'Item_Identifier']].reset_index(drop=True),
-        item_outlet_sales.reset_index(drop=True)
-    ], axis=1)
-    
-    # Criando a tabela de resultados das previsões
-    table = dash_table.DataTable(
-        data=df_preds.to_dict('records'),
-        columns=[{'name': col, 'id': col} for col in df_preds.columns],
-        style_table={'height': '350px', 'overflowY': 'auto', 'position': 'relative'},
-        id='results-table'  # Adicionando um ID à tabela para referência posterior
-    )
 
-    # Gráfico Distribuição de Vendas por Categoria
-    plotly_1 = plotly_sales_by_category(result_df)
+# Paginação, ordenação e filtragem da tabela de resultados das previsões
+@app.callback(
+    Output('results-table', 'data'),
+    Output('results-table', 'page_count'),
+    Input('results-table', 'page_current'),
+    Input('results-table', 'page_size'),
+    Input('results-table', 'sort_by'),
+    Input('results-table', 'filter_query'),
+    State('session-id', 'data'),
+    prevent_initial_call=True
+)
+@instrument_callback
+def update_results_table(page_current, page_size, sort_by, filter_query, session_id):
+    # Previsões de todos os arquivos do lote, concatenadas apenas na primeira paginação
+    batch = batch_store.get(batch_store.make_key(session_id))
+    results_key, df_preds = batch_predictions(batch) if batch is not None else (None, None)
+    if df_preds is None:
+        raise PreventUpdate
+    return table_page(df_preds, page_current, page_size, sort_by, filter_query, cache_key=results_key)
 
-    # Gerando link para download do CSV
-    csv_string = df_preds.to_csv(index=False, encoding='utf-8')
-    csv_string = "data:text/csv;charset=utf-8," + quote(csv_string)
 
+# Paginação, ordenação e filtragem da tabela de linhas descartadas pela validação
+@app.callback(
+    Output('errors-table', 'data'),
+    Output('errors-table', 'page_count'),
+    Input('errors-table', 'page_current'),
+    Input('errors-table', 'page_size'),
+    Input('errors-table', 'sort_by'),
+    Input('errors-table', 'filter_query'),
+    State('session-id', 'data'),
+    prevent_initial_call=True
+)
+@instrument_callback
+def update_errors_table(page_current, page_size, sort_by, filter_query, session_id):
+    batch = batch_store.get(batch_store.make_key(session_id))
+    errors_key, df_errors = batch_validation_errors(batch) if batch is not None else (None, None)
+    if df_errors is None:
+        raise PreventUpdate
+    return table_page(df_errors, page_current, page_size, sort_by, filter_query, cache_key=errors_key)
 
-    # Ajustando o botão de download
-    download_href = csv_string
-    download_button = html.A('Baixar Previsões', id='download-predictions', download="predictions.csv",
-                             href=download_href, target="_blank",
-                             style={'background-color': '#2E9203', 'margin-top': '-60px',
-                                    'display': 'block', 'width': '130px', 'text-align': 'center',
-                                    'padding': '5px', 'border-radius': '5px', 'color': 'black',
-                                    'text-decoration': 'none','margin-bottom': '10px'})
 
-    # Gráfico Distribuição de Vendas por Categoria em cada loja
-    plotly_2 = plotly_sales_over_outlet(result_df)
+# Paginação, ordenação e filtragem da tabela de comparação entre modelos
+@app.callback(
+    Output('comparison-table', 'data'),
+    Output('comparison-table', 'page_count'),
+    Input('comparison-table', 'page_current'),
+    Input('comparison-table', 'page_size'),
+    Input('comparison-table', 'sort_by'),
+    Input('comparison-table', 'filter_query'),
+    State('upload-key', 'data'),
+    prevent_initial_call=True
+)
+@instrument_callback
+def update_comparison_table(page_current, page_size, sort_by, filter_query, upload_key):
+    comparison_key = f"{upload_key}:comparison"
+    df_comparison = upload_store.get(comparison_key) if upload_key else None
+    if df_comparison is None:
+        raise PreventUpdate
+    return table_page(df_comparison, page_current, page_size, sort_by, filter_query, cache_key=comparison_key)
+
+
+# Callback para múltiplas previsões, executado como job em segundo plano (com progresso e cancelamento).
+# Apenas os arquivos do lote ainda não pontuados são processados: os agregados dos gráficos são
+# mesclados aos já existentes, então o custo de cada envio depende apenas do tamanho dos arquivos novos
+@app.callback(
+    Output('multiple-predictions', 'children'),
+    Input('submit-button-multiple', 'n_clicks'),
+    State('session-id', 'data'),  # Identifica o lote da sessão armazenado no servidor
+    background=True,
+    running=[
+        (Output('submit-button-multiple', 'disabled'), True, False),
+        (Output('cancel-button', 'style'), {'display': 'inline-block', 'margin-left': '10px'}, {'display': 'none'}),
+        (Output('prediction-progress', 'style'), {'display': 'inline-block', 'margin-left': '10px'}, {'display': 'none'}),
+    ],
+    cancel=[Input('cancel-button', 'n_clicks')],
+    progress=[Output('prediction-progress', 'value')],
+    prevent_initial_call=True
+)
+@instrument_callback(flush=True)
+def update_multiple_predictions(set_progress, n_clicks, session_id):
+
+    if n_clicks == 0 or session_id is None:
+        raise PreventUpdate
+
+    batch_key = batch_store.make_key(session_id)
+    batch = batch_store.get(batch_key)
+    if batch is None or not batch.files:
+        return html.H5("Nenhum arquivo no lote. Por favor, envie os arquivos novamente.", style={'color': 'red'})
 
-    # Gráfico de distribuição da visibilidade dos items
-    plotly_3 = plot_visibility_boxplot(result_df)
+    pending = batch.pending()
+    total_rows, done_rows = max(1, sum(file['n_rows'] for file in pending)), 0
+    # Pool de processos deste job (os workers só são criados se algum arquivo tiver mais de uma
+    # fatia), encerrado quando o job termina, inclusive por erro ou retorno antecipado
+    pool = ShardPool()
+    try:
+        for file in pending:
+            # Dados obtidos a partir do upload do usuario (já lidos e armazenados no servidor),
+            # validados antes da pontuação: apenas as linhas válidas seguem para o modelo
+            user_inputs, report = valid_upload_rows(file['key'])
+            if user_inputs is None:
+                return html.H5(f"O arquivo {file['name']} expirou no servidor. Por favor, envie-o novamente.",
+                               style={'color': 'red'})
+            if report['n_invalid'] == report['n_rows']:
+                batch, _ = batch_store.update(batch_key, lambda batch: batch.add_scored(file['key']), batch.id)
+                if batch is None:
+                    raise PreventUpdate
+                continue
+
+            # Inferir os atributos das lojas (o arquivo só precisa das seis colunas de entrada do usuário)
+            try:
+                user_inputs = enrich_outlet_attributes(user_inputs)
+            except ValueError as e:
+                return html.H5(f"Erro ao realizar previsões: {str(e)}", style={'color': 'red'})
+
+            # Fazendo previsões com base nas entradas do usuário (fatias pontuadas no pool de processos)
+            def report_progress(done, total, offset=done_rows, size=file['n_rows']):
+                set_progress((int(100 * (offset + size * done / total) / total_rows),))
+            try:
+                predictions = score_in_shards(user_inputs, report_progress, pool)
+            except TimeoutError as e:
+                return html.H5(f"Erro ao realizar previsões: {str(e)}", style={'color': 'red'})
+            done_rows += file['n_rows']
+
+            # Previsões do arquivo (apenas as colunas necessárias, sem copiar os dados), mantidas no
+            # servidor para a paginação da tabela de resultados e para o download
+            df_preds = prediction_output(user_inputs, predictions)
+            upload_store.put(f"{file['key']}:predictions", df_preds)
+
+            # Resultado completo: cópia rasa das entradas (as colunas são compartilhadas) mais as previsões
+            result_df = user_inputs.copy(deep=False)
+            result_df['Item_Outlet_Sales'] = df_preds['Item_Outlet_Sales'].to_numpy()
+
+            # Agregados parciais do arquivo, mesclados aos do lote junto com a amostra da dispersão
+            partial = partial_sales_aggregates(result_df)
+            batch, _ = batch_store.update(batch_key, lambda batch: batch.add_scored(file['key'], partial, result_df),
+                                          batch.id)
+            if batch is None:
+                # O lote foi descartado durante o job
+                raise PreventUpdate
+    finally:
+        pool.shutdown()
+
+    if batch.partial is None:
+        return validation_errors_block(batch)
+
+    # Criando a tabela de resultados das previsões (paginada no servidor): a primeira página vem
+    # dos primeiros arquivos e o restante é concatenado apenas quando o usuário navegar
+    df_head = batch_predictions_head(batch)
+    if df_head is None:
+        return html.H5("As previsões expiraram no servidor. Por favor, inicie um novo lote.", style={'color': 'red'})
+    table = make_paged_table(df_head, 'results-table', height='350px', total_rows=batch.n_rows)
+
+    # Os quatro gráficos (a partir dos agregados mesclados arquivo a arquivo): montados apenas se o
+    # mesmo conjunto de arquivos ainda não foi exibido com o mesmo modelo, e buscados pelo navegador
+    figure_keys = batch_figure_keys(batch)
+
+    # Links para o endpoint de download: o arquivo só é gerado (em blocos) quando for pedido
+    download_url = f"/download/predictions?key={quote(batch_key, safe='')}"
+    download_links = [
+        html.A('Baixar Previsões', id='download-predictions', download="predictions.csv",
+               href=f"{download_url}&format=csv", target="_blank",
+               style={'background-color': '#2E9203', 'display': 'block', 'width': '130px',
+                      'text-align': 'center', 'padding': '5px', 'border-radius': '5px',
+                      'color': 'black', 'text-decoration': 'none'}),
+        html.A('.csv.gz', download="predictions.csv.gz", href=f"{download_url}&format=csv.gz",
+               target="_blank", style={'margin-left': '10px'}),
+    ]
+    if parquet_available():
+        download_links.append(html.A('.parquet', download="predictions.parquet", href=f"{download_url}&format=parquet",
+                                     target="_blank", style={'margin-left': '10px'}))
 
-    # Gráfico de visibilidade vs vendas
-    plotly_4 = plotly_visibility_vs_sales(result_df)
+    # Ajustando o botão de download
+    download_button = html.Div(download_links, style={'margin-top': '-60px', 'margin-bottom': '10px',
+                                                      'display': 'flex', 'align-items': 'center'})
 
 
     # Layout para empilhar os gráficos
     return html.Div([
-        html.H5('Resultado das Previsões:'),
+        html.H5(f"Resultado das Previsões ({len(batch.files)} arquivo(s), {batch.n_rows:,} linhas):"),
+        validation_errors_block(batch),
         dbc.Row([
             dbc.Col(html.Div([table]), width=4),
-            dbc.Col(html.Div([dcc.Graph(figure=plotly_1, id='sales-graph')]), width=8)
+            dbc.Col(batch_figure_graph('sales_by_category', figure_keys['sales_by_category']), width=8)
         ]),
         download_button,  # Botão de download
         dbc.Row([
-            dbc.Col(html.Div([dcc.Graph(figure=plotly_2, id='second-sales-graph')]), width=12)
+            dbc.Col(batch_figure_graph('sales_over_outlet', figure_keys['sales_over_outlet']), width=12)
         ]),
         dbc.Row([
-            dbc.Col(html.Div([dcc.Graph(figure=plotly_3, id='third-sales-graph')]), width=12)
+            dbc.Col(batch_figure_graph('visibility_boxplot', figure_keys['visibility_boxplot']), width=12)
         ]),
         dbc.Row([
-            dbc.Col(html.Div([dcc.Graph(figure=plotly_4, id='fourth-sales-graph')]), width=12)
+            dbc.Col(batch_figure_graph('visibility_vs_sales', figure_keys['visibility_vs_sales']), width=12)
         ]),                  
     ], style={'width': '100%'})
 
 
+# Callback (no navegador) que busca cada gráfico do lote já serializado em /figures
+app.clientside_callback(
+    ClientsideFunction(namespace='bigmart', function_name='loadFigure'),
+    Output({'type': 'batch-figure', 'chart': MATCH}, 'figure'),
+    Input({'type': 'batch-figure-source', 'chart': MATCH}, 'data'),
+)
+
+
+# Callback da comparação entre modelos: o mesmo upload pontuado por todos os modelos registrados
+# em paralelo, com as previsões lado a lado e as estatísticas de divergência
+@app.callback(
+    Output('model-comparison', 'children'),
+    Input('compare-models-button', 'n_clicks'),
+    State('upload-key', 'data'),
+    background=True,
+    running=[(Output('compare-models-button', 'disabled'), True, False)],
+    prevent_initial_call=True
+)
+@instrument_callback(flush=True)
+def update_model_comparison(n_clicks, upload_key):
+
+    if not n_clicks or upload_key is None:
+        raise PreventUpdate
+
+    user_inputs, report = valid_upload_rows(upload_key)
+    if user_inputs is None:
+        return html.H5("O arquivo expirou no servidor. Por favor, envie-o novamente.", style={'color': 'red'})
+    if report['n_invalid'] == report['n_rows']:
+        return validation_summary(report)
+
+    try:
+        predictions, stats = compare_models(user_inputs)
+    except (ValueError, TimeoutError) as e:
+        return html.H5(f"Erro ao comparar os modelos: {str(e)}", style={'color': 'red'})
+
+    # Previsões lado a lado, mantidas no servidor para a paginação da tabela
+    df_comparison = pd.DataFrame({
+        'Outlet_Identifier': user_inputs['Outlet_Identifier'],
+        'Item_Identifier': user_inputs['Item_Identifier'],
+        **{MODELS[name].label: predictions[name].round(2) for name in stats['latency']},
+        'Spread': predictions['Spread'].round(2),
+    }, copy=False)
+    comparison_key = f"{upload_key}:comparison"
+    upload_store.put(comparison_key, df_comparison)
+    table = make_paged_table(df_comparison, 'comparison-table', height='350px', cache_key=comparison_key)
+
+    # Estatísticas de divergência entre os modelos
+    labels = {name: spec.label for name, spec in MODELS.items()}
+    summary = stats['summary'].replace({'Modelo': labels}).round(2)
+    summary['Tempo (s)'] = [round(stats['latency'][name], 3) for name in stats['latency']]
+    pairwise = stats['pairwise'].replace({'Modelo A': labels, 'Modelo B': labels}).round(3)
+    spread = stats['spread']
+
+    return html.Div([
+        html.H5('Comparação entre Modelos:'),
+        html.P(f"Tempo total: {stats['total_seconds']:.3f} s "
+               f"(modelo mais lento: {max(stats['latency'].values()):.3f} s). "
+               f"Spread por linha: média {spread['mean']:.2f}, p95 {spread['p95']:.2f}, máximo {spread['max']:.2f}."),
+        dbc.Row([
+            dbc.Col(dbc.Table.from_dataframe(summary, striped=True, bordered=True, size='sm'), width=6),
+            dbc.Col(dbc.Table.from_dataframe(pairwise, striped=True, bordered=True, size='sm'), width=6),
+        ]),
+        table,
+    ], style={'width': '100%', 'margin-top': '10px'})
+
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,169 @@
+/*
+ * Callbacks executados no navegador (clientside callbacks do Dash).
+ *
+ * - navegação entre as páginas e troca das guias: apenas alternam a visibilidade de
+ *   conteúdos que já estão no layout, sem ida ao servidor;
+ * - previsão individual: avalia o modelo exportado em /assets/bigmart_model.json (ver
+ *   export_client_model.py e build_client_model em helpers.py), carregado uma única vez por
+ *   página. Se o arquivo estiver ausente ou tiver sido gerado para outro modelo (hash diferente
+ *   do informado pelo servidor), a previsão é pedida ao servidor.
+ * - gráficos do lote: busca as figuras já serializadas no servidor (rota /figures, ver
+ *   FigureCache em helpers.py), sem que o Dash as decodifique e codifique de novo.
+ *
+ * O arquivo também pode ser carregado pelo Node (module.exports), usado na verificação
+ * de paridade com as previsões do servidor (benchmarks/check_client_parity.py).
+ */
+(function (root) {
+    'use strict';
+
+    var MODEL_ASSET = 'assets/bigmart_model.json';
+    var MISSING_FIELDS = 'Por favor, preencha todos os campos antes de realizar a previsão.';
+
+    var INVERSE_TRANSFORMS = {
+        sqrt: function (value) { return value * value; },
+        log1p: function (value) { return Math.expm1(value); },
+        identity: function (value) { return value; }
+    };
+
+    function roundTo(value, digits) {
+        return Number(Number(value).toFixed(digits));
+    }
+
+    /*
+     * Previsão de vendas de uma entrada (mesmas chaves de `make_predictions`), na mesma ordem
+     * de operações de CompiledLinearScorer.predict no servidor.
+     */
+    function predict(model, input) {
+        var outlet = model.outlets[input.Outlet_Identifier];
+        if (outlet === undefined) {
+            throw new Error('Unknown Outlet Identifier: ' + input.Outlet_Identifier);
+        }
+        var values = Object.assign({}, outlet.values);
+        Object.keys(model.rounding).forEach(function (column) {
+            values[column] = roundTo(input[column], model.rounding[column]);
+        });
+
+        var output = outlet.offset;
+        Object.keys(model.lookups).forEach(function (column) {
+            var weight = model.lookups[column][input[column]];
+            if (weight === undefined) {
+                throw new Error("Found unknown categories ['" + input[column] + "'] in column '" + column + "'");
+            }
+            output = output + weight;
+        });
+        model.terms.forEach(function (term) {
+            var product = 1.0;
+            term.columns.forEach(function (column, k) {
+                for (var i = 0; i < term.powers[k]; i++) {
+                    product = product * values[column];
+                }
+            });
+            output = output + term.coef * ((product - term.center) / term.scale);
+        });
+        return INVERSE_TRANSFORMS[model.target_transform](output);
+    }
+
+    function formatCurrency(value) {
+        return 'R$ ' + roundTo(value, 2).toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+    }
+
+    function message(text, style) {
+        return {namespace: 'dash_html_components', type: 'H5', props: {children: text, style: style}};
+    }
+
+    function pathnamePrefix() {
+        return JSON.parse(document.getElementById('_dash-config').textContent).requests_pathname_prefix;
+    }
+
+    var modelPromises = {};
+
+    /*
+     * Modelo exportado para o hash `digest`, ou null se o arquivo não existir ou for de outro modelo.
+     */
+    function loadModel(digest) {
+        if (!(digest in modelPromises)) {
+            var url = pathnamePrefix() + MODEL_ASSET + '?v=' + digest;
+            modelPromises[digest] = fetch(url, {cache: 'no-cache'}).then(function (response) {
+                return response.ok ? response.json() : null;
+            }).then(function (model) {
+                return model !== null && model.digest === digest ? model : null;
+            }).catch(function () {
+                // Falha de rede: esta previsão vai ao servidor e o próximo clique tenta de novo
+                delete modelPromises[digest];
+                return null;
+            });
+        }
+        return modelPromises[digest];
+    }
+
+    var callbacks = {
+        navigate: function (pathname) {
+            var predictions = pathname === '/predictions';
+            return [
+                {display: predictions ? 'none' : 'block'},
+                {display: predictions ? 'block' : 'none'},
+                predictions ? 'nav-link' : 'nav-link active',
+                predictions ? 'nav-link active' : 'nav-link'
+            ];
+        },
+
+        switchTab: function (tab) {
+            return [
+                {display: tab === 'tab-1' ? 'block' : 'none'},
+                {display: tab === 'tab-2' ? 'block' : 'none'}
+            ];
+        },
+
+        predictIndividual: function (nClicks, digest, outletIdentifier, itemIdentifier, itemType, itemFatContent,
+                                     itemVisibility, itemMrp) {
+            var noUpdate = root.dash_clientside.no_update;
+            if (!nClicks) {
+                return [noUpdate, noUpdate];
+            }
+            var fields = [outletIdentifier, itemIdentifier, itemType, itemFatContent, itemVisibility, itemMrp];
+            if (!fields.every(Boolean)) {
+                return [message(MISSING_FIELDS, {color: 'red'}), noUpdate];
+            }
+            var input = {
+                Outlet_Identifier: outletIdentifier,
+                Item_Identifier: itemIdentifier,
+                Item_Type: itemType,
+                Item_Fat_Content: itemFatContent,
+                Item_Visibility: itemVisibility,
+                Item_MRP: itemMrp
+            };
+            return loadModel(digest).then(function (model) {
+                if (model === null) {
+                    // Sem o modelo exportado: o callback update_individual_prediction responde
+                    return [noUpdate, {n_clicks: nClicks, input: input}];
+                }
+                var resultText = '**Resultado:**  \nItem_Outlet_Sales = ' + formatCurrency(predict(model, input));
+                return [message({namespace: 'dash_core_components', type: 'Markdown', props: {children: resultText}},
+                                {marginTop: '10px'}), noUpdate];
+            }).catch(function (error) {
+                return [message('Erro ao realizar previsão: ' + error.message, {marginTop: '10px'}), noUpdate];
+            });
+        },
+
+        loadFigure: function (source) {
+            if (!source) {
+                return root.dash_clientside.no_update;
+            }
+            return fetch(pathnamePrefix() + source).then(function (response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            }).catch(function (error) {
+                return {data: [], layout: {title: {text: 'Gráfico indisponível (' + error.message +
+                                                         '). Clique em "Fazer Previsões" novamente.'}}};
+            });
+        }
+    };
+
+    if (typeof module !== 'undefined' && module.exports) {
+        module.exports = {predict: predict};
+    } else {
+        root.dash_clientside = Object.assign({}, root.dash_clientside, {bigmart: callbacks});
+    }
+})(typeof window !== 'undefined' ? window : this);
@@ -0,0 +1,117 @@
+"""
+Benchmark e verificação de paridade da pontuação em linha de comando (score_batch.py).
+
+Gera três arquivos CSV a partir do arquivo de teste replicado (um deles com 1% de linhas
+inválidas, inclusive valores não numéricos, e tamanhos que não são múltiplos das fatias),
+envia-os em um lote pelos callbacks do dashboard e baixa as previsões pela rota de download.
+Em seguida executa score_batch.py sobre os mesmos arquivos e compara os bytes dos arquivos
+.csv e .csv.gz com os do dashboard; o arquivo .parquet e a leitura de uma cópia dos dados em
+Parquet são comparados pelo conteúdo. Mostra o tempo e as linhas/s de cada execução e termina
+com código 1 se alguma saída divergir.
+
+Uso:
+    python benchmarks/bench_batch_cli.py [n_linhas_por_arquivo] [--workers N]
+"""
+import argparse
+import atexit
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Caches em disco em um diretório temporário: o benchmark não usa nem apaga os caches do servidor
+TEMP_CACHE_DIR = tempfile.mkdtemp(prefix='bigmart-cache-')
+atexit.register(shutil.rmtree, TEMP_CACHE_DIR, ignore_errors=True)
+os.environ.setdefault('BIGMART_CACHE_DIR', TEMP_CACHE_DIR)
+
+import app  # noqa: E402
+import score_batch  # noqa: E402
+from bench_suite import build_contents, build_frame  # noqa: E402
+from bench_validation import corrupt  # noqa: E402
+from helpers import batch_store  # noqa: E402
+
+
+def dashboard_download(paths, file_format):
+    """
+    Envia `paths` em um lote novo, executa as previsões e retorna os bytes do download.
+    """
+    session_id = f"bench-{uuid.uuid4().hex}"
+    contents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            contents.append(build_contents(pd.read_csv(f, dtype=str, keep_default_na=False)))
+    app.update_output(contents, [os.path.basename(path) for path in paths], session_id)
+    app.update_multiple_predictions(lambda progress: None, 1, session_id)
+    batch_key = batch_store.make_key(session_id)
+    try:
+        with app.app.server.test_client() as client:
+            response = client.get('/download/predictions', query_string={'key': batch_key, 'format': file_format})
+            return response.get_data()
+    finally:
+        batch_store.clear(batch_key)
+
+
+def run_cli(paths, output, workers):
+    start = time.perf_counter()
+    score_batch.main([*paths, '-o', output, '--workers', str(workers)])
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('n_rows', nargs='?', type=int, default=250_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bigmart-cli-')
+    try:
+        reference = build_frame(args.n_rows)
+        frames = [reference, corrupt(reference.iloc[:args.n_rows // 2 + 7].reset_index(drop=True)),
+                  reference.iloc[:args.n_rows // 3 + 1].assign(Item_MRP=lambda d: d['Item_MRP'] * 1.05)]
+        paths = []
+        for i, frame in enumerate(frames, start=1):
+            paths.append(os.path.join(workdir, f"dia_{i}.csv"))
+            frame.to_csv(paths[-1], index=False)
+        n_total = sum(len(frame) for frame in frames)
+
+        failed = False
+        for file_format in ('csv', 'csv.gz'):
+            start = time.perf_counter()
+            expected = dashboard_download(paths, file_format)
+            dashboard_seconds = time.perf_counter() - start
+            output = os.path.join(workdir, f"previsoes.{file_format}")
+            cli_seconds = run_cli(paths, output, args.workers)
+            with open(output, 'rb') as f:
+                identical = f.read() == expected
+            failed |= not identical
+            print(f"{file_format:<8} {n_total:,} linhas: dashboard {dashboard_seconds:6.2f} s, linha de comando "
+                  f"{cli_seconds:6.2f} s ({n_total / cli_seconds:,.0f} linhas/s); "
+                  f"{'idêntico' if identical else 'DIFERENTE'}")
+
+        # Parquet na saída e na entrada: mesmo conteúdo do CSV do dashboard
+        expected = pd.read_csv(io.BytesIO(dashboard_download(paths, 'csv')))
+        parquet_inputs = []
+        for path in paths:
+            parquet_inputs.append(path.replace('.csv', '.parquet'))
+            pd.read_csv(path, dtype=str, keep_default_na=False).to_parquet(parquet_inputs[-1], index=False)
+        for label, inputs in (('csv -> parquet', paths), ('parquet -> parquet', parquet_inputs)):
+            output = os.path.join(workdir, 'previsoes.parquet')
+            run_cli(inputs, output, args.workers)
+            result = pd.read_parquet(output).astype({'Outlet_Identifier': str, 'Item_Identifier': str})
+            same = result.equals(expected.astype({'Outlet_Identifier': str, 'Item_Identifier': str}))
+            failed |= not same
+            print(f"{label:<20} {'mesmo conteúdo' if same else 'DIFERENTE'}")
+    finally:
+        shutil.rmtree(workdir)
+
+    if failed:
+        print("ERRO: a saída da linha de comando diverge do download do dashboard")
+        sys.exit(1)
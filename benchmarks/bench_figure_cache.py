@@ -0,0 +1,116 @@
+"""
+Benchmark do cache de figuras do lote (figure_cache).
+
+Envia um arquivo de `n_linhas` linhas e clica em "Fazer Previsões" (update_multiple_predictions)
+três vezes: a primeira pontua o arquivo e monta os quatro gráficos; a segunda repete a exibição
+com o cache de figuras vazio (o custo de cada clique antes do cache); a terceira repete com o
+cache preenchido, como uma nova exibição ou uma reconexão após recarregar a página. Cada clique
+inclui o que o navegador espera: o callback, a serialização da resposta (to_json_plotly, como o
+Dash) e a busca das quatro figuras em /figures. Também compara a serialização da figura de
+dispersão por figure_to_json com a do plotly.io.
+
+Termina com código 1 se as figuras do cache diferirem das montadas de novo ou das serializadas
+pelo plotly, ou se a exibição repetida com o cache não for ao menos MIN_SPEEDUP vezes mais
+rápida que sem ele.
+
+Uso:
+    python benchmarks/bench_figure_cache.py [n_linhas]
+"""
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Caches em disco em um diretório temporário: o benchmark não usa nem apaga os caches do servidor
+TEMP_CACHE_DIR = tempfile.mkdtemp(prefix='bigmart-cache-')
+atexit.register(shutil.rmtree, TEMP_CACHE_DIR, ignore_errors=True)
+os.environ.setdefault('BIGMART_CACHE_DIR', TEMP_CACHE_DIR)
+
+import app  # noqa: E402
+import plotly.io as pio  # noqa: E402
+from bench_suite import build_contents, build_frame  # noqa: E402
+from helpers import (BATCH_FIGURES, batch_store, figure_cache, figure_to_json, plotly_visibility_vs_sales,  # noqa: E402
+                     warm_up_model)
+from plotly.io.json import to_json_plotly  # noqa: E402
+
+MIN_SPEEDUP = 5
+
+
+def click(session_id, client):
+    """
+    Um clique em "Fazer Previsões": retorna (segundos, bytes da resposta, {gráfico: bytes da figura}).
+    """
+    start = time.perf_counter()
+    response = app.update_multiple_predictions(lambda progress: None, 1, session_id)
+    size = len(to_json_plotly(response))
+    sources = {}
+
+    def collect(component):
+        if isinstance(component, list):
+            for child in component:
+                collect(child)
+        elif isinstance(component, app.dcc.Store) and isinstance(component.id, dict):
+            sources[component.id['chart']] = component.data
+        elif hasattr(component, 'children'):
+            collect(component.children)
+    collect(response)
+    figures = {chart_id: client.get(f"/{source}").get_data() for chart_id, source in sources.items()}
+    return time.perf_counter() - start, size + sum(map(len, figures.values())), figures
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    warm_up_model()
+    session_id = f"bench-{uuid.uuid4().hex}"
+    batch_key = batch_store.make_key(session_id)
+    client = app.app.server.test_client()
+    try:
+        app.update_output([build_contents(build_frame(n_rows))], ['bench.csv'], session_id)
+        figure_cache.clear()
+        first, size, cached = click(session_id, client)
+
+        figure_cache.clear()
+        uncached, _, rebuilt = click(session_id, client)
+        repeat, _, _ = click(session_id, client)
+
+        # Serialização da maior figura (dispersão) por figure_to_json e pelo plotly.io
+        batch = batch_store.get(batch_key)
+        scatter = plotly_visibility_vs_sales(batch.sample_frame(), batch.aggregates())
+        fast = best_of(lambda: figure_to_json(scatter))
+        plotly = {engine: best_of(lambda: pio.to_json(scatter, validate=False, engine=engine))
+                  for engine in ('json', 'orjson')}
+        same_json = json.loads(figure_to_json(scatter)) == json.loads(pio.to_json(scatter, validate=False, engine='json'))
+    finally:
+        batch_store.clear(batch_key)
+
+    speedup = uncached / repeat
+    print(f"{n_rows:,} linhas, resposta + figuras: {size / 1e6:.1f} MB")
+    print(f"primeira exibição (pontuação + gráficos): {first:6.3f} s")
+    print(f"exibição repetida sem cache:              {uncached:6.3f} s")
+    print(f"exibição repetida com cache:              {repeat:6.3f} s ({speedup:.1f}x)")
+    print(f"serialização da dispersão: figure_to_json {fast * 1e3:.0f} ms, "
+          + ', '.join(f"plotly.io ({engine}) {seconds * 1e3:.0f} ms" for engine, seconds in plotly.items()))
+
+    failed = False
+    if sorted(cached) != sorted(BATCH_FIGURES) or cached != rebuilt or not same_json:
+        print("ERRO: figuras do cache diferem das montadas de novo ou das serializadas pelo plotly")
+        failed = True
+    if speedup < MIN_SPEEDUP:
+        print(f"ERRO: a exibição repetida com cache ficou abaixo de {MIN_SPEEDUP}x mais rápida")
+        failed = True
+    sys.exit(1 if failed else 0)
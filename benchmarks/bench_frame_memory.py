@@ -0,0 +1,55 @@
+"""
+Memória por linha do lote enviado: tipos padrão do pandas vs tipos compactos.
+
+Replica o bigmart_sales_test_cleaned.csv, lê o data URI como o dashboard faz
+(`read_uploaded_data`, com colunas categóricas de vocabulário fixo) e compara a memória
+por linha (`memory_usage(deep=True)`) com a leitura padrão do pandas (strings Python e
+float64). Também confere que as previsões são idênticas nos dois casos.
+
+Termina com código 1 se a redução ficar abaixo do mínimo pedido (5x por padrão).
+
+Uso:
+    python benchmarks/bench_frame_memory.py [n_replicas] [reducao_minima]
+"""
+import base64
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import REFERENCE_DATA_PATH, USER_COLUMNS, make_predictions, read_uploaded_data  # noqa: E402
+
+
+def bytes_per_row(frame):
+    return frame.memory_usage(deep=True, index=False).sum() / len(frame)
+
+
+if __name__ == '__main__':
+    n_replicas = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    min_reduction = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    reference = pd.read_csv(REFERENCE_DATA_PATH)[USER_COLUMNS]
+    payload = pd.concat([reference] * n_replicas, ignore_index=True).to_csv(index=False).encode('utf-8')
+    contents = 'data:text/csv;base64,' + base64.b64encode(payload).decode('ascii')
+
+    default = pd.read_csv(io.BytesIO(payload))
+    compact = read_uploaded_data(contents)
+
+    default_bytes, compact_bytes = bytes_per_row(default), bytes_per_row(compact)
+    reduction = default_bytes / compact_bytes
+    print(f"linhas:                {len(compact):,}")
+    print(f"tipos padrão:          {default_bytes:8.1f} bytes/linha")
+    print(f"tipos compactos:       {compact_bytes:8.1f} bytes/linha")
+    print(f"redução:               {reduction:8.1f}x (mínimo {min_reduction:.1f}x)")
+    for column in USER_COLUMNS:
+        print(f"  {column:<22} {default[column].memory_usage(deep=True, index=False) / len(default):7.1f}"
+              f" -> {compact[column].memory_usage(deep=True, index=False) / len(compact):5.1f} ({compact[column].dtype.name})")
+
+    identical = np.array_equal(make_predictions(default), make_predictions(compact))
+    print(f"previsões idênticas:   {'sim' if identical else 'não'}")
+
+    sys.exit(0 if reduction >= min_reduction and identical else 1)
@@ -0,0 +1,116 @@
+"""
+Benchmark dos lotes incrementais (vários arquivos acrescentados na mesma sessão).
+
+Envia `n_arquivos` arquivos de `n_linhas` linhas cada (o arquivo de teste replicado, com
+preços alterados a cada arquivo) pelo callback de upload e, após cada envio, executa o
+callback update_multiple_predictions, que pontua apenas o arquivo novo e mescla os
+agregados. Mede o tempo de cada acréscimo e, ao final, compara os agregados do lote com
+build_sales_aggregates sobre todas as linhas concatenadas.
+
+Termina com código 1 se o último acréscimo custar mais de MAX_GROWTH vezes o primeiro
+(o custo deve depender do tamanho do arquivo novo, e não do total acumulado), se as
+somas e contagens divergirem, se os quartis da visibilidade se afastarem do valor
+exato em mais de uma faixa do esboço ou se a leitura do lote feita a cada página da tabela
+de resultados e a cada download (`batch_store.get`) passar de MAX_PAGE_READ_MS.
+
+Uso:
+    python benchmarks/bench_incremental.py [n_arquivos] [n_linhas]
+"""
+import atexit
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Caches em disco em um diretório temporário: o benchmark não usa nem apaga os caches do servidor
+TEMP_CACHE_DIR = tempfile.mkdtemp(prefix='bigmart-cache-')
+atexit.register(shutil.rmtree, TEMP_CACHE_DIR, ignore_errors=True)
+os.environ.setdefault('BIGMART_CACHE_DIR', TEMP_CACHE_DIR)
+
+import app  # noqa: E402
+from bench_suite import build_contents, build_frame  # noqa: E402
+from helpers import (VISIBILITY_SKETCH_BINS, VISIBILITY_SKETCH_RANGE, batch_store, build_sales_aggregates,  # noqa: E402
+                     concat_frames, enrich_outlet_attributes, upload_store, warm_up_model)
+
+MAX_GROWTH = 1.5
+MAX_PAGE_READ_MS = 5
+
+
+def append_file(session_id, contents, filename):
+    app.update_output([contents], [filename], session_id)
+    return app.update_multiple_predictions(lambda progress: None, 1, session_id)
+
+
+if __name__ == '__main__':
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    n_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    warm_up_model()
+    session_id = f"bench-{uuid.uuid4().hex}"
+    batch_key = batch_store.make_key(session_id)
+    reference = build_frame(n_rows)
+
+    timings = []
+    try:
+        for day in range(n_files):
+            frame = reference.assign(Item_MRP=reference['Item_MRP'] * (1 + 0.01 * day))
+            contents = build_contents(frame)
+            start = time.perf_counter()
+            append_file(session_id, contents, f"dia_{day + 1}.csv")
+            timings.append(time.perf_counter() - start)
+            print(f"arquivo {day + 1}: {(day + 1) * n_rows:>10,} linhas no lote, acréscimo {timings[-1]:6.3f} s")
+
+        # Leitura feita pela paginação e pelo download: apenas a lista de arquivos do lote
+        reads = []
+        for _ in range(50):
+            start = time.perf_counter()
+            batch_store.get(batch_key).version
+            reads.append(time.perf_counter() - start)
+        page_read_ms = statistics.median(reads) * 1e3
+
+        # Agregados recalculados do zero sobre todas as linhas do lote
+        batch = batch_store.get(batch_key)
+        frames = []
+        for file in batch.files:
+            inputs = enrich_outlet_attributes(upload_store.get(file['key']))
+            predictions = upload_store.get(f"{file['key']}:predictions")
+            frames.append(inputs.assign(Item_Outlet_Sales=predictions['Item_Outlet_Sales'].to_numpy()))
+        full = concat_frames(frames)
+        expected = build_sales_aggregates(full)
+        merged = batch.aggregates()
+    finally:
+        batch_store.clear(batch_key)
+
+    # Quartis exatos por tipo de produto, para medir o erro do esboço
+    exact = [dict(zip(('q1', 'median', 'q3'), np.quantile(group.to_numpy(dtype=np.float64), [0.25, 0.5, 0.75])))
+             for _, group in full.groupby('Item_Type', observed=True, sort=True)['Item_Visibility']]
+    bin_width = (VISIBILITY_SKETCH_RANGE[1] - VISIBILITY_SKETCH_RANGE[0]) / VISIBILITY_SKETCH_BINS
+    quantile_error = max(abs(stats[key] - reference_stats[key])
+                         for stats, reference_stats in zip(merged['visibility_stats'], exact) for key in reference_stats)
+    totals_match = (merged['n_rows'] == len(full)
+                    and np.allclose(merged['sales_by_type'], expected['sales_by_type'])
+                    and np.array_equal(merged['outlet_type_count'], expected['outlet_type_count']))
+    growth = timings[-1] / timings[0]
+
+    print(f"último / primeiro acréscimo: {growth:.2f}x; erro máximo dos quartis {quantile_error:.2e} "
+          f"(faixa do esboço {bin_width:.2e}); leitura do lote por página {page_read_ms:.2f} ms")
+    failed = False
+    if growth > MAX_GROWTH:
+        print(f"ERRO: o custo do acréscimo cresceu com o tamanho do lote ({growth:.2f}x > {MAX_GROWTH}x)")
+        failed = True
+    if not totals_match:
+        print("ERRO: somas e contagens do lote divergem do cálculo sobre todas as linhas")
+        failed = True
+    if quantile_error > bin_width:
+        print("ERRO: quartis da visibilidade fora da tolerância do esboço")
+        failed = True
+    if page_read_ms > MAX_PAGE_READ_MS:
+        print(f"ERRO: a leitura do lote por página passou de {MAX_PAGE_READ_MS} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,62 @@
+"""
+Perfil de memória da leitura em blocos dos arquivos enviados.
+
+Replica o bigmart_sales_test_cleaned.csv até o tamanho pedido, monta o data URI em
+base64 (como o dcc.Upload envia) e mede, com tracemalloc, o pico de memória alocada
+além do próprio data URI em dois caminhos:
+
+- leitura antiga: split + b64decode do payload inteiro + decode para str + StringIO;
+- leitura em blocos: read_uploaded_data (o caminho do dashboard), que decodifica o base64 e
+  lê o CSV em blocos, com colunas categóricas compactas, seguida da pontuação do arquivo.
+
+Uso:
+    python benchmarks/bench_ingest_memory.py [n_replicas]
+"""
+import base64
+import io
+import os
+import sys
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import REFERENCE_DATA_PATH, make_predictions, read_uploaded_data, warm_up_model  # noqa: E402
+
+
+def build_contents(n_replicas):
+    with open(REFERENCE_DATA_PATH, 'rb') as f:
+        header, body = f.read().split(b'\n', 1)
+    payload = header + b'\n' + body * n_replicas
+    return 'data:text/csv;base64,' + base64.b64encode(payload).decode('ascii'), len(payload)
+
+
+def legacy_ingest(contents):
+    content_type, content_string = contents.split(',')
+    decoded = base64.b64decode(content_string)
+    data = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+    return len(make_predictions(data))
+
+
+def chunked_ingest(contents):
+    return len(make_predictions(read_uploaded_data(contents)))
+
+
+def peak_mb(func, *args):
+    tracemalloc.start()
+    n_rows = func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return n_rows, peak / 2**20
+
+
+if __name__ == '__main__':
+    n_replicas = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    warm_up_model()
+    contents, csv_bytes = build_contents(n_replicas)
+    print(f"CSV: {csv_bytes / 2**20:.1f} MB, data URI: {len(contents) / 2**20:.1f} MB")
+    for label, func, args in [('leitura antiga', legacy_ingest, (contents,)),
+                              ('leitura em blocos', chunked_ingest, (contents,))]:
+        n_rows, peak = peak_mb(func, *args)
+        print(f"{label:>20}: {n_rows} linhas, pico de {peak:8.1f} MB")
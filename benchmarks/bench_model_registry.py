@@ -0,0 +1,96 @@
+"""
+Micro-benchmark do registro de modelos.
+
+Compara o comportamento antigo (carregar o .pkl a cada chamada) com o registro de modelos,
+que carrega o artefato uma única vez por processo. Mede separadamente:
+
+- a obtenção do modelo (joblib.load x model_registry.get), que é o custo eliminado pelo registro;
+- a previsão individual completa (obtenção + pontuação), para situar esse custo no total.
+
+Cada medida é repetida em várias rodadas e reportada como mínimo / mediana / máximo, para que
+a diferença possa ser comparada com o ruído. Termina com código 1 se a obtenção pelo registro
+não for ao menos MIN_SPEEDUP vezes mais rápida em todas as rodadas (o máximo do registro contra
+o mínimo do joblib.load).
+
+Uso:
+    python benchmarks/bench_model_registry.py [n_chamadas] [rodadas]
+"""
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import load
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import MODEL_PATH, make_predictions, model_registry, warm_up_model  # noqa: E402
+
+MIN_SPEEDUP = 10
+
+USER_INPUT = {
+    'Outlet_Identifier': 'OUT049',
+    'Item_Identifier': 'FDA15',
+    'Item_Type': 'Dairy',
+    'Item_Fat_Content': 'Low_Fat',
+    'Item_Visibility': 0.016,
+    'Item_MRP': 249.81,
+}
+
+ROW = pd.DataFrame([{
+    **USER_INPUT,
+    'Outlet_Type': 'Supermarket_Type1',
+    'Outlet_Size': 'Medium',
+    'Outlet_Location_Type': 'Tier_1',
+    'Outlet_Years': 24,
+}])
+
+
+def predict_reloading():
+    # Comportamento anterior: desserializa o pipeline a cada chamada
+    lr_model = load(MODEL_PATH)
+    return np.square(lr_model.predict(ROW[lr_model.feature_names_in_]))
+
+
+def predict_registry():
+    return make_predictions(USER_INPUT)
+
+
+def time_per_call(func, n_calls, rounds):
+    """
+    Tempo por chamada (ms) em cada rodada: (mínimo, mediana, máximo).
+    """
+    func()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(n_calls):
+            func()
+        timings.append((time.perf_counter() - start) / n_calls * 1e3)
+    return min(timings), statistics.median(timings), max(timings)
+
+
+def show(label, timings):
+    print(f"{label:<34} {timings[0]:9.4f} / {timings[1]:9.4f} / {timings[2]:9.4f} ms/chamada")
+
+
+if __name__ == '__main__':
+    n_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    warm_up_model()
+
+    print(f"{'':<34} {'mínimo':>9} / {'mediana':>9} / {'máximo':>9}")
+    load_before = time_per_call(lambda: load(MODEL_PATH), n_calls, rounds)
+    load_after = time_per_call(model_registry.get, n_calls * 100, rounds)
+    show('obtenção: joblib.load', load_before)
+    show('obtenção: model_registry.get', load_after)
+    show('previsão: joblib.load a cada chamada', time_per_call(predict_reloading, n_calls, rounds))
+    show('previsão: registro de modelos', time_per_call(predict_registry, n_calls, rounds))
+
+    speedup = load_before[0] / load_after[2]
+    print(f"obtenção do modelo, pior rodada do registro x melhor do joblib.load: {speedup:,.0f}x")
+    if speedup < MIN_SPEEDUP:
+        print(f"ERRO: o registro não tornou a obtenção do modelo {MIN_SPEEDUP}x mais rápida")
+        sys.exit(1)
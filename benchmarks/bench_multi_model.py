@@ -0,0 +1,103 @@
+"""
+Benchmark da comparação de modelos (compare_models) em um pool de threads.
+
+Treina um XGBRegressor temporário sobre o pré-processador da regressão linear, usando
+como alvo as previsões da própria regressão em log(1 + vendas) com ruído (o repositório
+não inclui o conjunto de treino), e o registra ao lado do modelo padrão. Em seguida
+compara, para um lote replicado até `n_linhas`:
+
+- a pontuação sequencial, um modelo após o outro;
+- compare_models, que pontua os modelos em paralelo.
+
+O tempo paralelo deve ficar próximo ao do modelo mais lento; com uma única CPU não há
+ganho a esperar. O script termina com código 1 se as previsões de compare_models
+divergirem da pontuação sequencial.
+
+Uso:
+    python benchmarks/bench_multi_model.py [n_linhas] [--keep]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import dump
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import (DEFAULT_MODEL, REFERENCE_DATA_PATH, USER_COLUMNS, compare_models,  # noqa: E402
+                     enrich_outlet_attributes, make_predictions, model_registry, register_model,
+                     warm_up_model)
+
+
+def train_booster(path):
+    """
+    Treina e salva em `path` um pipeline (pré-processador da regressão + XGBRegressor).
+    """
+    from sklearn.base import clone
+    from sklearn.pipeline import Pipeline
+    from xgboost import XGBRegressor
+
+    linear = model_registry.get()
+    reference = enrich_outlet_attributes(pd.read_csv(REFERENCE_DATA_PATH)[USER_COLUMNS])
+    features = reference[linear.feature_names_in_]
+    rng = np.random.default_rng(0)
+    sales = np.square(linear.predict(features)) * rng.lognormal(0.0, 0.15, len(features))
+    pipeline = Pipeline([
+        ('preprocessor', clone(linear.named_steps['preprocessor'])),
+        ('booster', XGBRegressor(n_estimators=300, max_depth=6, learning_rate=0.1, n_jobs=1)),
+    ])
+    pipeline.fit(features, np.log1p(sales))
+    dump(pipeline, path)
+
+
+def build_frame(n_rows):
+    reference = pd.read_csv(REFERENCE_DATA_PATH)[USER_COLUMNS]
+    n_replicas = -(-n_rows // len(reference))
+    return pd.concat([reference] * n_replicas, ignore_index=True).iloc[:n_rows]
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    n_rows = int(args[0]) if args else 100_000
+    workdir = tempfile.mkdtemp(prefix='bigmart-models-')
+    booster_path = os.path.join(workdir, 'xgboost_model.pkl')
+
+    train_booster(booster_path)
+    register_model('xgboost', booster_path, 'log1p', label='XGBoost')
+    warm_up_model()
+    models = [DEFAULT_MODEL, 'xgboost']
+    frame = build_frame(n_rows)
+
+    single = {}
+    for name in models:
+        single[name], _ = best_of(lambda: make_predictions(frame, model=name))
+    sequential, expected = best_of(lambda: [make_predictions(frame, model=name) for name in models])
+    parallel, (predictions, stats) = best_of(lambda: compare_models(frame, models))
+
+    print(f"{n_rows:,} linhas, {os.cpu_count()} CPU(s)")
+    for name in models:
+        print(f"  {name:<20} {single[name]:8.3f} s")
+    print(f"  {'sequencial':<20} {sequential:8.3f} s")
+    print(f"  {'compare_models':<20} {parallel:8.3f} s  "
+          f"({parallel / max(single.values()):.2f}x o modelo mais lento)")
+    print(stats['pairwise'].to_string(index=False))
+
+    if '--keep' not in sys.argv:
+        os.remove(booster_path)
+        os.rmdir(workdir)
+    identical = all(np.array_equal(predictions[name].to_numpy(), values) for name, values in zip(models, expected))
+    if not identical:
+        print("ERRO: as previsões de compare_models divergem da pontuação sequencial")
+        sys.exit(1)
@@ -0,0 +1,89 @@
+"""
+Verifica que os gráficos não alteram o DataFrame de resultados e mede o pico de alocação.
+
+Monta o DataFrame de resultados como o callback de previsões múltiplas (lote replicado do
+bigmart_sales_test_cleaned.csv, com os atributos das lojas e as previsões) e, para cada
+gráfico, confere com um hash das colunas que a entrada não mudou e mede com tracemalloc
+o pico de memória alocada (construção e serialização da figura). O gráfico de visibilidade vs. vendas é comparado com a versão
+anterior, que gravava 'Sales Percentage' no DataFrame e enviava a linha de tendência com
+um ponto por linha.
+
+Termina com código 1 se algum gráfico alterar a entrada ou se o pico não diminuir.
+
+Uso:
+    python benchmarks/bench_plot_allocations.py [n_replicas]
+"""
+import base64
+import os
+import sys
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import (REFERENCE_DATA_PATH, USER_COLUMNS, build_sales_aggregates, enrich_outlet_attributes,  # noqa: E402
+                     make_predictions, plot_visibility_boxplot, plotly_sales_by_category,
+                     plotly_sales_over_outlet, plotly_visibility_vs_sales, read_uploaded_data)
+
+
+def legacy_visibility_vs_sales(df, aggregates):
+    # Versão anterior: grava a coluna no DataFrame do chamador e passa o DataFrame inteiro ao plotly
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    df['Sales Percentage'] = df['Item_Outlet_Sales'] / aggregates['total_sales'] * 100
+    fig = px.scatter(df, x='Item_Visibility', y='Item_Outlet_Sales', size='Sales Percentage', color='Item_Type',
+                     color_discrete_map=aggregates['color_map'], hover_data=['Item_Identifier', 'Outlet_Identifier'],
+                     facet_col='Outlet_Type', facet_col_wrap=2)
+    fig.add_trace(go.Scatter(x=df['Item_Visibility'], y=df['Item_Visibility'] * aggregates['mean_sales'], mode='lines'))
+    return fig
+
+
+def frame_fingerprint(frame):
+    return list(frame.columns), int(pd.util.hash_pandas_object(frame, index=True).sum())
+
+
+def peak_allocation(func, *args):
+    # Inclui a serialização para JSON, que o Dash faz ao enviar a figura ao navegador
+    tracemalloc.start()
+    try:
+        func(*args).to_json()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    n_replicas = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    reference = pd.read_csv(REFERENCE_DATA_PATH)[USER_COLUMNS]
+    payload = pd.concat([reference] * n_replicas, ignore_index=True).to_csv(index=False).encode('utf-8')
+    result_df = enrich_outlet_attributes(read_uploaded_data('data:text/csv;base64,' + base64.b64encode(payload).decode('ascii')))
+    result_df['Item_Outlet_Sales'] = make_predictions(result_df).round(2)
+    aggregates = build_sales_aggregates(result_df)
+    # Aquece os imports do plotly, para que não entrem na medição
+    plotly_sales_by_category(aggregates)
+
+    ok = True
+    print(f"{'gráfico':<30} {'entrada intacta':>16} {'pico (MB)':>10}")
+    cases = [
+        ('plotly_sales_by_category', plotly_sales_by_category, (aggregates,)),
+        ('plotly_sales_over_outlet', plotly_sales_over_outlet, (aggregates,)),
+        ('plot_visibility_boxplot', plot_visibility_boxplot, (aggregates,)),
+        ('plotly_visibility_vs_sales', plotly_visibility_vs_sales, (result_df, aggregates)),
+    ]
+    for name, func, args in cases:
+        before = frame_fingerprint(result_df)
+        peak = peak_allocation(func, *args)
+        unchanged = frame_fingerprint(result_df) == before
+        ok &= unchanged
+        print(f"{name:<30} {'sim' if unchanged else 'NÃO':>16} {peak / 2**20:>10.1f}")
+
+    current = peak_allocation(plotly_visibility_vs_sales, result_df, aggregates)
+    legacy = peak_allocation(legacy_visibility_vs_sales, result_df.copy(deep=False), aggregates)
+    ok &= current < legacy
+    print(f"\nvisibilidade vs. vendas ({len(result_df):,} linhas): "
+          f"{legacy / 2**20:.1f} MB (anterior) -> {current / 2**20:.1f} MB")
+
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,85 @@
+"""
+Mede a vazão (requisições/s) de um servidor do dashboard em execução.
+
+Dispara, com várias threads em paralelo, o callback da simulação de cenários
+(POST /_dash-update-component), variando a Item_Visibility a cada requisição. A
+previsão individual é avaliada no navegador e só passa pelo servidor quando o modelo
+exportado (export_client_model.py) está ausente.
+
+Uso:
+    python benchmarks/bench_server_throughput.py [url_base] [concorrência] [segundos]
+
+Exemplo comparando o servidor de desenvolvimento com o gunicorn:
+    python app.py                                   # servidor de desenvolvimento, porta 8050
+    gunicorn -c gunicorn.conf.py wsgi:server        # produção, porta 8050
+    python benchmarks/bench_server_throughput.py http://127.0.0.1:8050 32 20
+"""
+import itertools
+import sys
+import threading
+import time
+
+import requests
+
+
+def callback_payload(item_visibility):
+    return {
+        'output': 'sweep-output.children',
+        'outputs': {'id': 'sweep-output', 'property': 'children'},
+        'inputs': [{'id': 'sweep-button', 'property': 'n_clicks', 'value': 1}],
+        'state': [
+            {'id': 'dropdown-Outlet_Identifier', 'property': 'value', 'value': 'OUT049'},
+            {'id': 'dropdown-Item_Identifier', 'property': 'value', 'value': 'FDA15'},
+            {'id': 'dropdown-Item_Type', 'property': 'value', 'value': 'Dairy'},
+            {'id': 'dropdown-Item_Fat_Content', 'property': 'value', 'value': 'Low_Fat'},
+            {'id': 'input-Item_Visibility', 'property': 'value', 'value': item_visibility},
+            {'id': 'input-Item_MRP', 'property': 'value', 'value': 249.81},
+            {'id': 'sweep-mrp-range', 'property': 'value', 'value': [30, 270]},
+            {'id': 'sweep-visibility-range', 'property': 'value', 'value': [0, 0.3]},
+            {'id': 'sweep-all-outlets', 'property': 'value', 'value': []},
+        ],
+        'changedPropIds': ['sweep-button.n_clicks'],
+    }
+
+
+def run(base_url, concurrency, duration):
+    url = base_url.rstrip('/') + '/_dash-update-component'
+    counter = itertools.count()
+    deadline = time.monotonic() + duration
+    completed, errors, latencies = [0], [0], []
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            item_visibility = (next(counter) % 300_000) / 1_000_000
+            start = time.perf_counter()
+            response = session.post(url, json=callback_payload(item_visibility))
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code == 200:
+                    completed[0] += 1
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e3 if latencies else float('nan')
+    p95 = latencies[int(len(latencies) * 0.95)] * 1e3 if latencies else float('nan')
+    print(f"{completed[0]} requisições em {elapsed:.1f} s ({errors[0]} erros)")
+    print(f"vazão: {completed[0] / elapsed:.1f} req/s | p50: {p50:.1f} ms | p95: {p95:.1f} ms")
+
+
+if __name__ == '__main__':
+    base_url = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:8050'
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 20
+    run(base_url, concurrency, duration)
@@ -0,0 +1,291 @@
+"""
+Suíte de benchmarks da leitura, da pontuação e dos gráficos em escala.
+
+Replica o bigmart_sales_test_cleaned.csv até cada tamanho pedido (10k, 100k e 1M
+linhas por padrão) e mede, para cada etapa:
+
+- read_uploaded_data: leitura do data URI em base64 enviado pelo dcc.Upload;
+- make_predictions: caminho do dicionário (listas por coluna) e do DataFrame;
+- build_sales_aggregates e os quatro gráficos do dashboard;
+- o callback update_multiple_predictions completo.
+
+Cada caso roda em um processo filho (fork) para que o pico de memória (RSS) seja
+medido isoladamente. São registrados o tempo de parede (o menor entre as repetições),
+o pico de RSS acima do nível anterior ao caso e o tamanho da resposta serializada
+em JSON (quando a etapa produz algo que é enviado ao navegador). A memória dos
+workers do pool de pontuação (acima de BIGMART_SHARD_ROWS linhas) não entra no RSS.
+
+Os resultados são salvos em JSON e comparados com uma linha de base; o script
+termina com código 1 se algum caso ficar mais lento ou usar mais memória do que a
+tolerância permite.
+
+Uso:
+    python benchmarks/bench_suite.py [--sizes 10000,100000,1000000] [--repeat 3]
+                                     [--output benchmarks/results.json]
+                                     [--baseline benchmarks/baseline.json]
+                                     [--tolerance 0.25] [--update-baseline]
+                                     [--only make_predictions_frame,...]
+"""
+import argparse
+import atexit
+import base64
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Caches em disco em um diretório temporário: o benchmark não usa nem apaga os caches do servidor
+TEMP_CACHE_DIR = tempfile.mkdtemp(prefix='bigmart-cache-')
+atexit.register(shutil.rmtree, TEMP_CACHE_DIR, ignore_errors=True)
+os.environ.setdefault('BIGMART_CACHE_DIR', TEMP_CACHE_DIR)
+
+import app  # noqa: E402
+from helpers import (REFERENCE_DATA_PATH, USER_COLUMNS, batch_store, build_sales_aggregates, enrich_outlet_attributes,  # noqa: E402
+                     figure_cache, make_predictions, plot_visibility_boxplot, plotly_sales_by_category,
+                     plotly_sales_over_outlet, plotly_visibility_vs_sales, read_uploaded_data,
+                     upload_store, validate_upload, warm_up_model)
+from plotly.io.json import to_json_plotly  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+# Diferenças absolutas abaixo destes limites são tratadas como ruído na comparação
+MIN_WALL_DELTA_S = 0.005
+MIN_RSS_DELTA_MB = 8.0
+
+
+def build_frame(n_rows):
+    """
+    Replica os dados de referência até `n_rows` linhas (apenas as colunas enviadas pelo usuário).
+    """
+    reference = pd.read_csv(REFERENCE_DATA_PATH)[USER_COLUMNS]
+    n_replicas = -(-n_rows // len(reference))
+    return pd.concat([reference] * n_replicas, ignore_index=True).iloc[:n_rows]
+
+
+def build_contents(frame):
+    payload = frame.to_csv(index=False).encode('utf-8')
+    return 'data:text/csv;base64,' + base64.b64encode(payload).decode('ascii')
+
+
+def json_size(obj):
+    return len(to_json_plotly(obj).encode('utf-8'))
+
+
+# Memória residente do processo, em MB (Linux: /proc; demais sistemas: getrusage)
+def _read_status(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """
+    Zera o pico de RSS do processo (Linux), para que o pico medido seja só o do caso.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def current_rss_mb():
+    rss = _read_status('VmRSS')
+    return rss if rss is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def peak_rss_mb():
+    peak = _read_status('VmHWM')
+    return peak if peak is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_batch_callback(session_id, upload_key, report):
+    """
+    Executa update_multiple_predictions sobre um lote novo da sessão contendo apenas `upload_key`,
+    com o cache de figuras vazio (mede o caminho completo, com os quatro gráficos montados).
+    """
+    batch_key = batch_store.make_key(session_id)
+    batch_store.clear(batch_key)
+    figure_cache.clear()
+    batch_store.update(batch_key, lambda batch: batch.add_file(upload_key, 'bench.csv', report))
+    return app.update_multiple_predictions(lambda progress: None, 1, session_id)
+
+
+def make_cases(frame, contents):
+    """
+    Retorna {nome: (setup, run)}: `setup()` prepara as entradas fora da medição e
+    `run(state)` executa a etapa medida, retornando a resposta a serializar (ou None).
+    """
+    def enriched():
+        return enrich_outlet_attributes(frame)
+
+    def with_aggregates():
+        result_df = enriched()
+        result_df['Item_Outlet_Sales'] = make_predictions(result_df).round(2)
+        return result_df, build_sales_aggregates(result_df)
+
+    def callback_setup():
+        upload_key = upload_store.make_key('bench', contents)
+        upload_store.put(upload_key, frame)
+        return upload_key, validate_upload(frame)
+
+    def run_callback(state):
+        # Cada repetição pontua o arquivo em um lote novo (o lote só pontua arquivos pendentes)
+        return run_batch_callback('bench', *state)
+
+    return {
+        'read_uploaded_data': (lambda: contents, lambda state: (read_uploaded_data(state), None)[1]),
+        'make_predictions_dict': (lambda: frame.to_dict('list'), lambda state: make_predictions(state).tolist()),
+        'make_predictions_frame': (lambda: frame, lambda state: make_predictions(state).tolist()),
+        'build_sales_aggregates': (lambda: with_aggregates()[0], lambda state: (build_sales_aggregates(state), None)[1]),
+        'plotly_sales_by_category': (lambda: with_aggregates()[1], plotly_sales_by_category),
+        'plotly_sales_over_outlet': (lambda: with_aggregates()[1], plotly_sales_over_outlet),
+        'plot_visibility_boxplot': (lambda: with_aggregates()[1], plot_visibility_boxplot),
+        'plotly_visibility_vs_sales': (with_aggregates, lambda state: plotly_visibility_vs_sales(*state)),
+        'update_multiple_predictions': (callback_setup, run_callback),
+    }
+
+
+def _run_case(setup, run, repeat, queue):
+    try:
+        state = setup()
+        rss_before = current_rss_mb()
+        reset_peak_rss()
+        timings = []
+        response = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = run(state)
+            timings.append(time.perf_counter() - start)
+        queue.put({
+            'wall_s': min(timings),
+            'peak_rss_mb': max(peak_rss_mb() - rss_before, 0.0),
+            'response_bytes': json_size(response) if response is not None else None,
+        })
+    except Exception as e:  # noqa: BLE001 - o erro é reportado no resultado do caso
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def run_case(setup, run, repeat):
+    """
+    Executa um caso em um processo filho (fork) e retorna suas métricas.
+    """
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_case, args=(setup, run, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compara os resultados com a linha de base e retorna a lista de regressões encontradas.
+    """
+    reference = {(r['case'], r['rows']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        base = reference.get((result['case'], result['rows']))
+        if base is None or 'error' in result or 'error' in base:
+            continue
+        for metric, floor in (('wall_s', MIN_WALL_DELTA_S), ('peak_rss_mb', MIN_RSS_DELTA_MB)):
+            current, previous = result[metric], base[metric]
+            if current - previous > floor and current > previous * (1 + tolerance):
+                increase = f" (+{(current / previous - 1) * 100:.0f}%)" if previous > 0 else ''
+                regressions.append(f"{result['case']} @ {result['rows']:,} linhas: {metric} "
+                                   f"{previous:.3f} -> {current:.3f}{increase}")
+    return regressions
+
+
+def print_table(results, baseline):
+    reference = {(r['case'], r['rows']): r for r in baseline.get('results', [])}
+    print(f"{'caso':<30} {'linhas':>10} {'tempo (s)':>10} {'base (s)':>10} {'RSS (MB)':>10} {'resposta (KB)':>14}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['case']:<30} {result['rows']:>10,} ERRO: {result['error']}")
+            continue
+        base = reference.get((result['case'], result['rows']), {})
+        base_wall = f"{base['wall_s']:.3f}" if 'wall_s' in base else '-'
+        size = f"{result['response_bytes'] / 1024:,.0f}" if result['response_bytes'] is not None else '-'
+        print(f"{result['case']:<30} {result['rows']:>10,} {result['wall_s']:>10.3f} {base_wall:>10} "
+              f"{result['peak_rss_mb']:>10.1f} {size:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Suíte de benchmarks da leitura, pontuação e gráficos.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', default='', help='casos a executar, separados por vírgula')
+    parser.add_argument('--output', default=os.path.join(BENCH_DIR, 'results.json'))
+    parser.add_argument('--baseline', default=os.path.join(BENCH_DIR, 'baseline.json'))
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--update-baseline', action='store_true', help='grava os resultados como a nova linha de base')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    only = {name for name in args.only.split(',') if name}
+    warm_up_model()
+
+    results = []
+    for n_rows in sizes:
+        contents = build_contents(build_frame(n_rows))
+        # As demais etapas recebem o lote como o dashboard o armazena (tipos compactos da leitura)
+        frame = read_uploaded_data(contents)
+        for name, (setup, run) in make_cases(frame, contents).items():
+            if only and name not in only:
+                continue
+            results.append({'case': name, 'rows': n_rows, **run_case(setup, run, args.repeat)})
+            print(f"  {name} @ {n_rows:,}: ok", file=sys.stderr)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nlinha de base atualizada: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nregressões acima de {args.tolerance:.0%} em relação à linha de base:")
+        for regression in regressions:
+            print(f"- {regression}")
+        return 1
+    print(f"\nresultados salvos em {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Custo da validação dos uploads (validate_upload) em relação ao callback de previsões múltiplas.
+
+Replica o arquivo de teste até `n_linhas`, lê o lote como o dashboard (read_uploaded_data) e
+mede o tempo da validação e do callback update_multiple_predictions completo, para um arquivo
+limpo e para um com 1% das linhas inválidas (preço fora do intervalo, loja desconhecida e
+valores não numéricos). Termina com código 1 se a validação passar de 5% do tempo do callback.
+
+Uso:
+    python benchmarks/bench_validation.py [n_linhas]
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Caches em disco em um diretório temporário: o benchmark não usa nem apaga os caches do servidor
+TEMP_CACHE_DIR = tempfile.mkdtemp(prefix='bigmart-cache-')
+atexit.register(shutil.rmtree, TEMP_CACHE_DIR, ignore_errors=True)
+os.environ.setdefault('BIGMART_CACHE_DIR', TEMP_CACHE_DIR)
+
+from bench_suite import build_contents, build_frame, run_batch_callback  # noqa: E402
+from helpers import read_uploaded_data, upload_store, validate_upload, warm_up_model  # noqa: E402
+
+MAX_OVERHEAD = 0.05
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def corrupt(frame, fraction=0.01, seed=0):
+    """
+    Torna inválidas `fraction` das linhas, alternando entre três tipos de erro.
+    """
+    frame = frame.astype({'Item_MRP': object, 'Outlet_Identifier': object})
+    rows = np.random.default_rng(seed).choice(len(frame), int(len(frame) * fraction), replace=False)
+    frame.loc[rows[0::3], 'Item_MRP'] = 1500.0
+    frame.loc[rows[1::3], 'Outlet_Identifier'] = 'OUT999'
+    frame.loc[rows[2::3], 'Item_MRP'] = 'n/a'
+    return frame
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    warm_up_model()
+    reference = build_frame(n_rows)
+    failed = False
+    for label, frame in (('limpo', reference), ('1% inválidas', corrupt(reference))):
+        contents = build_contents(frame)
+        loaded = read_uploaded_data(contents)
+        upload_key = upload_store.make_key('bench', contents)
+        upload_store.put(upload_key, loaded)
+
+        report = validate_upload(loaded)
+        validation = best_of(lambda: validate_upload(loaded))
+        callback = best_of(lambda: run_batch_callback('bench', upload_key, report))
+        overhead = validation / callback
+        failed |= overhead > MAX_OVERHEAD
+        print(f"{label:<14} {n_rows:,} linhas ({report['n_invalid']:,} inválidas): validação {validation * 1e3:7.1f} ms, "
+              f"callback {callback:6.3f} s, custo {overhead:.1%}")
+
+    if failed:
+        print(f"ERRO: a validação passou de {MAX_OVERHEAD:.0%} do tempo do callback")
+        sys.exit(1)
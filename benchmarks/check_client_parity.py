@@ -0,0 +1,126 @@
+"""
+Verificação de paridade entre a previsão individual no navegador e a do servidor.
+
+Avalia, com o Node, a função `predict` de assets/clientside.js sobre o modelo exportado
+por build_client_model, para cada linha de bigmart_sales_test_cleaned.csv, e compara com:
+
+- a previsão individual do servidor (predict_single);
+- o valor exato do modelo, calculado em aritmética racional sobre a matriz de projeto do
+  pontuador compilado (CompiledLinearScorer.exact_output).
+
+O navegador e o servidor avaliam a mesma forma reescrita do modelo, na mesma ordem de
+operações; as únicas diferenças possíveis vêm de funções de biblioteca (Math.expm1 na
+transformação log1p) e do arredondamento das entradas (toFixed no navegador, round no Python),
+que podem divergir em um ulp. A verificação exige:
+
+- |navegador - servidor| <= PARITY_TOLERANCE (R$ 0,000001, muito abaixo do centavo exibido);
+- |navegador - exato| <= EXACT_RELATIVE_TOLERANCE x |exato|.
+
+Termina com código 1 se alguma linha falhar.
+
+Uso:
+    python benchmarks/check_client_parity.py [--model-file assets/bigmart_model.json] [--node /usr/bin/node]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from helpers import (CLIENT_MODEL_PATH, REFERENCE_DATA_PATH, USER_COLUMNS, build_client_model,  # noqa: E402
+                     client_model_digest, enrich_outlet_attributes, get_model_spec, model_registry,
+                     normalize_single_input, predict_single)
+
+CLIENTSIDE_JS = os.path.join(ROOT, 'assets', 'clientside.js')
+
+# Diferença máxima aceita entre o navegador e o servidor, em reais
+PARITY_TOLERANCE = 1e-6
+# Erro relativo máximo aceito entre o navegador e o valor exato do modelo
+EXACT_RELATIVE_TOLERANCE = 1e-9
+
+NODE_DRIVER = """
+const {predict} = require(process.argv[1]);
+let data = '';
+process.stdin.on('data', chunk => data += chunk).on('end', () => {
+    const {model, rows} = JSON.parse(data);
+    process.stdout.write(JSON.stringify(rows.map(row => predict(model, row))));
+});
+"""
+
+
+def load_rows():
+    """
+    Linhas de referência já normalizadas como na previsão individual (visibilidade com 6 casas,
+    preço com 2 casas).
+    """
+    rows = pd.read_csv(REFERENCE_DATA_PATH)[USER_COLUMNS].to_dict('records')
+    keys = ('Outlet_Identifier', 'Item_Identifier', 'Item_Type', 'Item_Fat_Content', 'Item_Visibility', 'Item_MRP')
+    return [dict(zip(keys, normalize_single_input(row))) for row in rows]
+
+
+def exact_predictions(rows):
+    """
+    Valor exato do modelo para cada linha (produto escalar racional sobre a matriz de projeto).
+    """
+    spec = get_model_spec()
+    scorer = model_registry.get_scorer(spec.path)
+    frame = enrich_outlet_attributes(pd.DataFrame(rows))
+    return spec.inverse_transform(scorer.exact_output(frame[scorer.feature_names_in_]))
+
+
+def client_predictions(node, model, rows):
+    completed = subprocess.run([node, '-e', NODE_DRIVER, CLIENTSIDE_JS], input=json.dumps({'model': model, 'rows': rows}),
+                               capture_output=True, text=True, check=True)
+    return np.array(json.loads(completed.stdout))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Paridade da previsão individual no navegador com o servidor.')
+    parser.add_argument('--model-file', default=CLIENT_MODEL_PATH,
+                        help='modelo exportado (padrão: o servido em assets/; gere com export_client_model.py)')
+    parser.add_argument('--node', default=shutil.which('node') or 'node')
+    args = parser.parse_args()
+
+    if build_client_model() is None:
+        print("ERRO: o modelo padrão não é compilável e não pode ser exportado para o navegador")
+        return 1
+    try:
+        with open(args.model_file) as f:
+            model = json.load(f)
+    except OSError as e:
+        print(f"ERRO: modelo exportado indisponível ({e}); execute python export_client_model.py")
+        return 1
+    if model['digest'] != client_model_digest():
+        print(f"ERRO: {args.model_file} foi gerado para outro modelo; execute python export_client_model.py")
+        return 1
+
+    rows = load_rows()
+    client = client_predictions(args.node, model, rows)
+    server = np.array([predict_single(row) for row in rows])
+    exact = exact_predictions(rows)
+
+    server_gap = np.abs(client - server)
+    exact_gap = np.abs(client - exact)
+    failures = (server_gap > PARITY_TOLERANCE) | (exact_gap > EXACT_RELATIVE_TOLERANCE * np.abs(exact))
+
+    print(f"{len(rows):,} linhas, modelo exportado com {os.path.getsize(args.model_file):,} bytes")
+    print(f"  navegador - servidor: máx {server_gap.max():.3e} (tolerância {PARITY_TOLERANCE:.0e}); "
+          f"{(np.round(client, 2) == np.round(server, 2)).mean():.1%} iguais em centavos")
+    print(f"  navegador - exato:    máx {exact_gap.max():.3e}")
+    print(f"  servidor  - exato:    máx {np.abs(server - exact).max():.3e}")
+    if failures.any():
+        print(f"ERRO: {failures.sum()} linhas fora da tolerância, por exemplo: {rows[int(np.argmax(failures))]}")
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Mede o tempo de inicialização a frio do app (`import app`) num processo novo.
+
+Executa `python -X importtime -c "import app"`, lista os pacotes mais caros e
+termina com código 1 quando o tempo total ultrapassa o orçamento, para uso em CI.
+
+Uso:
+    python benchmarks/import_time.py [--budget 3.0] [--top 15]
+
+O orçamento (em segundos) também pode ser definido por BIGMART_IMPORT_BUDGET.
+A primeira execução após trocar o modelo ou o código de helpers.py preenche o cache do pontuador compilado
+(.cache/models) e por isso é mais lenta; meça a partir da segunda.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependências pesadas que não deveriam ser importadas na inicialização
+LAZY_MODULES = ('sklearn', 'plotly.express', 'plotly.graph_objects', 'joblib')
+
+
+def parse_importtime(stderr):
+    """
+    Converte a saída de `-X importtime` em um dicionário {módulo: cumulativo_us}.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede o tempo de `import app` num processo novo.')
+    parser.add_argument('--budget', type=float, default=float(os.environ.get('BIGMART_IMPORT_BUDGET', 3.0)))
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        return result.returncode
+
+    modules = parse_importtime(result.stderr)
+
+    # Custo de cada pacote de primeiro nível (o maior cumulativo entre seus submódulos)
+    packages = {}
+    for name, cumulative in modules.items():
+        root = name.split('.')[0]
+        if root != 'app':
+            packages[root] = max(packages.get(root, 0), cumulative)
+
+    print(f"{'pacote':<30} {'cumulativo (s)':>15}")
+    for root, cumulative in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{root:<30} {cumulative / 1e6:>15.3f}")
+
+    print()
+    for module in LAZY_MODULES:
+        print(f"{module:<30} {'importado' if module in modules else 'adiado'}")
+
+    print(f"\ntempo total do processo: {elapsed:.2f}s (orçamento {args.budget:.2f}s)")
+    return 0 if elapsed <= args.budget else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
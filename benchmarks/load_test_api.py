@@ -0,0 +1,155 @@
+"""
+Teste de carga da API JSON de previsões (POST /api/predict) com e sem micro-lotes.
+
+Sobe o servidor do dashboard (werkzeug, uma thread por requisição) em um subprocesso para
+cada tamanho máximo de micro-lote (BIGMART_API_BATCH_SIZE; 1 desativa o agrupamento) e
+dispara requisições de um registro cada, com várias threads em paralelo e conexões
+persistentes. Mede a vazão, as latências p50/p99 e o tamanho médio dos micro-lotes (pelos
+contadores de /metrics).
+
+Termina com código 1 se alguma resposta divergir de make_predictions sobre todos os registros
+de uma vez (as previsões não podem depender da composição do lote) ou se, na maior
+concorrência, os micro-lotes não aumentarem a vazão.
+
+Uso:
+    python benchmarks/load_test_api.py [segundos_por_rodada] [concorrência ...]
+"""
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from helpers import API_MAX_BATCH_SIZE, REFERENCE_DATA_PATH, USER_COLUMNS, make_predictions  # noqa: E402
+
+SERVER = """
+import sys
+from werkzeug.serving import make_server
+from app import app
+make_server('127.0.0.1', int(sys.argv[1]), app.server, threaded=True).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(batch_size):
+    port = free_port()
+    env = dict(os.environ, BIGMART_API_BATCH_SIZE=str(batch_size))
+    process = subprocess.Popen([sys.executable, '-c', SERVER, str(port)], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('o servidor não respondeu em 60 s')
+
+
+def api_counters(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('GET', '/metrics')
+    text = connection.getresponse().read().decode()
+    connection.close()
+    counters = {}
+    for name in ('bigmart_api_batches_total', 'bigmart_api_records_total'):
+        match = re.search(rf"^{name} (\S+)$", text, re.M)
+        counters[name] = float(match.group(1)) if match else 0.0
+    return counters
+
+
+def run(port, records, concurrency, duration):
+    """
+    Requisições de um registro cada, em `concurrency` threads durante `duration` segundos.
+    Devolve (requisições/s, latências em s, {índice do registro: previsão}).
+    """
+    deadline = time.monotonic() + duration
+    latencies, answers, errors = [], {}, [0]
+    lock = threading.Lock()
+
+    def worker(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        i = offset
+        while time.monotonic() < deadline:
+            index = i % len(records)
+            body = json.dumps(records[index])
+            start = time.perf_counter()
+            connection.request('POST', '/api/predict', body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            payload = json.loads(response.read())
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status == 200:
+                    latencies.append(elapsed)
+                    answers.setdefault(index, set()).add(payload['Item_Outlet_Sales'])
+                else:
+                    errors[0] += 1
+            i += concurrency
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(concurrency)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    if errors[0]:
+        print(f"  {errors[0]} requisições com erro")
+    return len(latencies) / elapsed, np.array(latencies), answers
+
+
+if __name__ == '__main__':
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    levels = [int(level) for level in sys.argv[2:]] or [1, 8, 32, 64]
+    records = json.loads(pd.read_csv(REFERENCE_DATA_PATH)[USER_COLUMNS].head(500).to_json(orient='records'))
+    # Previsões esperadas: todos os registros em um único lote, como no download do dashboard
+    expected = make_predictions(pd.DataFrame.from_records(records, columns=USER_COLUMNS))
+
+    throughput, mismatched = {}, 0
+    for batch_size in (1, API_MAX_BATCH_SIZE):
+        process, port = start_server(batch_size)
+        try:
+            run(port, records, 4, 1)  # aquecimento (importações, modelo, threads)
+            for concurrency in levels:
+                before = api_counters(port)
+                rate, latencies, answers = run(port, records, concurrency, duration)
+                after = api_counters(port)
+                batches = after['bigmart_api_batches_total'] - before['bigmart_api_batches_total']
+                mean_batch = (after['bigmart_api_records_total'] - before['bigmart_api_records_total']) / max(batches, 1)
+                mismatched += sum(values != {float(expected[index])} for index, values in answers.items())
+                throughput[batch_size, concurrency] = rate
+                print(f"lote máx. {batch_size:>4} | concorrência {concurrency:>3}: {rate:8.1f} req/s | "
+                      f"p50 {np.percentile(latencies, 50) * 1e3:6.1f} ms | p99 {np.percentile(latencies, 99) * 1e3:6.1f} ms | "
+                      f"lote médio {mean_batch:5.1f}")
+        finally:
+            process.kill()
+            process.wait()
+
+    top = max(levels)
+    speedup = throughput[API_MAX_BATCH_SIZE, top] / throughput[1, top]
+    print(f"vazão com micro-lotes / sem, concorrência {top}: {speedup:.2f}x")
+    failed = False
+    if mismatched:
+        print(f"ERRO: {mismatched} registros com previsões diferentes de make_predictions")
+        failed = True
+    if speedup <= 1:
+        print("ERRO: os micro-lotes não aumentaram a vazão na maior concorrência")
+        failed = True
+    sys.exit(1 if failed else 0)
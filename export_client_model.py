@@ -0,0 +1,34 @@
+"""
+Exporta o modelo usado pela previsão individual no navegador (assets/bigmart_model.json).
+
+Deve ser executado na instalação ou na etapa de build da imagem, e de novo sempre que o arquivo
+do modelo mudar: o servidor não grava nada em assets/ ao iniciar (a pasta pode ser somente
+leitura em produção). Se o arquivo estiver ausente ou tiver sido gerado para outro modelo, o
+navegador percebe pelo hash e a previsão individual é calculada no servidor.
+
+Uso:
+    python export_client_model.py [-o assets/bigmart_model.json] [--model linear_regression]
+"""
+import argparse
+import os
+import sys
+
+from helpers import CLIENT_MODEL_PATH, DEFAULT_MODEL, MODELS, export_client_model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Exporta o modelo da previsão individual para o navegador.')
+    parser.add_argument('-o', '--output', default=CLIENT_MODEL_PATH, help='arquivo JSON de saída')
+    parser.add_argument('--model', default=DEFAULT_MODEL, choices=sorted(MODELS), help='modelo registrado')
+    args = parser.parse_args(argv)
+
+    if not export_client_model(args.output, args.model):
+        print(f"Aviso: o modelo '{args.model}' não é linear; a previsão individual será calculada no servidor.",
+              file=sys.stderr)
+        return 0
+    print(f"modelo '{args.model}' exportado para {args.output} ({os.path.getsize(args.output):,} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
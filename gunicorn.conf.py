@@ -0,0 +1,21 @@
+"""
+Configuração do gunicorn para servir o dashboard em produção.
+
+Variáveis de ambiente:
+    BIGMART_BIND     endereço de escuta (padrão 0.0.0.0:8050)
+    BIGMART_WORKERS  número de processos workers (padrão 2 x núcleos + 1)
+    BIGMART_THREADS  threads por worker (padrão 4)
+    BIGMART_TIMEOUT  tempo máximo de uma requisição, em segundos (padrão 120)
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIGMART_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('BIGMART_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('BIGMART_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('BIGMART_TIMEOUT', 120))
+
+# Importa a aplicação (e carrega modelo e dados de referência) no processo mestre antes do fork:
+# os workers compartilham essas páginas de memória em copy-on-write.
+preload_app = True
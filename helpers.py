@@ -1,11 +1,24 @@
 import numpy as np
 import pandas as pd
 import base64, io
+import contextvars
 import os
-from joblib import load   
+import hashlib
+import json
+import math
+import queue
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+from fractions import Fraction
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+from functools import lru_cache, wraps
 from dash import html, dcc, dash_table
-import plotly.graph_objects as go
-import plotly.express as px
+from dash.exceptions import PreventUpdate
 
 
 def text_intro():
@@ -72,6 +85,22 @@ def text_intro():
     ])
     return conteudo_inicio
 
+# Dicionários com as categorias para as features discretas da página "Previsões"
+# (também usados como vocabulário fixo dos tipos categóricos na leitura dos arquivos)
+FEATURE_CATEGORIES = {
+    "Outlet_Identifier": ['OUT010', 'OUT013',  'OUT017', 'OUT018', 'OUT019',  'OUT027', 'OUT035', 'OUT045',  'OUT046', 'OUT049'],  # Atualizado com as categorias corretas        
+    "Item_Reference": ['Food', 'Drinks', 'Non-Consumable'],
+    "Item_Fat_Content": ['Low_Fat', 'Regular', 'Inedible'],  # Atualizado com as categorias corretas
+    "Item_Type": ['Canned', 'Household', 'Hard_Drinks', 'Health_and_Hygiene',
+    'Frozen_Foods', 'Baking_Goods', 'Fruits_and_Vegetables',
+    'Snack_Foods', 'Dairy', 'Meat', 'Breakfast', 'Others',
+    'Starchy_Foods', 'Soft_Drinks', 'Seafood', 'Breads'],  # Atualizado com as categorias corretas
+    "Outlet_Size": ['Small', 'Medium',  'High'],  # Atualizado com as categorias corretas
+    "Outlet_Location_Type": ['Tier_1', 'Tier_2', 'Tier_3'],  # Atualizado com as categorias corretas
+    "Outlet_Type": ['Grocery_Store', 'Supermarket_Type1', 'Supermarket_Type2', 'Supermarket_Type3']  # Atualizado com as categorias corretas
+}
+
+
 # Função para criar menu suspenso de categorias da página "Previsões Individuais"
 def create_dropdown(feature, searchable=False):
     """
@@ -79,28 +108,14 @@ def create_dropdown(feature, searchable=False):
     
     :param feature: Nome da feature para o dropdown.
     :param options: Lista de opções disponíveis para o dropdown.
-                    Se None, será usado o dicionário padrão `categorias`.
+                    Se None, será usado o dicionário padrão `FEATURE_CATEGORIES`.
     :return: Elemento HTML contendo o dropdown.
     """    
-    # Dicionários com as categorias para as features discretas da página "Previsões"
-    categorias = {
-        "Outlet_Identifier": ['OUT010', 'OUT013',  'OUT017', 'OUT018', 'OUT019',  'OUT027', 'OUT035', 'OUT045',  'OUT046', 'OUT049'],  # Atualizado com as categorias corretas        
-        "Item_Reference": ['Food', 'Drinks', 'Non-Consumable'],
-        "Item_Fat_Content": ['Low_Fat', 'Regular', 'Inedible'],  # Atualizado com as categorias corretas
-        "Item_Type": ['Canned', 'Household', 'Hard_Drinks', 'Health_and_Hygiene',
-        'Frozen_Foods', 'Baking_Goods', 'Fruits_and_Vegetables',
-        'Snack_Foods', 'Dairy', 'Meat', 'Breakfast', 'Others',
-        'Starchy_Foods', 'Soft_Drinks', 'Seafood', 'Breads'],  # Atualizado com as categorias corretas
-        "Outlet_Size": ['Small', 'Medium',  'High'],  # Atualizado com as categorias corretas
-        "Outlet_Location_Type": ['Tier_1', 'Tier_2', 'Tier_3'],  # Atualizado com as categorias corretas
-        "Outlet_Type": ['Grocery_Store', 'Supermarket_Type1', 'Supermarket_Type2']  # Atualizado com as categorias corretas
-    }
-
     return html.Div([
         html.H6(f"{feature}:"),
         dcc.Dropdown(
             id=f'dropdown-{feature}',
-            options=[] if searchable else [{'label': i, 'value': i} for i in categorias.get(feature, [])],
+            options=[] if searchable else [{'label': i, 'value': i} for i in FEATURE_CATEGORIES.get(feature, [])],
             placeholder=f"Digite ou selecione {feature}...",
             multi=False, # Configurar para múltiplas seleções se necessário
             searchable=searchable, # Permitir busca digitando
@@ -108,39 +123,1711 @@ def create_dropdown(feature, searchable=False):
         ),
     ])
 
+# Índice de busca para o dropdown de Item_Identifier
+ITEM_IDENTIFIERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'item_identifiers.csv')
+
+# Número máximo de opções retornadas a cada busca
+ITEM_SEARCH_TOP_K = 50
+
+
+class ItemIdentifierIndex:
+    """
+    Índice em memória dos identificadores de produto para busca por prefixo e substring.
+
+    Os identificadores são mantidos em um array ordenado (busca por prefixo via bisseção) e
+    em listas invertidas de n-gramas de tamanho 1 a `max_ngram` (busca por substring).
+    O arquivo CSV só é relido quando seu mtime ou tamanho mudam.
+    """
+
+    def __init__(self, path=ITEM_IDENTIFIERS_PATH, max_ngram=3):
+        self.path = os.path.abspath(path)
+        self.max_ngram = max_ngram
+        self._lock = threading.Lock()
+        self._stat = None
+        self._state = ([], [], {})
+
+    def _build(self):
+        identifiers = pd.read_csv(self.path)['Item_Identifier'].dropna().astype(str).unique()
+        identifiers = sorted(identifiers, key=str.upper)
+        keys = [identifier.upper() for identifier in identifiers]
+
+        # Listas invertidas: n-grama -> posições (crescentes) no array ordenado
+        postings = {}
+        for position, key in enumerate(keys):
+            grams = {key[i:i + n] for n in range(1, self.max_ngram + 1) for i in range(len(key) - n + 1)}
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+
+        return identifiers, keys, postings
+
+    def refresh(self):
+        """
+        Carrega (ou recarrega, se o arquivo mudou) o índice.
+        """
+        stat = os.stat(self.path)
+        current = (stat.st_mtime_ns, stat.st_size)
+        if current == self._stat:
+            return
+        with self._lock:
+            if current != self._stat:
+                self._state = self._build()
+                self._stat = current
+
+    @property
+    def loaded(self):
+        return self._stat is not None
+
+    def _substring_candidates(self, query, postings):
+        if len(query) <= self.max_ngram:
+            return postings.get(query, [])
+        # Interseção das listas dos n-gramas da consulta, começando pela menor
+        grams = {query[i:i + self.max_ngram] for i in range(len(query) - self.max_ngram + 1)}
+        lists = sorted((postings.get(gram, []) for gram in grams), key=len)
+        candidates = set(lists[0])
+        for positions in lists[1:]:
+            candidates.intersection_update(positions)
+            if not candidates:
+                break
+        return sorted(candidates)
+
+    def search(self, query, top_k=ITEM_SEARCH_TOP_K):
+        """
+        Retorna até `top_k` identificadores que contêm `query` (sem diferenciar maiúsculas),
+        com os que começam por `query` primeiro, em ordem alfabética.
+        """
+        self.refresh()
+        identifiers, keys, postings = self._state
+        query = query.strip().upper()
+        if not query:
+            return []
+
+        # 1) Correspondências por prefixo: intervalo contíguo do array ordenado
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and end - start < top_k and keys[end].startswith(query):
+            end += 1
+        results = identifiers[start:end]
+
+        # 2) Demais correspondências por substring, via listas invertidas
+        if len(results) < top_k:
+            for position in self._substring_candidates(query, postings):
+                key = keys[position]
+                if key.startswith(query) or query not in key:
+                    continue
+                results.append(identifiers[position])
+                if len(results) >= top_k:
+                    break
+
+        return results
+
+
+item_identifier_index = ItemIdentifierIndex()
+
+
+# Tipos explícitos das colunas conhecidas do BigMart (evita a inferência de tipos a cada bloco).
+# Colunas textuais são lidas como categóricas, o que reduz a memória por linha em mais de 10x em
+# relação às strings Python. 'Item_Visibility' e 'Item_MRP' continuam em float64: o modelo é mal
+# condicionado (coeficientes da ordem de 1e13) e arredondar as entradas para float32 altera as previsões.
+BIGMART_DTYPES = {
+    'Item_Identifier': 'category',
+    'Item_Fat_Content': 'category',
+    'Item_Visibility': 'float64',
+    'Item_Type': 'category',
+    'Item_MRP': 'float64',
+    'Outlet_Identifier': 'category',
+    'Outlet_Size': 'category',
+    'Outlet_Location_Type': 'category',
+    'Outlet_Type': 'category',
+    'Outlet_Years': 'int16',
+}
+
+# Tipos categóricos de vocabulário fixo (em ordem alfabética, para que a ordenação das tabelas
+# continue lexicográfica), compartilhados por todos os blocos e arquivos enviados
+CATEGORY_DTYPES = {
+    column: pd.CategoricalDtype(sorted(FEATURE_CATEGORIES[column]))
+    for column in BIGMART_DTYPES if column in FEATURE_CATEGORIES
+}
+
+
+def compact_categories(frame):
+    """
+    Converte as colunas categóricas de `frame` para o vocabulário fixo de CATEGORY_DTYPES,
+    quando todos os valores são conhecidos. Colunas com valores fora do vocabulário mantêm as
+    categorias inferidas, para que o erro seja reportado com os valores originais.
+    """
+    for column, dtype in CATEGORY_DTYPES.items():
+        if column in frame.columns and isinstance(frame[column].dtype, pd.CategoricalDtype):
+            if frame[column].cat.categories.isin(dtype.categories).all():
+                frame[column] = frame[column].cat.set_categories(dtype.categories)
+    return frame
+
+
+def concat_frames(frames):
+    """
+    Concatena blocos lidos do mesmo arquivo preservando as colunas categóricas: quando as
+    categorias inferidas divergem entre blocos (ex.: 'Item_Identifier'), usa a união delas.
+    """
+    frames = list(frames)
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    # Exemplos de valores não numéricos da leitura tolerante (ver `_coerce_numeric_columns`)
+    raw_values = {}
+    for frame in frames:
+        for column, values in frame.attrs.get('raw_values', {}).items():
+            merged = raw_values.setdefault(column, [])
+            merged += [value for value in values if value not in merged][:VALIDATION_EXAMPLES - len(merged)]
+    for column in frames[0].columns:
+        dtypes = [frame[column].dtype for frame in frames]
+        if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes) and len(set(dtypes)) > 1:
+            categories = dtypes[0].categories
+            for dtype in dtypes[1:]:
+                categories = categories.union(dtype.categories)
+            for frame in frames:
+                frame[column] = frame[column].cat.set_categories(categories)
+    combined = pd.concat(frames, ignore_index=True)
+    combined.attrs = {'raw_values': raw_values} if raw_values else {}
+    return combined
+
+
+# Número de linhas por bloco na leitura dos arquivos enviados
+UPLOAD_CHUNK_ROWS = 100_000
+
+
+class Base64Reader(io.RawIOBase):
+    """
+    Leitor binário que decodifica uma string base64 sob demanda, em blocos.
+
+    Evita materializar o arquivo decodificado inteiro (e sua cópia em `str`) na memória:
+    o pandas consome os bytes diretamente conforme avança na leitura.
+    """
+
+    def __init__(self, text, start=0, block_size=1 << 20):
+        self._text = text
+        self._position = start
+        # Tamanho do bloco em caracteres base64 (múltiplo de 4)
+        self._block_size = block_size - block_size % 4
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and self._position < len(self._text):
+            end = min(self._position + self._block_size, len(self._text))
+            self._pending = base64.b64decode(self._text[self._position:end])
+            self._position = end
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _coerce_numeric_columns(chunk):
+    """
+    Converte as colunas numéricas lidas como texto; valores não numéricos viram NaN. Colunas
+    inteiras com valores inválidos ficam em ponto flutuante.
+
+    O texto original dos primeiros valores não numéricos de cada coluna (até VALIDATION_EXAMPLES
+    distintos) fica em `chunk.attrs['raw_values']`, usado como exemplo no relatório de validação.
+    """
+    raw_values = {}
+    for column, dtype in BIGMART_DTYPES.items():
+        if column in chunk.columns and dtype != 'category':
+            values = pd.to_numeric(chunk[column], errors='coerce')
+            unparsed = values.isna() & chunk[column].notna()
+            if unparsed.any():
+                raw_values[column] = [str(value) for value in pd.unique(chunk[column][unparsed])[:VALIDATION_EXAMPLES]]
+            chunk[column] = values.astype(dtype if values.notna().all() else np.result_type(dtype, np.float32))
+    if raw_values:
+        chunk.attrs['raw_values'] = raw_values
+    return chunk
+
+
+# Erros de formato do CSV (subclasses de ValueError) que a releitura tolerante não resolve: só
+# os ValueError da conversão de tipos (valores não numéricos, inteiros ausentes) levam a ela
+CSV_FORMAT_ERRORS = (UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError)
+
+
+def iter_csv_stream_chunks(source, chunksize=UPLOAD_CHUNK_ROWS, lenient=False, skip_rows=0):
+    """
+    Lê um CSV (caminho ou fluxo binário) em blocos de `chunksize` linhas com os tipos de
+    BIGMART_DTYPES, ignorando as primeiras `skip_rows` linhas de dados.
+
+    Com `lenient`, as colunas numéricas são lidas como texto e convertidas depois, de modo que
+    valores não numéricos viram NaN (e são apontados por `validate_upload`) em vez de
+    interromper a leitura.
+    """
+    dtypes = BIGMART_DTYPES
+    if lenient:
+        dtypes = {column: dtype for column, dtype in BIGMART_DTYPES.items() if dtype == 'category'}
+    skiprows = range(1, skip_rows + 1) if skip_rows else None
+    with pd.read_csv(source, dtype=dtypes, chunksize=chunksize, encoding='utf-8', skiprows=skiprows) as reader:
+        for chunk in reader:
+            yield compact_categories(_coerce_numeric_columns(chunk) if lenient else chunk)
+
+
 # função para processar o arquivo .csv após o upload e exibi-lo em uma tabela de dados no callback:
+def iter_uploaded_chunks(contents, chunksize=UPLOAD_CHUNK_ROWS, lenient=False):
+    """
+    Lê o arquivo enviado (data URI em base64) em blocos de `chunksize` linhas,
+    decodificando o base64 de forma incremental (ver `iter_csv_stream_chunks`).
+    """
+    start = contents.index(',') + 1  # Pula o cabeçalho "data:text/csv;base64,"
+    stream = io.BufferedReader(Base64Reader(contents, start))
+    yield from iter_csv_stream_chunks(stream, chunksize, lenient)
+
+
+def iter_file_chunks(path, chunksize=UPLOAD_CHUNK_ROWS):
+    """
+    Lê um arquivo local (.csv, .csv.gz ou .parquet) em blocos de `chunksize` linhas, com os
+    mesmos tipos e regras dos uploads do dashboard. Se o CSV tiver valores não numéricos em
+    colunas numéricas, a leitura continua no modo tolerante a partir da primeira linha ainda
+    não entregue. O Parquet requer o pacote opcional `pyarrow`.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            chunk = _coerce_numeric_columns(batch.to_pandas())
+            categorical = [column for column, dtype in BIGMART_DTYPES.items() if dtype == 'category' and column in chunk.columns]
+            yield compact_categories(chunk.astype({column: 'category' for column in categorical}))
+        return
+
+    delivered = 0
+    try:
+        for chunk in iter_csv_stream_chunks(path, chunksize):
+            delivered += len(chunk)
+            yield chunk
+    except CSV_FORMAT_ERRORS:
+        raise
+    except ValueError:
+        yield from iter_csv_stream_chunks(path, chunksize, lenient=True, skip_rows=delivered)
+
+
 def read_uploaded_data(contents):
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
-    loaded_data = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-    return loaded_data
+    with timed_stage('decode_upload') as stage:
+        try:
+            data = concat_frames(iter_uploaded_chunks(contents))
+        except CSV_FORMAT_ERRORS:
+            raise
+        except ValueError:
+            # Valores não numéricos (ou inteiros ausentes) em colunas numéricas: relê o arquivo
+            # no modo tolerante, para que a validação aponte as linhas em vez de perder o lote
+            data = concat_frames(iter_uploaded_chunks(contents, lenient=True))
+        stage['rows'] = len(data)
+    return data
+
+
+
+# Paginação, ordenação e filtragem das tabelas feitas no servidor
+TABLE_PAGE_SIZE = 25
+
+# Operadores da sintaxe de filtro do DataTable, do mais específico para o mais genérico
+FILTER_OPERATORS = [['ge ', '>='], ['le ', '<='], ['lt ', '<'], ['gt ', '>'], ['ne ', '!='], ['eq ', '='], ['contains ']]
+
+# Cache das posições das linhas já filtradas/ordenadas, para que a troca de página não refaça o trabalho
+TABLE_VIEW_CACHE_SIZE = 32
+_table_view_cache = OrderedDict()
+_table_view_lock = threading.Lock()
 
-def parse_contents(contents):
-    loaded_data = read_uploaded_data(contents)
 
+def split_filter_part(filter_part):
+    """
+    Separa um termo do `filter_query` do DataTable em (coluna, operador, valor).
+    """
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                quote_char = value_part[0] if value_part else ''
+                if quote_char and quote_char == value_part[-1] and quote_char in ("'", '"', '`'):
+                    value = value_part[1:-1].replace('\\' + quote_char, quote_char)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                return name, operator_type[0].strip(), value
+
+    return None, None, None
+
+
+def filter_mask(frame, filter_query):
+    """
+    Converte o `filter_query` do DataTable em uma máscara booleana vetorizada sobre `frame`.
+    """
+    mask = np.ones(len(frame), dtype=bool)
+    for filter_part in filter_query.split(' && '):
+        column, operator, value = split_filter_part(filter_part)
+        if column not in frame.columns:
+            continue
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) and operator in ('contains', 'eq', 'ne'):
+            # Avalia o filtro uma vez por categoria e expande pelos códigos de cada linha
+            labels = values.cat.categories.astype(str)
+            if operator == 'contains':
+                matches = labels.str.contains(str(value), case=False, regex=False)
+            else:
+                matches = labels == str(value)
+            if operator == 'ne':
+                matches = ~matches
+            codes = values.cat.codes.to_numpy()
+            # Códigos -1 (valores ausentes) usam a última posição: só passam no filtro 'ne'
+            mask &= np.append(matches, operator == 'ne')[codes]
+            continue
+        if operator == 'contains':
+            mask &= values.astype(str).str.contains(str(value), case=False, regex=False).to_numpy()
+        elif operator in ('eq', 'ne'):
+            if pd.api.types.is_numeric_dtype(values) and isinstance(value, float):
+                equal = (values == value).to_numpy()
+            else:
+                equal = (values.astype(str) == str(value)).to_numpy()
+            mask &= equal if operator == 'eq' else ~equal
+        elif operator in ('lt', 'le', 'gt', 'ge') and pd.api.types.is_numeric_dtype(values):
+            mask &= getattr(values, operator)(value).to_numpy()
+    return mask
+
+
+def _table_view(frame, sort_by, filter_query, cache_key):
+    """
+    Retorna as posições das linhas após filtro e ordenação (None quando não há nenhum dos dois).
+    """
+    if not sort_by and not filter_query:
+        return None
+
+    view_key = (cache_key, id(frame), filter_query,
+                tuple((column['column_id'], column['direction']) for column in sort_by or []))
+    with _table_view_lock:
+        if view_key in _table_view_cache:
+            _table_view_cache.move_to_end(view_key)
+            return _table_view_cache[view_key]
+
+    positions = np.flatnonzero(filter_mask(frame, filter_query)) if filter_query else np.arange(len(frame))
+    sort_by = [column for column in sort_by or [] if column['column_id'] in frame.columns]
+    if sort_by:
+        selected = frame[[column['column_id'] for column in sort_by]].iloc[positions].reset_index(drop=True)
+        order = selected.sort_values(
+            [column['column_id'] for column in sort_by],
+            ascending=[column['direction'] == 'asc' for column in sort_by],
+            kind='mergesort'
+        ).index.to_numpy()
+        positions = positions[order]
+
+    with _table_view_lock:
+        _table_view_cache[view_key] = positions
+        while len(_table_view_cache) > TABLE_VIEW_CACHE_SIZE:
+            _table_view_cache.popitem(last=False)
+    return positions
+
+
+def table_page(frame, page_current=0, page_size=TABLE_PAGE_SIZE, sort_by=None, filter_query='', cache_key=None):
+    """
+    Retorna (registros da página, número de páginas) de `frame` para um DataTable com
+    `page_action='custom'`. Sem filtro e ordenação, o custo é proporcional ao tamanho da página.
+    """
+    with timed_stage('table_view', rows=len(frame)):
+        positions = _table_view(frame, sort_by, filter_query, cache_key)
+    n_rows = len(frame) if positions is None else len(positions)
+    page_count = max(1, -(-n_rows // page_size))
+    page_current = min(page_current or 0, page_count - 1)
+
+    start, end = page_current * page_size, (page_current + 1) * page_size
+    page = frame.iloc[start:end] if positions is None else frame.iloc[positions[start:end]]
+    return page.to_dict('records'), page_count
+
+
+def make_paged_table(frame, table_id, height='300px', cache_key=None, total_rows=None):
+    """
+    Cria um DataTable paginado, ordenado e filtrado no servidor, já preenchido com a primeira página.
+    Com `total_rows`, `frame` contém apenas o início dos dados (ao menos uma página) e o número de
+    páginas é calculado a partir do total.
+    """
+    records, page_count = table_page(frame, cache_key=cache_key)
+    if total_rows is not None:
+        page_count = max(1, -(-total_rows // TABLE_PAGE_SIZE))
+    return dash_table.DataTable(
+        id=table_id,
+        data=records,
+        columns=[{'name': col, 'id': col} for col in frame.columns],
+        page_action='custom',
+        page_current=0,
+        page_size=TABLE_PAGE_SIZE,
+        page_count=page_count,
+        sort_action='custom',
+        sort_mode='multi',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
+        style_table={'height': height, 'overflowY': 'auto', 'position': 'relative'},
+    )
+
+
+def validation_summary(report):
+    """
+    Resumo da validação de um upload: número de linhas com erro e tabela por coluna e problema.
+    """
+    if not report['n_invalid']:
+        return html.P(f"Todas as {report['n_rows']:,} linhas passaram na validação.", style={'color': '#2E9203'})
+    if report['missing_columns']:
+        message = f"Colunas obrigatórias ausentes: {', '.join(report['missing_columns'])}. Nenhuma linha pode ser pontuada."
+    else:
+        message = (f"{report['n_invalid']:,} de {report['n_rows']:,} linhas com erros; "
+                   f"apenas as {report['n_rows'] - report['n_invalid']:,} linhas válidas serão pontuadas.")
     return html.Div([
-        html.H5('Dados do arquivo .csv:'),
+        html.H6(message, style={'color': 'red'}),
         dash_table.DataTable(
-            data=loaded_data.to_dict('records'),
-            columns=[{'name': col, 'id': col} for col in loaded_data.columns],
-            style_table={'height': '300px', 'overflowY': 'auto', 'position': 'relative'},
+            data=report['summary'].to_dict('records'),
+            columns=[{'name': col, 'id': col} for col in report['summary'].columns],
+            style_table={'width': 'auto'},
         ),
-        html.Button('Fazer Previsões', id='submit-button', n_clicks=0, style={
-            'background-color': '#f1863d',
-            'border-radius': '5px',
-            'padding': '5px',
-            'color': 'black',
-            'bottom': '5px',
+    ], style={'margin': '10px 0'})
+
+
+def batch_status(batch):
+    """
+    Situação do lote da sessão: arquivos enviados, linhas e arquivos aguardando previsão.
+    """
+    if batch is None or not batch.files:
+        return html.Div()
+    pending = batch.pending()
+    items = [html.Li(f"{file['name']}: {file['n_rows'] - file['n_invalid']:,} linhas válidas"
+                     f"{'' if file['scored'] else ' (aguardando previsão)'}") for file in batch.files]
+    return html.Div([
+        html.H6(f"Lote atual: {len(batch.files)} arquivo(s), {batch.n_rows:,} linhas pontuadas"
+                f"{f'; {len(pending)} arquivo(s) aguardando previsão' if pending else ''}."),
+        html.Details([html.Summary('Arquivos do lote'), html.Ul(items)]),
+    ], style={'margin': '10px 0'})
+
+
+def parse_contents(loaded_data, upload_key=None, report=None):
+    button_style = {
+        'background-color': '#f1863d',
+        'border-radius': '5px',
+        'padding': '5px',
+        'color': 'black',
+        'bottom': '5px',
+    }
+    children = [
+        html.H5('Dados do arquivo .csv:'),
+        make_paged_table(loaded_data, 'upload-table', height='300px', cache_key=upload_key),
+        # Resultado da validação (colunas, tipos, intervalos e categorias), antes de qualquer previsão
+        validation_summary(report) if report is not None else html.Div(),
+        html.Button('Fazer Previsões', id='submit-button-multiple', n_clicks=0, style=button_style),
+        # Cancelamento e progresso do job de previsões (visíveis apenas durante a execução)
+        html.Button('Cancelar', id='cancel-button', n_clicks=0, style={'display': 'none'}),
+        html.Progress(id='prediction-progress', value='0', max='100', style={'display': 'none'}),
+    ]
+    # Comparação entre os modelos registrados (apenas quando há mais de um)
+    if len(MODELS) > 1:
+        children.append(html.Button('Comparar Modelos', id='compare-models-button', n_clicks=0,
+                                    style={**button_style, 'margin-left': '10px'}))
+    return html.Div(children, style={'width': '100%', 'position': 'relative'})
+
+
+# Caminho absoluto do diretório do projeto (independe do diretório de trabalho do processo)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'Linear_Regression_best_model.pkl')
+
+
+# Diretório dos caches em disco compartilhados entre processos (jobs em segundo plano e workers)
+CACHE_DIR = os.environ.get('BIGMART_CACHE_DIR', os.path.join(BASE_DIR, '.cache'))
+
+
+def open_disk_cache(name, size_limit=4 << 30, **settings):
+    """
+    Abre o cache em disco `name` dentro de CACHE_DIR, ou retorna None se o pacote
+    opcional `diskcache` não estiver instalado. `settings` são repassadas ao `diskcache.Cache`
+    (ex.: `eviction_policy`).
+    """
+    try:
+        import diskcache
+    except ImportError:
+        return None
+    return diskcache.Cache(os.path.join(CACHE_DIR, name), size_limit=size_limit, **settings)
+
+
+# Métricas de desempenho (latência, linhas e bytes por callback e por etapa), expostas em /metrics
+METRICS_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+METRICS_FLUSH_INTERVAL_SECONDS = 1.0
+
+METRICS_HELP = {
+    'bigmart_callback_duration_seconds': ('histogram', 'Tempo de execução da função do callback.'),
+    'bigmart_callback_request_seconds': ('histogram', 'Tempo total da requisição do callback (inclui a serialização JSON).'),
+    'bigmart_callback_response_bytes': ('histogram', 'Tamanho da resposta JSON do callback.'),
+    'bigmart_callback_rows_total': ('counter', 'Linhas processadas pelo callback.'),
+    'bigmart_callback_errors_total': ('counter', 'Exceções levantadas pelo callback (exceto PreventUpdate).'),
+    'bigmart_stage_duration_seconds': ('histogram', 'Tempo de cada etapa interna (leitura, pontuação, agregados, gráficos).'),
+    'bigmart_stage_rows_total': ('counter', 'Linhas processadas por cada etapa interna.'),
+    'bigmart_api_batches_total': ('counter', 'Micro-lotes pontuados pela API de previsões.'),
+    'bigmart_api_records_total': ('counter', 'Registros pontuados pela API de previsões (dividido pelos micro-lotes: tamanho médio).'),
+    'bigmart_single_prediction_cache_requests_total': ('counter', 'Consultas ao cache de previsões individuais, por resultado (hit/miss).'),
+    'bigmart_figure_cache_requests_total': ('counter', 'Consultas ao cache de figuras do lote, por gráfico e resultado (hit/miss).'),
+}
+
+# Callback em execução na thread/processo atual (rótulo das etapas medidas dentro dele)
+_current_callback = contextvars.ContextVar('bigmart_current_callback', default=None)
+
+
+class MetricsRegistry:
+    """
+    Histogramas e contadores em memória, no formato de texto do Prometheus.
+
+    Cada processo acumula suas observações localmente (o custo de uma observação é um
+    `bisect` sob um lock). Com `shared_cache` (um cache em disco), as observações pendentes
+    são somadas periodicamente a um total compartilhado, de modo que `/metrics` em qualquer
+    worker do gunicorn inclua também os jobs em segundo plano e os demais workers.
+    """
+
+    def __init__(self, shared_cache=None, flush_interval=METRICS_FLUSH_INTERVAL_SECONDS):
+        self.shared_cache = shared_cache
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, **labels):
+        """
+        Registra `value` no histograma `name` com os rótulos `labels`.
+        """
+        buckets = METRICS_SIZE_BUCKETS if name.endswith('_bytes') else METRICS_TIME_BUCKETS
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._pending.get(key)
+            if histogram is None:
+                # Contagem por faixa (a última é +Inf) seguida da soma dos valores
+                histogram = self._pending[key] = [0] * (len(buckets) + 2)
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Soma `amount` ao contador `name` com os rótulos `labels`.
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+
+    @staticmethod
+    def _merge(totals, delta):
+        for key, value in delta.items():
+            current = totals.get(key)
+            if current is None:
+                totals[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                totals[key] = [a + b for a, b in zip(current, value)]
+            else:
+                totals[key] = current + value
+        return totals
+
+    def flush(self, force=False):
+        """
+        Soma as observações pendentes ao total compartilhado (no máximo uma vez por
+        `flush_interval` segundos, a menos que `force` seja verdadeiro).
+        """
+        if self.shared_cache is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        with self._lock:
+            delta, self._pending = self._pending, {}
+            self._last_flush = now
+        if delta:
+            with self.shared_cache.transact():
+                self.shared_cache.set('totals', self._merge(self.shared_cache.get('totals', {}), delta))
+
+    def snapshot(self):
+        """
+        Retorna {(nome, rótulos): valor} com o total compartilhado mais as observações pendentes.
+        """
+        totals = self.shared_cache.get('totals', {}) if self.shared_cache is not None else {}
+        with self._lock:
+            pending = dict(self._pending)
+        return self._merge(dict(totals), pending)
+
+    def render(self):
+        """
+        Formata as métricas no formato de texto do Prometheus (versão 0.0.4).
+        """
+        # Rótulos vazios são omitidos (`nome valor` em vez de `nome{} valor`); totais antigos
+        # gravados com um rótulo vazio são somados à série sem ele
+        series = {}
+        for (name, labels), value in self.snapshot().items():
+            self._merge(series, {(name, tuple((k, v) for k, v in labels if v != '')): value})
+        by_name = {}
+        for (name, labels), value in series.items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(by_name):
+            kind, help_text = METRICS_HELP.get(name, ('untyped', ''))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name[name]):
+                label_text = ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels)
+                label_set = f"{{{label_text}}}" if label_text else ''
+                if not isinstance(value, list):
+                    lines.append(f"{name}{label_set} {value}")
+                    continue
+                buckets = METRICS_SIZE_BUCKETS if name.endswith('_bytes') else METRICS_TIME_BUCKETS
+                prefix = label_text + ',' if label_text else ''
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ['+Inf'], value[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{label_set} {value[-1]}")
+                lines.append(f"{name}_count{label_set} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+# Registro de métricas do processo (o total é compartilhado entre processos pelo cache em disco)
+metrics = MetricsRegistry(shared_cache=open_disk_cache('metrics', size_limit=64 << 20))
+
+
+@contextmanager
+def timed_stage(stage, rows=None):
+    """
+    Mede o tempo de uma etapa interna (e as linhas processadas), rotulada com o callback em
+    execução. Pode ser usada com `with` ou como decorador; com `with`, as linhas também podem
+    ser informadas depois, em `medida['rows']`.
+    """
+    callback = _current_callback.get()
+    measure = {'rows': rows}
+    start = time.perf_counter()
+    try:
+        yield measure
+    finally:
+        # Fora de um callback (jobs, CLI, benchmarks), a etapa é rotulada apenas com o nome
+        labels = {'stage': stage} if callback is None else {'stage': stage, 'callback': callback['name']}
+        metrics.observe('bigmart_stage_duration_seconds', time.perf_counter() - start, **labels)
+        if measure['rows'] is not None:
+            metrics.inc('bigmart_stage_rows_total', measure['rows'], **labels)
+            if callback is not None:
+                callback['rows'] = max(callback['rows'], measure['rows'])
+        metrics.flush()
+
+
+def instrument_callback(func=None, *, flush=False):
+    """
+    Decorador dos callbacks do Dash: registra a duração, as exceções e as linhas processadas
+    (o maior número de linhas informado pelas etapas internas) de cada chamada.
+
+    Callbacks executados em processos de curta duração (background=True) devem usar
+    `flush=True`, para que as métricas sejam enviadas ao total compartilhado antes do fim do job.
+    """
+    if func is None:
+        return lambda f: instrument_callback(f, flush=flush)
+
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        callback = {'name': name, 'rows': 0}
+        token = _current_callback.set(callback)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except PreventUpdate:
+            raise
+        except Exception:
+            metrics.inc('bigmart_callback_errors_total', callback=name)
+            raise
+        finally:
+            _current_callback.reset(token)
+            metrics.observe('bigmart_callback_duration_seconds', time.perf_counter() - start, callback=name)
+            if callback['rows']:
+                metrics.inc('bigmart_callback_rows_total', callback['rows'], callback=name)
+            metrics.flush(force=flush)
+
+    return wrapper
+
+
+def _file_digest(path, block_size=1 << 20):
+    """
+    Calcula o hash SHA-256 de um arquivo lendo-o em blocos.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _code_digest(packages=('numpy', 'pandas', 'scikit-learn', 'plotly', 'orjson')):
+    """
+    Hash do código deste módulo e das versões das bibliotecas usadas para compilar os modelos e
+    montar os gráficos. Faz parte das chaves dos caches de objetos derivados desse código
+    (pontuadores compilados e figuras), que assim são invalidados a cada mudança.
+    """
+    from importlib.metadata import PackageNotFoundError, version
+
+    digest = hashlib.sha256(_file_digest(os.path.abspath(__file__)).encode('ascii'))
+    for package in packages:
+        try:
+            digest.update(f"{package}=={version(package)}".encode())
+        except PackageNotFoundError:
+            digest.update(f"{package}: ausente".encode())
+    return digest.hexdigest()[:16]
+
+
+CODE_DIGEST = _code_digest()
+
+
+class ModelRegistry:
+    """
+    Registro de modelos treinados, carregados uma única vez por processo.
+
+    Cada artefato é indexado pelo seu caminho absoluto. A cada acesso apenas o
+    `os.stat` do arquivo é consultado: se o mtime ou o tamanho mudarem, o hash do
+    conteúdo é recalculado e o modelo só é recarregado quando o conteúdo de fato mudou.
+
+    O pontuador compilado (ver `CompiledLinearScorer`) é guardado em `scorer_cache`,
+    indexado pelo hash do artefato. Numa inicialização com o cache preenchido o pipeline
+    sklearn (e o próprio sklearn) só é carregado se `get` for chamado.
+    """
+
+    def __init__(self, scorer_cache=None):
+        self.scorer_cache = scorer_cache
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._reload_hooks = []
+
+    def add_reload_hook(self, hook):
+        """
+        Registra uma função `hook(path)` chamada sempre que um modelo já carregado é substituído.
+        """
+        self._reload_hooks.append(hook)
+
+    def _load_scorer(self, path, digest):
+        cache_key = f"scorer:{CODE_DIGEST}:{digest}"
+        if self.scorer_cache is not None:
+            scorer = self.scorer_cache.get(cache_key)
+            if scorer is not None:
+                return scorer, None
+
+        from joblib import load
+        model = load(path)
+        scorer = compile_model(model)
+        if scorer is not None and self.scorer_cache is not None:
+            self.scorer_cache.set(cache_key, scorer)
+        return scorer, model
+
+    def _current(self, path):
+        """
+        Retorna a entrada atualizada do artefato em `path`, recarregando-o se o arquivo mudou.
+        """
+        stat = os.stat(path)
+        entry = self._entries.get(path)
+        if entry is not None and entry['stat'] == (stat.st_mtime_ns, stat.st_size):
+            return entry
+
+        with self._lock:
+            # Outra thread pode ter recarregado o modelo enquanto esperávamos o lock
+            entry = self._entries.get(path)
+            if entry is not None and entry['stat'] == (stat.st_mtime_ns, stat.st_size):
+                return entry
+
+            digest = _file_digest(path)
+            if entry is not None and entry['digest'] == digest:
+                # Arquivo "tocado", mas com o mesmo conteúdo: não há o que recarregar
+                entry['stat'] = (stat.st_mtime_ns, stat.st_size)
+                return entry
+
+            scorer, model = self._load_scorer(path, digest)
+            current = self._entries[path] = {
+                'model': model,
+                'scorer': scorer,
+                'stat': (stat.st_mtime_ns, stat.st_size),
+                'digest': digest,
+                'version': entry['version'] + 1 if entry is not None else 1,
+            }
+
+        # Invalida caches derivados do modelo anterior (fora do lock)
+        if entry is not None:
+            for hook in self._reload_hooks:
+                hook(path)
+        return current
+
+    def get(self, path=MODEL_PATH):
+        """
+        Retorna o pipeline sklearn carregado para `path`, recarregando-o se o arquivo mudou.
+        """
+        path = os.path.abspath(path)
+        entry = self._current(path)
+        if entry['model'] is None:
+            with self._lock:
+                if entry['model'] is None:
+                    from joblib import load
+                    entry['model'] = load(path)
+        return entry['model']
+
+    def get_scorer(self, path=MODEL_PATH):
+        """
+        Retorna o pontuador compilado do modelo em `path`, ou None se o pipeline não pôde ser compilado.
+        """
+        return self._current(os.path.abspath(path))['scorer']
+
+    def refresh(self, path=MODEL_PATH):
+        """
+        Verifica se o arquivo em `path` mudou (recarregando-o se preciso) e retorna a versão atual.
+        """
+        return self._current(os.path.abspath(path))['version']
+
+    def version(self, path=MODEL_PATH):
+        """
+        Retorna a versão (número de carregamentos) do modelo em `path`, ou 0 se ainda não foi carregado.
+        """
+        entry = self._entries.get(os.path.abspath(path))
+        return entry['version'] if entry is not None else 0
+
+    def digest(self, path=MODEL_PATH):
+        """
+        Retorna o hash do conteúdo do modelo em `path` (recarregando-o se o arquivo mudou). Ao
+        contrário de `version`, é o mesmo em todos os processos.
+        """
+        return self._current(os.path.abspath(path))['digest']
+
+
+# Registro único do processo
+model_registry = ModelRegistry(scorer_cache=open_disk_cache('models'))
+
+
+# Amostra de referência usada para validar o pontuador compilado contra o pipeline sklearn
+REFERENCE_DATA_PATH = os.path.join(BASE_DIR, 'bigmart_sales_test_cleaned.csv')
+
+
+class CompiledLinearScorer:
+    """
+    Versão "compilada" do pipeline ColumnTransformer + modelo linear para pontuação em lote.
+
+    Na construção são extraídos do pipeline as categorias dos encoders, os expoentes dos
+    termos polinomiais, os parâmetros do scaler e os coeficientes do modelo, e o modelo é
+    reescrito em uma forma bem condicionada (ver `_fold`). A pontuação de um lote é feita com
+    consultas por códigos inteiros e operações elemento a elemento, de modo que a previsão de
+    cada linha não depende das demais linhas do lote.
+
+    Exceções:
+    ---------
+    ValueError:
+        - Na construção, caso o pipeline tenha um formato não suportado.
+        - Na pontuação, caso existam categorias desconhecidas ou valores numéricos não finitos.
+    """
+
+    def __init__(self, pipeline):
+        from sklearn.compose import ColumnTransformer
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import (OneHotEncoder, OrdinalEncoder, PolynomialFeatures,
+                                           RobustScaler, StandardScaler)
+
+        if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+            raise ValueError("Formato de pipeline não suportado.")
+        preprocessor, regressor = pipeline.steps[0][1], pipeline.steps[1][1]
+        if not isinstance(preprocessor, ColumnTransformer) or preprocessor.remainder != 'drop':
+            raise ValueError("Pré-processador não suportado.")
+        coef = np.asarray(getattr(regressor, 'coef_', None), dtype=np.float64)
+        if coef.ndim != 1 or np.ndim(getattr(regressor, 'intercept_', None)) != 0:
+            raise ValueError("Regressor não linear ou com múltiplas saídas.")
+
+        self.feature_names_in_ = pipeline.feature_names_in_
+        self.coef_ = coef
+        self.intercept_ = float(regressor.intercept_)
+        self._blocks = []
+
+        offset = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop':
+                continue
+            steps = [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+            columns = list(columns)
+
+            if isinstance(steps[0], PolynomialFeatures) and len(steps) <= 2:
+                poly = steps[0]
+                center = np.zeros(len(poly.powers_))
+                scale = np.ones(len(poly.powers_))
+                if len(steps) == 2:
+                    scaler = steps[1]
+                    if isinstance(scaler, RobustScaler):
+                        center = scaler.center_ if scaler.with_centering else center
+                        scale = scaler.scale_ if scaler.with_scaling else scale
+                    elif isinstance(scaler, StandardScaler):
+                        center = scaler.mean_ if scaler.with_mean else center
+                        scale = scaler.scale_ if scaler.with_std else scale
+                    else:
+                        raise ValueError(f"Scaler não suportado em '{name}'.")
+                self._blocks.append(('poly', columns, offset, (poly.powers_, center, scale)))
+                offset += len(poly.powers_)
+
+            elif len(steps) == 1 and isinstance(steps[0], OneHotEncoder):
+                encoder = steps[0]
+                if encoder.drop is not None or encoder.handle_unknown != 'error' or encoder.sparse_output:
+                    raise ValueError(f"OneHotEncoder não suportado em '{name}'.")
+                self._blocks.append(('onehot', columns, offset, encoder.categories_))
+                offset += sum(len(categories) for categories in encoder.categories_)
+
+            elif len(steps) == 1 and isinstance(steps[0], OrdinalEncoder):
+                encoder = steps[0]
+                if encoder.handle_unknown != 'error':
+                    raise ValueError(f"OrdinalEncoder não suportado em '{name}'.")
+                self._blocks.append(('ordinal', columns, offset, encoder.categories_))
+                offset += len(columns)
+
+            else:
+                raise ValueError(f"Transformador não suportado em '{name}'.")
+
+        if offset != len(coef):
+            raise ValueError("Número de features incompatível com os coeficientes do modelo.")
+        self.n_features_ = offset
+        self._fold()
+
+    def _fold(self):
+        """
+        Reescreve o modelo para a pontuação linha a linha de `predict`.
+
+        Os coeficientes do pipeline chegam a 1e13 e se cancelam (as colunas das lojas são
+        colineares): somados por um produto matricial, o arredondamento muda as previsões em até
+        ~R$ 1 e depende da posição da linha no bloco do BLAS. Por isso tudo o que depende apenas
+        da loja (one-hot e atributos da loja, termos de Outlet_Years e intercepto) é somado em
+        aritmética exata e arredondado uma única vez em um deslocamento por loja; o mesmo é
+        feito com a média dos pesos de cada coluna categórica restante. Sobram pesos e
+        coeficientes pequenos, somados sem perda relevante de precisão.
+        """
+        outlet_columns = {'Outlet_Identifier', *OUTLET_COLUMNS} if 'Outlet_Identifier' in self.feature_names_in_ else set()
+        coef = [Fraction(value) for value in self.coef_]
+        base = Fraction(self.intercept_)
+        folded, lookups, terms, categories_of = [], [], [], {}
+
+        for kind, columns, offset, params in self._blocks:
+            if kind == 'poly':
+                powers, center, scale = params
+                for j, exponents in enumerate(powers):
+                    if {column for column, exponent in zip(columns, exponents) if exponent} <= outlet_columns:
+                        folded.append(offset + j)
+                    else:
+                        terms.append((columns, exponents, float(center[j]), float(scale[j]), float(self.coef_[offset + j])))
+                continue
+            for k, (column, categories) in enumerate(zip(columns, params)):
+                categories_of[column] = categories
+                if kind == 'onehot':
+                    positions = list(range(offset, offset + len(categories)))
+                    weights = [coef[j] for j in positions]
+                    offset += len(categories)
+                else:
+                    positions = [offset + k]
+                    weights = [code * coef[offset + k] for code in range(len(categories))]
+                if column in outlet_columns:
+                    folded += positions
+                    continue
+                shift = sum(weights) / len(weights)
+                base += shift
+                lookups.append((column, categories, np.array([float(weight - shift) for weight in weights])))
+
+        self._base = base
+        self._folded = folded
+        self._lookups = lookups
+        self._terms = terms
+        self._key_columns = [column for column in self.feature_names_in_ if column in outlet_columns]
+        if outlet_columns:
+            outlets = OUTLET_TABLE.rename_axis('Outlet_Identifier').reset_index()
+            self._outlets = OUTLET_TABLE.index
+            self._offsets = self._folded_offsets(outlets[self._key_columns])
+            # Atributos de cada loja em OUTLET_INFO (códigos nas categorias do modelo, ou valores)
+            self._outlet_attributes = [
+                (column, categories_of.get(column),
+                 outlets[column].to_numpy(dtype=np.float64) if column not in categories_of
+                 else self._codes(outlets[column], categories_of[column], column))
+                for column in self._key_columns if column != 'Outlet_Identifier'
+            ]
+        else:
+            self._outlets, self._outlet_attributes = None, []
+            self._offsets = self._folded_offsets(pd.DataFrame(index=range(1)))
+
+    def _folded_offsets(self, keys):
+        """
+        Deslocamento de cada linha de `keys` (colunas da loja): intercepto, médias dos pesos das
+        colunas categóricas e termos que dependem apenas da loja, somados em aritmética exata e
+        arredondados uma única vez.
+        """
+        frame = keys.reset_index(drop=True).copy()
+        for kind, columns, _, params in self._blocks:
+            for k, column in enumerate(columns):
+                if column not in frame.columns:
+                    # Valor qualquer: as colunas que não são da loja não entram no deslocamento
+                    frame[column] = 0.0 if kind == 'poly' else params[k][0]
+        X = self.transform(frame)[:, self._folded]
+        coef = [Fraction(self.coef_[j]) for j in self._folded]
+        return np.array([float(self._base + sum(Fraction(x) * c for x, c in zip(row, coef))) for row in X])
+
+    @staticmethod
+    def _codes(values, categories, column):
+        codes = pd.Categorical(values, categories=categories).codes
+        if (codes < 0).any():
+            unknown = pd.unique(np.asarray(values, dtype=object)[codes < 0])
+            raise ValueError(f"Found unknown categories {list(unknown)} in column '{column}'")
+        return codes
+
+    def transform(self, user_data):
+        """
+        Monta a matriz de projeto (em ordem Fortran, como a saída do ColumnTransformer).
+        """
+        n_rows = len(user_data)
+        X = np.zeros((n_rows, self.n_features_), order='F')
+        rows = np.arange(n_rows)
+
+        for kind, columns, offset, params in self._blocks:
+            if kind == 'poly':
+                powers, center, scale = params
+                values = user_data[columns].to_numpy(dtype=np.float64)
+                if not np.isfinite(values).all():
+                    raise ValueError(f"Valores ausentes ou infinitos nas colunas {columns}.")
+                for j, exponents in enumerate(powers):
+                    term = np.ones(n_rows)
+                    for k, exponent in enumerate(exponents):
+                        for _ in range(exponent):
+                            term = term * values[:, k]
+                    X[:, offset + j] = term
+                block = X[:, offset:offset + len(powers)]
+                block -= center
+                block /= scale
+
+            elif kind == 'onehot':
+                for column, categories in zip(columns, params):
+                    X[rows, offset + self._codes(user_data[column], categories, column)] = 1.0
+                    offset += len(categories)
+
+            else:
+                for j, (column, categories) in enumerate(zip(columns, params)):
+                    X[:, offset + j] = self._codes(user_data[column], categories, column)
+
+        return X
+
+    def predict(self, user_data):
+        """
+        Retorna a saída do modelo linear (antes da transformação inversa do alvo), calculada linha
+        a linha na forma reescrita por `_fold`.
+        """
+        n_rows = len(user_data)
+        if self._outlets is None:
+            output = np.full(n_rows, self._offsets[0])
+        else:
+            outlets = self._codes(user_data['Outlet_Identifier'], self._outlets, 'Outlet_Identifier')
+            output = self._offsets[outlets]
+            # Linhas cujos atributos da loja (enviados no próprio arquivo) diferem de OUTLET_INFO
+            # recebem o deslocamento exato da sua combinação de atributos
+            differs = np.zeros(n_rows, dtype=bool)
+            for column, categories, expected in self._outlet_attributes:
+                values = (user_data[column].to_numpy(dtype=np.float64) if categories is None
+                          else self._codes(user_data[column], categories, column))
+                differs |= values != expected[outlets]
+            if differs.any():
+                keys = user_data[self._key_columns].iloc[np.flatnonzero(differs)]
+                combinations = keys.drop_duplicates()
+                positions = pd.MultiIndex.from_frame(combinations).get_indexer(pd.MultiIndex.from_frame(keys))
+                output[differs] = self._folded_offsets(combinations)[positions]
+
+        for column, categories, weights in self._lookups:
+            output = output + weights[self._codes(user_data[column], categories, column)]
+
+        values = {}
+        for columns, exponents, center, scale, coef in self._terms:
+            term = np.ones(n_rows)
+            for column, exponent in zip(columns, exponents):
+                if exponent and column not in values:
+                    values[column] = user_data[column].to_numpy(dtype=np.float64)
+                    if not np.isfinite(values[column]).all():
+                        raise ValueError(f"Valores ausentes ou infinitos na coluna '{column}'.")
+                for _ in range(exponent):
+                    term = term * values[column]
+            output = output + coef * ((term - center) / scale)
+        return output
+
+    def exact_output(self, user_data):
+        """
+        Saída do modelo linear em aritmética exata sobre a matriz de projeto, arredondada uma única
+        vez (referência para conferir `predict`; lenta, apenas para amostras pequenas).
+        """
+        intercept = Fraction(self.intercept_)
+        coef = [Fraction(value) for value in self.coef_]
+        return np.array([float(intercept + sum(Fraction(x) * c for x, c in zip(row, coef) if x))
+                         for row in self.transform(user_data)])
+
+
+# Erro relativo máximo de `CompiledLinearScorer.predict` em relação à saída exata do modelo
+COMPILED_MODEL_TOLERANCE = 1e-9
+
+
+def compile_model(pipeline, reference_path=REFERENCE_DATA_PATH):
+    """
+    Compila o pipeline e o confere na amostra de referência: a matriz de projeto, multiplicada
+    pelos coeficientes, deve reproduzir bit a bit `pipeline.predict`, e a pontuação linha a
+    linha deve coincidir com a saída exata do modelo (até COMPILED_MODEL_TOLERANCE). Retorna
+    None (uso do caminho sklearn) se o formato do pipeline não for suportado ou se as saídas
+    divergirem.
+    """
+    try:
+        scorer = CompiledLinearScorer(pipeline)
+        reference = pd.read_csv(reference_path)[pipeline.feature_names_in_]
+        if not np.array_equal(scorer.transform(reference) @ scorer.coef_ + scorer.intercept_, pipeline.predict(reference)):
+            return None
+        exact = scorer.exact_output(reference)
+        if not np.allclose(scorer.predict(reference), exact, rtol=COMPILED_MODEL_TOLERANCE, atol=0):
+            return None
+    except (ValueError, KeyError, OSError):
+        return None
+    return scorer
+
+
+# Limites do armazenamento de uploads no servidor
+UPLOAD_STORE_MAX_ITEMS = 64
+UPLOAD_STORE_TTL_SECONDS = 30 * 60
+UPLOAD_STORE_MAX_BYTES = 1 << 30
+
+
+class UploadStore:
+    """
+    Armazena no servidor os DataFrames já lidos dos uploads, indexados por sessão e hash do conteúdo.
+
+    Os callbacks trocam apenas a chave; o arquivo é decodificado e lido uma única vez.
+    A remoção de entradas segue três regras: expiração por tempo (TTL), número máximo de
+    entradas (LRU) e limite total de memória ocupada pelos DataFrames (LRU).
+
+    Opcionalmente, `disk_cache` (um `diskcache.Cache`) funciona como segunda camada
+    compartilhada entre processos: as entradas também são gravadas em disco e, em caso
+    de falta na memória, são lidas de lá (por exemplo, resultados gravados por um job
+    em segundo plano ou por outro worker).
+    """
+
+    def __init__(self, max_items=UPLOAD_STORE_MAX_ITEMS, ttl=UPLOAD_STORE_TTL_SECONDS,
+                 max_bytes=UPLOAD_STORE_MAX_BYTES, disk_cache=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.disk_cache = disk_cache
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._total_bytes = 0
+
+    @staticmethod
+    def make_key(session_id, contents):
+        """
+        Chave do upload: identificador da sessão + hash SHA-256 do conteúdo enviado.
+        """
+        return f"{session_id}:{hashlib.sha256(contents.encode('ascii')).hexdigest()}"
+
+    def _discard(self, key):
+        frame, nbytes, expires = self._items.pop(key)
+        self._total_bytes -= nbytes
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [key for key, (_, _, expires) in self._items.items() if expires <= now]:
+            self._discard(key)
+        while self._items and (len(self._items) > self.max_items or self._total_bytes > self.max_bytes):
+            self._discard(next(iter(self._items)))
+
+    def _insert(self, key, frame, nbytes):
+        with self._lock:
+            if key in self._items:
+                self._discard(key)
+            self._items[key] = (frame, nbytes, time.monotonic() + self.ttl)
+            self._total_bytes += nbytes
+            self._evict()
+
+    def put(self, key, frame):
+        """
+        Armazena `frame` sob `key`. Retorna False se o DataFrame sozinho excede o limite de memória.
+        """
+        nbytes = int(frame.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            return False
+        self._insert(key, frame, nbytes)
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, frame, expire=self.ttl)
+        return True
+
+    def get(self, key):
+        """
+        Retorna o DataFrame armazenado sob `key`, ou None se não existe ou expirou.
+        """
+        with self._lock:
+            self._evict()
+            if key in self._items:
+                # Cada acesso renova o prazo de expiração da entrada
+                frame, nbytes, expires = self._items[key]
+                self._items[key] = (frame, nbytes, time.monotonic() + self.ttl)
+                self._items.move_to_end(key)
+            else:
+                frame = None
+
+        if self.disk_cache is None:
+            return frame
+        if frame is not None:
+            self.disk_cache.touch(key, expire=self.ttl)
+            return frame
+
+        # Falta na memória: tenta a camada em disco e promove a entrada para a memória
+        frame = self.disk_cache.get(key)
+        if frame is not None:
+            self.disk_cache.touch(key, expire=self.ttl)
+            self._insert(key, frame, int(frame.memory_usage(deep=True).sum()))
+        return frame
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+
+upload_store = UploadStore(disk_cache=open_disk_cache('uploads'))
+
+
+# Exportação das previsões em blocos (download sob demanda)
+DOWNLOAD_CHUNK_ROWS = 50_000
+
+# Formatos de download: (mimetype, nome do arquivo)
+DOWNLOAD_FORMATS = {
+    'csv': ('text/csv', 'predictions.csv'),
+    'csv.gz': ('application/gzip', 'predictions.csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'predictions.parquet'),
+}
+
+
+def iter_csv_frames(frames):
+    """
+    Gera um único CSV (cabeçalho apenas no primeiro bloco) a partir de uma sequência de DataFrames
+    com as mesmas colunas, um bloco de bytes por DataFrame.
+    """
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+
+
+def iter_csv_chunks(frame, chunk_rows=DOWNLOAD_CHUNK_ROWS):
+    """
+    Gera o CSV de `frame` em blocos de bytes de `chunk_rows` linhas (mesmo formato de `to_csv(index=False)`).
+    """
+    return iter_csv_frames(frame.iloc[start:start + chunk_rows] for start in range(0, max(len(frame), 1), chunk_rows))
+
+
+def iter_gzip(chunks, level=6):
+    """
+    Comprime um fluxo de blocos de bytes no formato gzip, sem materializar o arquivo inteiro.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class _StreamSink(io.RawIOBase):
+    """
+    Destino de escrita que apenas acumula os bytes escritos até serem consumidos,
+    mantendo a posição absoluta (necessária para os offsets do rodapé do Parquet).
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._buffer)
+        self._buffer = []
+        return data
+
+
+def iter_parquet_frames(frames, schema=None):
+    """
+    Gera um arquivo Parquet em blocos a partir de uma sequência de DataFrames, com um row group
+    por DataFrame. Sem `schema`, usa o esquema do primeiro DataFrame com índices de 32 bits nas
+    colunas categóricas, para que blocos com categorias diferentes caibam no mesmo esquema.
+    Requer o pacote opcional `pyarrow`.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema) if schema is not None else None
+    for frame in frames:
+        if writer is None:
+            schema = pa.Schema.from_pandas(frame, preserve_index=False)
+            for i, field in enumerate(schema):
+                if pa.types.is_dictionary(field.type):
+                    schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type)))
+            writer = pq.ParquetWriter(sink, schema)
+        writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_parquet_chunks(frame, chunk_rows=DOWNLOAD_CHUNK_ROWS):
+    """
+    Gera o arquivo Parquet de `frame` em blocos, com um row group por bloco de linhas.
+    Requer o pacote opcional `pyarrow`.
+    """
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    return iter_parquet_frames((frame.iloc[start:start + chunk_rows] for start in range(0, len(frame), chunk_rows)), schema)
+
+
+def parquet_available():
+    """
+    Indica se o pacote opcional `pyarrow` (necessário para exportar Parquet) pode ser importado.
+    """
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def iter_download(frame, file_format):
+    """
+    Gera os bytes do arquivo de download de `frame` no formato pedido (ver DOWNLOAD_FORMATS).
+    """
+    if file_format == 'csv':
+        return iter_csv_chunks(frame)
+    if file_format == 'csv.gz':
+        return iter_gzip(iter_csv_chunks(frame))
+    if file_format == 'parquet':
+        return iter_parquet_chunks(frame)
+    raise ValueError(f"Formato de download desconhecido: {file_format}")
+
+
+def iter_download_frames(frames, file_format):
+    """
+    Como `iter_download`, mas a partir de uma sequência de DataFrames produzidos aos poucos
+    (ex.: previsões da linha de comando), sem concatená-los.
+    """
+    if file_format == 'csv':
+        return iter_csv_frames(frames)
+    if file_format == 'csv.gz':
+        return iter_gzip(iter_csv_frames(frames))
+    if file_format == 'parquet':
+        return iter_parquet_frames(frames)
+    raise ValueError(f"Formato de download desconhecido: {file_format}")
+
+
+# Dicionário para inferência de diversos atributos baseada em 'Outlet_Identifier'
+OUTLET_INFO = {
+    'OUT010': {'Outlet_Type': 'Grocery_Store', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_3', 'Outlet_Years': 25},
+    'OUT013': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'High', 'Outlet_Location_Type': 'Tier_3', 'Outlet_Years': 36},
+    'OUT017': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_2', 'Outlet_Years': 16},
+    'OUT018': {'Outlet_Type': 'Supermarket_Type2', 'Outlet_Size': 'Medium', 'Outlet_Location_Type': 'Tier_3', 'Outlet_Years': 14},
+    'OUT019': {'Outlet_Type': 'Grocery_Store', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_1', 'Outlet_Years': 38},
+    'OUT027': {'Outlet_Type': 'Supermarket_Type3', 'Outlet_Size': 'Medium', 'Outlet_Location_Type': 'Tier_3', 'Outlet_Years': 38},
+    'OUT035': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_2', 'Outlet_Years': 19},
+    'OUT045': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_2', 'Outlet_Years': 21},
+    'OUT046': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_1', 'Outlet_Years': 26},
+    'OUT049': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'Medium', 'Outlet_Location_Type': 'Tier_1', 'Outlet_Years': 24}
+}
+
+# Mesma informação em forma de tabela indexada por 'Outlet_Identifier' (para junções vetorizadas)
+OUTLET_TABLE = pd.DataFrame.from_dict(OUTLET_INFO, orient='index').astype({
+    'Outlet_Type': CATEGORY_DTYPES['Outlet_Type'],
+    'Outlet_Size': CATEGORY_DTYPES['Outlet_Size'],
+    'Outlet_Location_Type': CATEGORY_DTYPES['Outlet_Location_Type'],
+    'Outlet_Years': BIGMART_DTYPES['Outlet_Years'],
+})
+OUTLET_COLUMNS = list(OUTLET_TABLE.columns)
+
+# Colunas que o usuário precisa fornecer; as demais são inferidas a partir da loja
+USER_COLUMNS = ['Item_Identifier', 'Item_Fat_Content', 'Item_Visibility', 'Item_Type', 'Item_MRP', 'Outlet_Identifier']
+
+
+def enrich_outlet_attributes(user_data):
+    """
+    Preenche as colunas de atributos da loja ausentes em `user_data` ('Outlet_Type', 'Outlet_Size',
+    'Outlet_Location_Type' e 'Outlet_Years') com uma única junção indexada por 'Outlet_Identifier'.
+    Colunas já presentes são mantidas como estão.
+
+    Exceções:
+    ---------
+    ValueError:
+        - Caso 'Outlet_Identifier' esteja ausente ou contenha lojas desconhecidas.
+    """
+    missing_columns = [column for column in OUTLET_COLUMNS if column not in user_data.columns]
+    if not missing_columns:
+        return user_data
+
+    if 'Outlet_Identifier' not in user_data.columns:
+        raise ValueError("Missing 'Outlet_Identifier' in user data.")
+
+    outlets = user_data['Outlet_Identifier']
+    if isinstance(outlets.dtype, pd.CategoricalDtype):
+        # Junção pelas categorias (poucas) e expansão pelos códigos inteiros de cada linha
+        category_positions = np.append(OUTLET_TABLE.index.get_indexer(outlets.cat.categories), -1)
+        positions = category_positions[outlets.cat.codes.to_numpy()]
+    else:
+        positions = OUTLET_TABLE.index.get_indexer(outlets)
+
+    if (positions < 0).any():
+        unknown = pd.unique(outlets.to_numpy()[positions < 0])
+        raise ValueError(f"Unknown Outlet Identifier: {', '.join(map(str, unknown))}")
+
+    # Cópia rasa: as colunas originais são compartilhadas, apenas as novas são alocadas.
+    # Os atributos textuais são gerados como categóricos, direto a partir dos códigos da tabela.
+    enriched = user_data.copy(deep=False)
+    for column in missing_columns:
+        attribute = OUTLET_TABLE[column]
+        if isinstance(attribute.dtype, pd.CategoricalDtype):
+            enriched[column] = pd.Categorical.from_codes(attribute.cat.codes.to_numpy()[positions], dtype=attribute.dtype)
+        else:
+            enriched[column] = attribute.to_numpy()[positions]
+    return enriched
+
+
+# Modelos disponíveis para previsão. Cada modelo declara a transformação aplicada ao alvo no
+# treinamento, e suas saídas são convertidas de volta para a escala original das vendas.
+TARGET_TRANSFORMS = {
+    'sqrt': np.square,       # treinado em sqrt(vendas)
+    'log1p': np.expm1,       # treinado em log(1 + vendas)
+    'identity': np.asarray,  # treinado nas vendas
+}
+DEFAULT_MODEL = 'linear_regression'
+
+
+class ModelSpec:
+    """
+    Descrição de um modelo registrado: nome, caminho do artefato (um pipeline sklearn que recebe as
+    colunas do BigMart) e transformação do alvo usada no treinamento. O artefato em si é carregado,
+    compilado e recarregado pelo `model_registry`.
+    """
+
+    def __init__(self, name, path, target_transform='sqrt', label=None):
+        if target_transform not in TARGET_TRANSFORMS:
+            raise ValueError(f"Unknown target transform '{target_transform}' for model '{name}'.")
+        self.name = name
+        self.path = os.path.abspath(path)
+        self.target_transform = target_transform
+        self.label = label or name
+
+    def estimator(self):
+        """
+        Retorna o pontuador compilado do modelo quando disponível, senão o pipeline sklearn;
+        ambos expõem `feature_names_in_` e `predict`.
+        """
+        scorer = model_registry.get_scorer(self.path)
+        return scorer if scorer is not None else model_registry.get(self.path)
+
+    def inverse_transform(self, values):
+        """
+        Converte as saídas do modelo (em float64, como as da regressão) para a escala original das vendas.
+        """
+        return TARGET_TRANSFORMS[self.target_transform](np.asarray(values, dtype=np.float64))
+
+
+MODELS = {}
+
+
+def register_model(name, path, target_transform='sqrt', label=None):
+    """
+    Registra (ou substitui) o modelo `name` e retorna sua ModelSpec.
+    """
+    spec = MODELS[name] = ModelSpec(name, path, target_transform, label)
+    return spec
+
+
+def get_model_spec(name=DEFAULT_MODEL):
+    try:
+        return MODELS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model: {name}") from None
+
+
+register_model(DEFAULT_MODEL, MODEL_PATH, 'sqrt', label='LinearRegression')
+
+# Modelos adicionais, definidos na implantação: "nome=caminho,transformação;..." (a transformação é opcional)
+for _entry in filter(None, os.environ.get('BIGMART_MODELS', '').split(';')):
+    _name, _, _definition = _entry.partition('=')
+    _path, _, _transform = _definition.partition(',')
+    register_model(_name.strip(), os.path.join(BASE_DIR, _path.strip()), _transform.strip() or 'sqrt')
+
+
+# Validação dos arquivos enviados, antes da pontuação: colunas, tipos, intervalos e categorias.
+# Os intervalos são os mesmos dos campos da previsão individual.
+VALIDATION_RANGES = {
+    'Item_Visibility': (0.0, 0.5),
+    'Item_MRP': (0.0, 1000.0),
+}
+VALIDATION_EXAMPLES = 3
+NUMERIC_COLUMNS = [column for column, dtype in BIGMART_DTYPES.items() if dtype != 'category']
+
+
+def model_vocabularies(model=DEFAULT_MODEL):
+    """
+    Retorna {coluna: categorias aceitas} a partir dos encoders do modelo `model` (do pontuador
+    compilado quando disponível, senão percorrendo o pipeline sklearn).
+    """
+    spec = get_model_spec(model)
+    scorer = model_registry.get_scorer(spec.path)
+    if scorer is not None:
+        return {column: categories for kind, columns, _, params in scorer._blocks if kind != 'poly'
+                for column, categories in zip(columns, params)}
+
+    vocabularies = {}
+
+    def collect(estimator, columns=None):
+        if hasattr(estimator, 'transformers_'):
+            for _, transformer, transformer_columns in estimator.transformers_:
+                if not isinstance(transformer, str):
+                    collect(transformer, list(transformer_columns))
+        elif hasattr(estimator, 'steps'):
+            # Apenas o primeiro passo recebe as colunas originais
+            for position, (_, step) in enumerate(estimator.steps):
+                collect(step, columns if position == 0 else None)
+        elif columns is not None and hasattr(estimator, 'categories_'):
+            vocabularies.update(zip(columns, estimator.categories_))
+
+    collect(model_registry.get(spec.path))
+    return vocabularies
+
+
+def validate_upload(user_data, model=DEFAULT_MODEL):
+    """
+    Valida, com operações vetorizadas, um lote enviado pelo usuário antes da pontuação:
+
+    - presença das colunas de entrada (USER_COLUMNS);
+    - colunas numéricas: tipo numérico, valores presentes e dentro de VALIDATION_RANGES;
+    - colunas categóricas: valores presentes e, quando o modelo as codifica, pertencentes ao
+      vocabulário dos encoders (inclusive atributos de loja enviados no arquivo).
+
+    Retorna um dicionário com:
+        - 'n_rows' / 'n_invalid': total de linhas e de linhas com algum erro;
+        - 'valid': máscara booleana das linhas que podem ser pontuadas;
+        - 'errors': máscara de bits (uint32) por linha, o bit k indicando falha na verificação k;
+        - 'checks': lista de (coluna, problema) de cada bit;
+        - 'missing_columns': colunas obrigatórias ausentes (nenhuma linha é válida nesse caso);
+        - 'summary': DataFrame com coluna, problema, número de linhas e exemplos de valores.
+    """
+    with timed_stage('validate', rows=len(user_data)):
+        return _validate_upload(user_data, model)
+
+
+def _validate_upload(user_data, model):
+    n_rows = len(user_data)
+    errors = np.zeros(n_rows, dtype=np.uint32)
+    checks, examples, counts = [], [], []
+
+    def record(column, problem, failed, values=None, raw_values=()):
+        # Os exemplos (valores originais) só são extraídos quando a verificação falha
+        if not failed.any():
+            return
+        errors[failed] |= np.uint32(1 << len(checks))
+        checks.append((column, problem))
+        counts.append(int(failed.sum()))
+        sample = pd.unique(np.asarray(values[failed])) if values is not None else []
+        sample = [*raw_values, *(value for value in sample if not pd.isna(value))]
+        examples.append(', '.join(f"{value:.6g}" if isinstance(value, float) else str(value)
+                                  for value in sample[:VALIDATION_EXAMPLES]))
+
+    missing_columns = [column for column in USER_COLUMNS if column not in user_data.columns]
+    if missing_columns:
+        errors[:] = 1
+        checks.append((', '.join(missing_columns), 'coluna ausente'))
+        counts.append(n_rows)
+        examples.append('')
+
+    vocabularies = model_vocabularies(model)
+    columns = [column for column in (*USER_COLUMNS, *OUTLET_COLUMNS) if column in user_data.columns]
+    for column in columns:
+        series = user_data[column]
+        if column in NUMERIC_COLUMNS:
+            if not pd.api.types.is_numeric_dtype(series.dtype):
+                series = pd.to_numeric(series, errors='coerce')
+            values = series.to_numpy(dtype=np.float64)
+            # Na leitura tolerante, o texto original das células não numéricas (que viraram NaN)
+            record(column, 'ausente ou não numérico', ~np.isfinite(values), user_data[column],
+                   user_data.attrs.get('raw_values', {}).get(column, ()))
+            if column in VALIDATION_RANGES:
+                low, high = VALIDATION_RANGES[column]
+                record(column, f'fora do intervalo [{low:g}, {high:g}]', (values < low) | (values > high), values)
+            continue
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Verificação sobre as categorias (poucas) e expansão pelos códigos de cada linha
+            codes = series.cat.codes.to_numpy()
+            record(column, 'ausente', codes < 0)
+            if column in vocabularies:
+                known = np.append(series.cat.categories.isin(vocabularies[column]), True)
+                record(column, 'categoria desconhecida', ~known[codes], series)
+        else:
+            values = series.to_numpy()
+            missing = pd.isna(values)
+            record(column, 'ausente', missing)
+            if column in vocabularies:
+                record(column, 'categoria desconhecida', ~missing & ~series.isin(vocabularies[column]).to_numpy(), values)
+
+    valid = errors == 0
+    return {
+        'n_rows': n_rows,
+        'n_invalid': int(n_rows - valid.sum()),
+        'valid': valid,
+        'errors': errors,
+        'checks': checks,
+        'missing_columns': missing_columns,
+        'summary': pd.DataFrame({
+            'Coluna': [column for column, _ in checks],
+            'Problema': [problem for _, problem in checks],
+            'Linhas': counts,
+            'Exemplos': examples,
         }),
-    ], style={'width': '100%', 'position': 'relative'})
+    }
+
+
+def describe_validation_errors(user_data, report):
+    """
+    Retorna as linhas inválidas de `user_data` com o número da linha no arquivo (o cabeçalho é a
+    linha 1) e a descrição dos erros. A descrição é montada uma vez por combinação de erros.
+    """
+    invalid = ~report['valid']
+    masks = report['errors'][invalid]
+    unique_masks, inverse = np.unique(masks, return_inverse=True)
+    descriptions = np.array(['; '.join(f"{column}: {problem}" for k, (column, problem) in enumerate(report['checks'])
+                                       if mask >> k & 1) for mask in unique_masks], dtype=object)
+    columns = [column for column in USER_COLUMNS if column in user_data.columns]
+    rows = user_data.loc[invalid, columns].copy(deep=False) if columns else pd.DataFrame(index=user_data.index[invalid])
+    rows.insert(0, 'Linha', np.flatnonzero(invalid) + 2)
+    rows['Erros'] = descriptions[inverse]
+    return rows.reset_index(drop=True)
 
 
 # Função para fazer previsões com base nas entradas do usuário.
-def make_predictions(user_data):
+def make_predictions(user_data, model=DEFAULT_MODEL):
     '''
     Faz previsões de vendas com base nos dados fornecidos pelo usuário.
 
-    Esta função utiliza um modelo de regressão linear previamente treinado para 
+    Esta função utiliza um modelo previamente treinado (por padrão a regressão linear; ver `MODELS`) para 
     prever valores de vendas, permitindo entradas de dados em formato de dicionário (uma única previsão) 
     ou DataFrame (previsões em lote). O modelo foi treinado para trabalhar com features numéricas e categóricas,
     e pode inferir informações adicionais com base no identificador da loja ('Outlet_Identifier').
@@ -155,62 +1842,642 @@ def make_predictions(user_data):
     ValueError:
         - Caso o 'Outlet_Identifier' esteja ausente ou seja desconhecido no dicionário de entrada.
         - Caso o DataFrame ou dicionário fornecido não possua as colunas esperadas pelo modelo.
+        - Caso `model` não seja um modelo registrado.
 
     '''
-    # Caminho para o modelo treinado
-    location = os.getcwd()
-    path_model = os.path.join(location, 'Linear_Regression_best_model.pkl')
-    lr_model = load(path_model)
+    # Modelo treinado (carregado uma única vez por processo pelo registro)
+    spec = get_model_spec(model)
+    estimator = spec.estimator()
 
     # Se for uma previsão individual o input sera um dicionário:
     if isinstance(user_data, dict):
 
-      # Dicionário para inferência de diversos atributos baseada em 'Outlet_Identifier'
-      outlet_info = {
-          'OUT010': {'Outlet_Type': 'Grocery_Store', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_3', 'Outlet_Years': 25},
-          'OUT013': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'High', 'Outlet_Location_Type': 'Tier_3', 'Outlet_Years': 36},
-          'OUT017': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_2', 'Outlet_Years': 16},
-          'OUT018': {'Outlet_Type': 'Supermarket_Type2', 'Outlet_Size': 'Medium', 'Outlet_Location_Type': 'Tier_3', 'Outlet_Years': 14},
-          'OUT019': {'Outlet_Type': 'Grocery_Store', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_1', 'Outlet_Years': 38},
-          'OUT027': {'Outlet_Type': 'Supermarket_Type3', 'Outlet_Size': 'Medium', 'Outlet_Location_Type': 'Tier_3', 'Outlet_Years': 38},
-          'OUT035': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_2', 'Outlet_Years': 19},
-          'OUT045': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_2', 'Outlet_Years': 21},
-          'OUT046': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'Small', 'Outlet_Location_Type': 'Tier_1', 'Outlet_Years': 26},
-          'OUT049': {'Outlet_Type': 'Supermarket_Type1', 'Outlet_Size': 'Medium', 'Outlet_Location_Type': 'Tier_1', 'Outlet_Years': 24}
-      }
-
       # Verificar se 'Outlet_Identifier' está presente nos dados do usuário
       if 'Outlet_Identifier' not in user_data:
           raise ValueError("Missing 'Outlet_Identifier' in user data.")
 
-      outlet_identifier = user_data['Outlet_Identifier']
-      if outlet_identifier not in outlet_info:
-          raise ValueError(f"Unknown Outlet Identifier: {outlet_identifier}")
-
-      # Combinar os dois dicionários
-      combined_data = {**user_data, **outlet_info[outlet_identifier]}
-
       # Garantir que valores numéricos estejam encapsulados em listas
+      user_data = dict(user_data)
       num_features = ['Item_Visibility', 'Item_MRP', 'Outlet_Years']
       for feature in num_features:
-          if feature in combined_data and not isinstance(combined_data[feature], list):
-              combined_data[feature] = [combined_data[feature]]
+          if feature in user_data and not isinstance(user_data[feature], list):
+              user_data[feature] = [user_data[feature]]
+
+      # Converter dicionário para DataFrame
+      user_data = pd.DataFrame.from_dict(user_data)
 
-      # Converter dicionário combinado para DataFrame
-      user_data = pd.DataFrame.from_dict(combined_data)
+    # Inferir os atributos da loja a partir de 'Outlet_Identifier' (previsões individuais e em lote)
+    with timed_stage('enrich_outlets', rows=len(user_data)):
+        user_data = enrich_outlet_attributes(user_data)
 
     # Verificar colunas esperadas pelo modelo
-    expected_columns = lr_model.feature_names_in_
+    expected_columns = estimator.feature_names_in_
+    missing_columns = [column for column in expected_columns if column not in user_data.columns]
+    if missing_columns:
+        raise ValueError(f"Missing columns in user data: {', '.join(missing_columns)}")
 
     # Ordenar as colunas na ordem esperada
     user_data = user_data[expected_columns]
 
     # Fazer previsão
-    predictions = np.square(lr_model.predict(user_data))
+    with timed_stage('score', rows=len(user_data)):
+        predictions = spec.inverse_transform(estimator.predict(user_data))
 
     return predictions
 
 
+# Memoização das previsões individuais
+SINGLE_PREDICTION_CACHE_SIZE = 4096
+
+
+def normalize_single_input(user_input):
+    """
+    Normaliza a entrada de uma previsão individual na tupla usada como chave do cache:
+    (loja, produto, tipo, teor de gordura, visibilidade com 6 casas, preço com 2 casas).
+    """
+    return (
+        user_input['Outlet_Identifier'],
+        user_input['Item_Identifier'],
+        user_input['Item_Type'],
+        user_input['Item_Fat_Content'],
+        round(float(user_input['Item_Visibility']), 6),
+        round(float(user_input['Item_MRP']), 2),
+    )
+
+
+# Marca, por thread, se a última consulta ao cache de previsões individuais precisou do modelo
+_single_prediction_lookup = threading.local()
+
+
+@lru_cache(maxsize=SINGLE_PREDICTION_CACHE_SIZE)
+def _cached_single_prediction(outlet_identifier, item_identifier, item_type, item_fat_content,
+                              item_visibility, item_mrp):
+    _single_prediction_lookup.miss = True
+    return float(make_predictions({
+        'Outlet_Identifier': outlet_identifier,
+        'Item_Identifier': item_identifier,
+        'Item_Type': item_type,
+        'Item_Fat_Content': item_fat_content,
+        'Item_Visibility': item_visibility,
+        'Item_MRP': item_mrp,
+    })[0])
+
+
+def predict_single(user_input):
+    """
+    Previsão individual com memoização LRU: entradas que normalizam para a mesma chave são
+    respondidas do cache, sem passar pelo modelo. O cache é limpo quando o modelo é recarregado,
+    e cada consulta é contada em /metrics (hit/miss).
+    """
+    # Consulta o registro para detectar uma eventual troca do arquivo do modelo antes de usar o cache
+    model_registry.refresh()
+    _single_prediction_lookup.miss = False
+    prediction = _cached_single_prediction(*normalize_single_input(user_input))
+    metrics.inc('bigmart_single_prediction_cache_requests_total',
+                result='miss' if _single_prediction_lookup.miss else 'hit')
+    return prediction
+
+
+model_registry.add_reload_hook(lambda path: _cached_single_prediction.cache_clear())
+
+
+# Previsão individual no navegador: o modelo linear é exportado como um pequeno JSON em /assets
+# (pelo script export_client_model.py, na instalação) e avaliado por assets/clientside.js
+CLIENT_MODEL_PATH = os.path.join(BASE_DIR, 'assets', 'bigmart_model.json')
+
+
+def client_model_digest(model=DEFAULT_MODEL):
+    """
+    Hash do modelo em uso, comparado pelo navegador com o do arquivo exportado: se diferirem (ou
+    se o arquivo não existir), a previsão individual é calculada no servidor.
+    """
+    return model_registry.digest(get_model_spec(model).path)
+
+
+def build_client_model(model=DEFAULT_MODEL):
+    """
+    Exporta a forma reescrita do pontuador compilado (ver `CompiledLinearScorer._fold`) para o
+    navegador, que a avalia na mesma ordem de operações de `CompiledLinearScorer.predict`.
+
+    Retorna um dicionário serializável em JSON com:
+        - 'outlets': por loja, o deslocamento e os valores numéricos usados pelos termos restantes;
+        - 'lookups': peso de cada categoria das colunas categóricas que não são da loja;
+        - 'terms': termos polinomiais restantes (colunas, expoentes, centro, escala e coeficiente);
+        - 'rounding': casas decimais aplicadas às entradas numéricas (como em `normalize_single_input`);
+        - 'model', 'digest' e 'target_transform'.
+    ou None, se o modelo não for linear (não compilável) ou não usar Outlet_Identifier.
+    """
+    spec = get_model_spec(model)
+    scorer = model_registry.get_scorer(spec.path)
+    if scorer is None or scorer._outlets is None:
+        return None
+
+    terms = [{
+        'columns': list(columns),
+        'powers': [int(exponent) for exponent in exponents],
+        'center': center,
+        'scale': scale,
+        'coef': coef,
+    } for columns, exponents, center, scale, coef in scorer._terms]
+    numeric_columns = sorted({column for term in terms for column in term['columns']} & set(OUTLET_COLUMNS))
+    return {
+        'model': spec.name,
+        'digest': client_model_digest(model),
+        'target_transform': spec.target_transform,
+        'outlets': {
+            outlet: {
+                'offset': float(offset),
+                'values': {column: OUTLET_TABLE[column].iloc[i].item() for column in numeric_columns},
+            }
+            for i, (outlet, offset) in enumerate(zip(scorer._outlets, scorer._offsets))
+        },
+        'lookups': {
+            column: {str(category): float(weight) for category, weight in zip(categories, weights)}
+            for column, categories, weights in scorer._lookups
+        },
+        'terms': terms,
+        'rounding': {'Item_Visibility': 6, 'Item_MRP': 2},
+    }
+
+
+def export_client_model(path=CLIENT_MODEL_PATH, model=DEFAULT_MODEL):
+    """
+    Grava o modelo do navegador em `path` (apenas se o conteúdo mudou) e retorna True. Se o
+    modelo não for compilável, remove o arquivo antigo e retorna False; nesse caso a previsão
+    individual é calculada no servidor.
+    """
+    client_model = build_client_model(model)
+    if client_model is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+
+    payload = json.dumps(client_model, separators=(',', ':'))
+    try:
+        with open(path) as f:
+            if f.read() == payload:
+                return True
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return True
+
+
+# API de previsões (/api/predict): registros no formato da previsão individual, com as requisições
+# concorrentes agrupadas em micro-lotes pontuados em uma única chamada vetorizada
+API_MAX_BATCH_SIZE = int(os.environ.get('BIGMART_API_BATCH_SIZE', 256))
+API_MAX_WAIT_MS = float(os.environ.get('BIGMART_API_WAIT_MS', 5))
+API_MAX_RECORDS = int(os.environ.get('BIGMART_API_MAX_RECORDS', 10_000))
+API_TIMEOUT_SECONDS = float(os.environ.get('BIGMART_API_TIMEOUT', 30))
+
+
+# Tipos aceitos em cada campo dos registros da API (bool não conta como número)
+API_NUMERIC_COLUMNS = ('Item_Visibility', 'Item_MRP')
+
+
+def api_record_errors(record):
+    """
+    Erros de tipo dos campos de um registro da API, ou None: as categorias devem ser texto e os
+    campos numéricos, números reais. Campos ausentes ou nulos são apontados por `validate_upload`.
+    """
+    errors = []
+    for column in USER_COLUMNS:
+        value = record.get(column)
+        if value is None:
+            continue
+        if column in API_NUMERIC_COLUMNS:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                errors.append(f"{column}: deve ser um número")
+        elif not isinstance(value, str):
+            errors.append(f"{column}: deve ser texto")
+    return '; '.join(errors) or None
+
+
+def score_records(records, model=DEFAULT_MODEL):
+    """
+    Pontua uma lista de registros (dicionários com as chaves de USER_COLUMNS, como na previsão
+    individual, já conferidos por `api_record_errors`) com uma única chamada de `make_predictions`.
+    Cada registro passa por `validate_upload`, e sua previsão não depende dos demais registros do
+    lote: é a mesma do download do dashboard para uma linha com os mesmos valores.
+
+    Retorna (previsões, erros): listas alinhadas com `records`, com a previsão (float) ou None e
+    a descrição dos erros do registro ou None.
+    """
+    frame = pd.DataFrame.from_records(records, columns=USER_COLUMNS)
+    for column in API_NUMERIC_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors='coerce')
+
+    report = validate_upload(frame, model)
+    predictions = np.full(len(frame), np.nan)
+    errors = np.full(len(frame), None, dtype=object)
+    if report['n_invalid']:
+        errors[~report['valid']] = describe_validation_errors(frame, report)['Erros'].to_numpy()
+    if report['n_invalid'] < len(frame):
+        predictions[report['valid']] = make_predictions(frame[report['valid']], model=model)
+    return [None if error is not None else float(value) for value, error in zip(predictions, errors)], errors.tolist()
+
+
+class MicroBatcher:
+    """
+    Agrupa os pedidos de previsão de threads concorrentes (ex.: requisições atendidas pelo mesmo
+    worker) em micro-lotes pontuados por `score(registros)` em uma única chamada.
+
+    Uma thread de fundo, criada no primeiro pedido de cada processo (inclusive depois do fork
+    dos workers do gunicorn), espera até `max_wait_ms` milissegundos por mais pedidos após o
+    primeiro, ou até juntar `max_batch_size` registros; os pedidos que já estão na fila quando o
+    prazo termina entram no mesmo lote. Se todos os pedidos em andamento já estão no lote, não
+    há o que esperar: um cliente isolado não paga o prazo. Os registros de um pedido nunca são
+    divididos entre lotes.
+    """
+
+    def __init__(self, score, max_batch_size=API_MAX_BATCH_SIZE, max_wait_ms=API_MAX_WAIT_MS):
+        self.score = score
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._in_flight = 0
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                self._in_flight = 0
+                threading.Thread(target=self._run, args=(self._queue,), name='api-micro-batcher', daemon=True).start()
+            return self._queue
+
+    def submit(self, records, timeout=API_TIMEOUT_SECONDS):
+        """
+        Enfileira `records` e aguarda o resultado de `score` para eles (mesmo formato, só os
+        elementos correspondentes a `records`).
+        """
+        future = Future()
+        requests = self._ensure_worker()
+        with self._lock:
+            self._in_flight += 1
+        requests.put((records, future))
+        return future.result(timeout)
+
+    def _run(self, requests):
+        while True:
+            batch = [requests.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size and len(batch) < self._in_flight:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            with self._lock:
+                self._in_flight -= len(batch)
+            self._score_batch(batch)
+
+    def _score_batch(self, batch):
+        records = [record for request_records, _ in batch for record in request_records]
+        try:
+            results = self.score(records)
+        except Exception as e:  # noqa: BLE001 - o erro é devolvido aos pedidos que o causaram
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Um pedido inválido não derruba os demais: cada pedido do lote é pontuado sozinho
+            for item in batch:
+                self._score_batch([item])
+            return
+        metrics.inc('bigmart_api_batches_total')
+        metrics.inc('bigmart_api_records_total', len(records))
+        start = 0
+        for request_records, future in batch:
+            end = start + len(request_records)
+            future.set_result(tuple(result[start:end] for result in results))
+            start = end
+
+
+api_batcher = MicroBatcher(score_records)
+
+
+def predict_records(records, timeout=API_TIMEOUT_SECONDS):
+    """
+    Previsões da API para `records`: os registros com erros de tipo (ver `api_record_errors`) são
+    recusados antes de entrar no micro-lote compartilhado e os demais são pontuados pelo
+    `api_batcher`. Retorna (previsões, erros) alinhados com `records`.
+    """
+    errors = [api_record_errors(record) for record in records]
+    accepted = [i for i, error in enumerate(errors) if error is None]
+    predictions = [None] * len(records)
+    if accepted:
+        scored, scored_errors = api_batcher.submit([records[i] for i in accepted], timeout)
+        for i, prediction, error in zip(accepted, scored, scored_errors):
+            predictions[i], errors[i] = prediction, error
+    return predictions, errors
+
+
+# Simulação de cenários (what-if): uma grade de preço x visibilidade pontuada em uma única chamada
+SWEEP_GRID_POINTS = 25
+SWEEP_MRP_RANGE = (30.0, 270.0)
+SWEEP_VISIBILITY_RANGE = (0.0, 0.3)
+
+
+def build_sweep_grid(user_input, mrp_range=SWEEP_MRP_RANGE, visibility_range=SWEEP_VISIBILITY_RANGE,
+                     points=SWEEP_GRID_POINTS, all_outlets=False):
+    """
+    Monta, com operações vetorizadas, o lote de cenários de um produto:
+
+    - 'grid': `points` x `points` combinações de 'Item_MRP' e 'Item_Visibility' na loja escolhida;
+    - 'curve': `points` valores de 'Item_MRP' na visibilidade informada, para a loja escolhida
+      (ou para todas as lojas, se `all_outlets`).
+
+    Retorna um DataFrame com as colunas de entrada do modelo e a coluna 'Scenario' ('grid'/'curve').
+    """
+    mrp_values = np.linspace(*mrp_range, points)
+    visibility_values = np.linspace(*visibility_range, points)
+    outlets = list(OUTLET_INFO) if all_outlets else [user_input['Outlet_Identifier']]
+    visibility = user_input.get('Item_Visibility')
+    visibility = float(np.mean(visibility_range) if visibility is None else visibility)
+
+    # Grade (linha = visibilidade, coluna = preço) seguida das curvas de resposta por loja
+    n_grid, n_curve = points * points, points * len(outlets)
+    scenario = np.repeat(np.array(['grid', 'curve']), [n_grid, n_curve])
+    grid_outlet = [user_input['Outlet_Identifier']] * n_grid
+    sweep = pd.DataFrame({
+        'Item_Identifier': user_input['Item_Identifier'],
+        'Item_Fat_Content': pd.Categorical([user_input['Item_Fat_Content']] * (n_grid + n_curve)),
+        'Item_Visibility': np.concatenate([np.repeat(visibility_values, points), np.full(n_curve, visibility)]),
+        'Item_Type': pd.Categorical([user_input['Item_Type']] * (n_grid + n_curve)),
+        'Item_MRP': np.concatenate([np.tile(mrp_values, points), np.tile(mrp_values, len(outlets))]),
+        'Outlet_Identifier': pd.Categorical(grid_outlet + list(np.repeat(outlets, points)), categories=list(OUTLET_INFO)),
+        'Scenario': scenario,
+    })
+    return sweep
+
+
+def sweep_predictions(user_input, mrp_range=SWEEP_MRP_RANGE, visibility_range=SWEEP_VISIBILITY_RANGE,
+                      points=SWEEP_GRID_POINTS, all_outlets=False):
+    """
+    Pontua todos os cenários de `build_sweep_grid` em uma única chamada de `make_predictions`
+    e retorna a grade com a coluna 'Item_Outlet_Sales'.
+    """
+    sweep = build_sweep_grid(user_input, mrp_range, visibility_range, points, all_outlets)
+    with timed_stage('sweep', rows=len(sweep)):
+        sweep['Item_Outlet_Sales'] = make_predictions(sweep)
+    return sweep
+
+
+# Previsões em lote divididas em fatias de linhas e pontuadas em um pool de processos
+BATCH_SHARD_ROWS = int(os.environ.get('BIGMART_SHARD_ROWS', 200_000))
+BATCH_POOL_WORKERS = int(os.environ.get('BIGMART_POOL_WORKERS', os.cpu_count() or 1))
+BATCH_JOB_TIMEOUT_SECONDS = float(os.environ.get('BIGMART_JOB_TIMEOUT', 600))
+
+class ShardPool:
+    """
+    Pool de processos que pontua as fatias de um job em lote (ver `score_in_shards`).
+
+    Cada job em segundo plano roda em um processo próprio, descartado ao fim do job, então o pool
+    pertence ao job: é criado apenas quando a primeira fatia precisa dele (lotes de uma fatia não
+    iniciam processos) e encerrado por `shutdown`, que o job deve chamar ao terminar (ou usar o
+    pool em um bloco `with`). Cada worker aquece o modelo na inicialização.
+    """
+
+    def __init__(self, max_workers=BATCH_POOL_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+
+    def submit(self, fn, *args):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=warm_up_model)
+        return self._executor.submit(fn, *args)
+
+    def shutdown(self):
+        """
+        Cancela as fatias que ainda não começaram e aguarda o fim dos workers.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def _score_shard(shard):
+    # Executada nos workers do pool: envia as métricas da fatia antes de devolver o resultado
+    predictions = make_predictions(shard)
+    metrics.flush(force=True)
+    return predictions
+
+
+def score_in_shards(user_data, set_progress=None, pool=None, shard_rows=BATCH_SHARD_ROWS,
+                    timeout=BATCH_JOB_TIMEOUT_SECONDS):
+    """
+    Faz as previsões de `user_data` dividindo-o em fatias de `shard_rows` linhas, pontuadas em
+    paralelo no `pool` (um ShardPool do job; sem ele, um pool é criado e encerrado nesta chamada).
+    `set_progress(concluídas, total)` é chamada a cada fatia.
+
+    Exceções:
+    ---------
+    TimeoutError:
+        - Caso as fatias não terminem em `timeout` segundos (as fatias pendentes são canceladas).
+    """
+    with timed_stage('score_shards', rows=len(user_data)):
+        if pool is None:
+            with ShardPool() as pool:
+                return _score_in_shards(user_data, set_progress, pool, shard_rows, timeout)
+        return _score_in_shards(user_data, set_progress, pool, shard_rows, timeout)
+
+
+def _score_in_shards(user_data, set_progress, pool, shard_rows, timeout):
+    n_shards = max(1, -(-len(user_data) // shard_rows))
+    if n_shards == 1:
+        predictions = make_predictions(user_data)
+        if set_progress is not None:
+            set_progress(1, 1)
+        return predictions
+
+    futures = {pool.submit(_score_shard, user_data.iloc[i * shard_rows:(i + 1) * shard_rows]): i
+               for i in range(n_shards)}
+    results = [None] * n_shards
+    try:
+        for done, future in enumerate(as_completed(futures, timeout=timeout), start=1):
+            results[futures[future]] = future.result()
+            if set_progress is not None:
+                set_progress(done, n_shards)
+    except FuturesTimeoutError:
+        for future in futures:
+            future.cancel()
+        raise TimeoutError(f"As previsões não terminaram em {timeout:.0f} segundos.")
+    return np.concatenate(results)
+
+
+def prediction_output(user_inputs, predictions):
+    """
+    Previsões no formato do arquivo de download ("Baixar Previsões"): loja, produto e vendas
+    previstas arredondadas em centavos. As colunas de `user_inputs` não são copiadas.
+    """
+    return pd.DataFrame({
+        'Outlet_Identifier': user_inputs['Outlet_Identifier'],
+        'Item_Identifier': user_inputs['Item_Identifier'],
+        'Item_Outlet_Sales': np.round(predictions, 2),
+    }, copy=False)
+
+
+def score_output_shard(shard):
+    """
+    Enriquece, pontua e formata uma fatia de linhas válidas como no download. Executada nos
+    workers do pool pela pontuação em linha de comando (score_batch.py).
+    """
+    shard = enrich_outlet_attributes(shard)
+    return prediction_output(shard, make_predictions(shard))
+
+
+def warm_up_model():
+    """
+    Carrega os modelos registrados e executa uma previsão de aquecimento com cada um, de modo
+    que a primeira requisição do usuário pague apenas o tempo de inferência.
+    """
+    sample = {
+        'Outlet_Identifier': 'OUT049',
+        'Item_Identifier': 'FDA15',
+        'Item_Type': 'Dairy',
+        'Item_Fat_Content': 'Low_Fat',
+        'Item_Visibility': 0.016,
+        'Item_MRP': 249.81,
+    }
+    for name in MODELS:
+        make_predictions(sample, model=name)
+
+
+# Comparação de modelos: o mesmo lote pontuado por vários modelos registrados em um pool de
+# threads (as bibliotecas de árvores e o BLAS liberam o GIL durante a pontuação)
+MODEL_COMPARISON_WORKERS = int(os.environ.get('BIGMART_MODEL_WORKERS', 4))
+
+_thread_pool = None
+_thread_pool_lock = threading.Lock()
+
+
+def get_thread_pool():
+    """
+    Retorna o pool de threads da comparação de modelos, criando-o na primeira chamada.
+    """
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=MODEL_COMPARISON_WORKERS,
+                                              thread_name_prefix='bigmart-models')
+        return _thread_pool
+
+
+def _timed_predictions(user_data, model):
+    start = time.perf_counter()
+    predictions = make_predictions(user_data, model=model)
+    return predictions, time.perf_counter() - start
+
+
+def compare_models(user_data, models=None, timeout=BATCH_JOB_TIMEOUT_SECONDS):
+    """
+    Pontua `user_data` com cada modelo de `models` (por padrão, todos os registrados) em
+    paralelo e retorna `(previsões, estatísticas)`:
+
+        - previsões: DataFrame com uma coluna de vendas previstas por modelo e a coluna
+          'Spread' (diferença entre a maior e a menor previsão de cada linha);
+        - estatísticas: dicionário produzido por `model_disagreement`, acrescido de
+          'latency' (segundos por modelo) e 'total_seconds' (tempo total da comparação).
+
+    Os atributos das lojas são anexados uma única vez, antes de distribuir o lote.
+
+    Exceções:
+    ---------
+    ValueError:
+        - Caso algum nome em `models` não seja um modelo registrado.
+    TimeoutError:
+        - Caso os modelos não terminem em `timeout` segundos.
+    """
+    models = list(models or MODELS)
+    for name in models:
+        get_model_spec(name)
+
+    start = time.perf_counter()
+    with timed_stage('compare_models', rows=len(user_data)):
+        user_data = enrich_outlet_attributes(user_data)
+        pool = get_thread_pool()
+        # Cada thread herda o contexto atual, para que as métricas fiquem associadas ao callback
+        futures = {name: pool.submit(contextvars.copy_context().run, _timed_predictions, user_data, name)
+                   for name in models}
+        try:
+            results = {name: future.result(timeout=timeout) for name, future in futures.items()}
+        except FuturesTimeoutError:
+            for future in futures.values():
+                future.cancel()
+            raise TimeoutError(f"A comparação de modelos não terminou em {timeout:.0f} segundos.")
+
+    predictions = pd.DataFrame({name: results[name][0] for name in models}, index=user_data.index)
+    predictions['Spread'] = predictions[models].max(axis=1) - predictions[models].min(axis=1)
+    stats = model_disagreement(predictions[models])
+    stats['latency'] = {name: results[name][1] for name in models}
+    stats['total_seconds'] = time.perf_counter() - start
+    return predictions, stats
+
+
+def model_disagreement(predictions):
+    """
+    Calcula a divergência entre as colunas de `predictions` (uma por modelo). Retorna:
+
+        - 'summary': média, desvio padrão e total das previsões de cada modelo;
+        - 'pairwise': para cada par de modelos, diferença absoluta média e máxima, diferença
+          média (primeiro menos segundo), correlação e fração de linhas com diferença relativa
+          acima de 10%;
+        - 'spread': média, percentil 95 e máximo da diferença entre a maior e a menor previsão.
+    """
+    values = predictions.to_numpy(dtype=np.float64)
+    names = list(predictions.columns)
+    summary = pd.DataFrame({
+        'Modelo': names,
+        'Média': values.mean(axis=0),
+        'Desvio': values.std(axis=0),
+        'Total': values.sum(axis=0),
+    })
+
+    pairs = []
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            diff = values[:, i] - values[:, j]
+            scale = np.maximum(np.abs(values[:, i]), np.abs(values[:, j]))
+            relative = np.divide(np.abs(diff), scale, out=np.zeros_like(diff), where=scale > 0)
+            pairs.append({
+                'Modelo A': names[i],
+                'Modelo B': names[j],
+                'Dif. abs. média': np.abs(diff).mean() if len(diff) else 0.0,
+                'Dif. abs. máxima': np.abs(diff).max() if len(diff) else 0.0,
+                'Dif. média (A - B)': diff.mean() if len(diff) else 0.0,
+                'Correlação': np.corrcoef(values[:, i], values[:, j])[0, 1] if len(diff) > 1 else np.nan,
+                'Linhas > 10%': (relative > 0.1).mean() if len(diff) else 0.0,
+            })
+    pairwise = pd.DataFrame(pairs, columns=['Modelo A', 'Modelo B', 'Dif. abs. média', 'Dif. abs. máxima',
+                                            'Dif. média (A - B)', 'Correlação', 'Linhas > 10%'])
+
+    spread = values.max(axis=1) - values.min(axis=1) if values.size else np.zeros(1)
+    return {
+        'summary': summary,
+        'pairwise': pairwise,
+        'spread': {
+            'mean': float(spread.mean()),
+            'p95': float(np.percentile(spread, 95)),
+            'max': float(spread.max()),
+        },
+    }
+
+
 # Apartir daqui são as funções de plot 
 
 # Paleta de Cores
@@ -238,49 +2505,618 @@ CATEGORY_COLORS = {
 }
 
 
+def _color_map(categories):
+    """
+    Retorna o mapa de cores das categorias, levantando erro se alguma não tiver cor atribuída.
+    """
+    missing_categories = set(categories) - set(CATEGORY_COLORS.keys())
+    if missing_categories:
+        raise ValueError(f"As seguintes categorias não têm cores atribuídas: {missing_categories}")
+    return {cat: CATEGORY_COLORS[cat] for cat in categories}
+
+
 def assign_colors(df, category_col):
     """
     Garante que todas as categorias no DataFrame tenham uma cor atribuída fixa.
     Se alguma categoria não estiver no mapeamento, levanta um aviso ou atribui uma cor padrão fixa.
     """
-    global CATEGORY_COLORS
+    # Retornar um mapa de cores para as categorias presentes no DataFrame
+    return _color_map(df[category_col].unique())
 
-    # Verificar categorias presentes no DataFrame
-    categories_in_data = set(df[category_col].unique())
 
-    # Identificar categorias que não possuem cores atribuídas
-    missing_categories = categories_in_data - set(CATEGORY_COLORS.keys())
+# Esboço (histograma) da visibilidade por tipo de produto, usado nos quartis do boxplot: os
+# histogramas de lotes diferentes são somados, o que torna os agregados mescláveis
+VISIBILITY_SKETCH_BINS = 4096
+VISIBILITY_SKETCH_RANGE = VALIDATION_RANGES['Item_Visibility']
 
-    # Levantar exceção ou logar categorias ausentes
-    if missing_categories:
-        raise ValueError(f"As seguintes categorias não têm cores atribuídas: {missing_categories}")
 
-    # Retornar um mapa de cores para as categorias presentes no DataFrame
-    return {cat: CATEGORY_COLORS[cat] for cat in categories_in_data}
+def _vocabulary_codes(series, column):
+    """
+    Códigos de `series` no vocabulário fixo de CATEGORY_DTYPES[column].
+    """
+    categories = CATEGORY_DTYPES[column].categories
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        positions = np.append(categories.get_indexer(series.cat.categories), -1)
+        codes = positions[series.cat.codes.to_numpy()]
+    else:
+        codes = categories.get_indexer(series)
+    if (codes < 0).any():
+        raise ValueError(f"Valores desconhecidos em '{column}'.")
+    return codes
+
+
+@timed_stage('aggregates')
+def partial_sales_aggregates(df):
+    """
+    Calcula, a partir dos códigos categóricos de `df`, os agregados parciais de um lote, indexados
+    pelos vocabulários fixos de 'Item_Type' (T) e 'Outlet_Identifier' (L), para que lotes
+    diferentes possam ser somados com `merge_sales_aggregates`:
+
+        - 'n_rows', 'total_sales', 'visibility_min' e 'visibility_max';
+        - 'sales_by_type' (T) e 'outlet_type_sales' / 'outlet_type_count' (L x T);
+        - 'outlet_size' / 'outlet_location' (L, None para lojas ausentes);
+        - 'visibility_counts' (T x bins) e 'visibility_bin_min' / 'visibility_bin_max' (T x bins):
+          contagem e extremos observados em cada faixa do esboço da visibilidade.
+
+    Custo proporcional ao número de linhas de `df`.
+    """
+    type_codes = _vocabulary_codes(df['Item_Type'], 'Item_Type')
+    outlet_codes = _vocabulary_codes(df['Outlet_Identifier'], 'Outlet_Identifier')
+    sales = df['Item_Outlet_Sales'].to_numpy(dtype=np.float64)
+    visibility = df['Item_Visibility'].to_numpy(dtype=np.float64)
+    n_types = len(CATEGORY_DTYPES['Item_Type'].categories)
+    n_outlets = len(CATEGORY_DTYPES['Outlet_Identifier'].categories)
+
+    # Somas e contagens por tipo de produto e por (loja, tipo de produto)
+    sales_by_type = np.bincount(type_codes, weights=sales, minlength=n_types)
+    pair_codes = outlet_codes * n_types + type_codes
+    outlet_type_sales = np.bincount(pair_codes, weights=sales, minlength=n_outlets * n_types).reshape(n_outlets, n_types)
+    outlet_type_count = np.bincount(pair_codes, minlength=n_outlets * n_types).reshape(n_outlets, n_types)
+
+    # Atributos de cada loja presente (primeira ocorrência)
+    present_outlets, first_rows = np.unique(outlet_codes, return_index=True)
+    outlet_size = np.full(n_outlets, None, dtype=object)
+    outlet_location = np.full(n_outlets, None, dtype=object)
+    outlet_size[present_outlets] = df['Outlet_Size'].iloc[first_rows].to_numpy()
+    outlet_location[present_outlets] = df['Outlet_Location_Type'].iloc[first_rows].to_numpy()
+
+    # Esboço da visibilidade: contagem e extremos por (tipo de produto, faixa)
+    low, high = VISIBILITY_SKETCH_RANGE
+    bins = np.clip(((visibility - low) / (high - low) * VISIBILITY_SKETCH_BINS).astype(np.int64),
+                   0, VISIBILITY_SKETCH_BINS - 1)
+    cell_codes = type_codes * VISIBILITY_SKETCH_BINS + bins
+    n_cells = n_types * VISIBILITY_SKETCH_BINS
+    bin_min = np.full(n_cells, np.inf)
+    bin_max = np.full(n_cells, -np.inf)
+    np.minimum.at(bin_min, cell_codes, visibility)
+    np.maximum.at(bin_max, cell_codes, visibility)
+
+    return {
+        'n_rows': len(df),
+        'total_sales': float(sales.sum()),
+        'visibility_min': float(visibility.min()) if len(df) else np.inf,
+        'visibility_max': float(visibility.max()) if len(df) else -np.inf,
+        'sales_by_type': sales_by_type,
+        'outlet_type_sales': outlet_type_sales,
+        'outlet_type_count': outlet_type_count,
+        'outlet_size': outlet_size,
+        'outlet_location': outlet_location,
+        'visibility_counts': np.bincount(cell_codes, minlength=n_cells).reshape(n_types, VISIBILITY_SKETCH_BINS),
+        'visibility_bin_min': bin_min.reshape(n_types, VISIBILITY_SKETCH_BINS),
+        'visibility_bin_max': bin_max.reshape(n_types, VISIBILITY_SKETCH_BINS),
+    }
 
 
+def merge_sales_aggregates(left, right):
+    """
+    Combina dois agregados parciais (ver `partial_sales_aggregates`). O custo depende apenas do
+    tamanho dos vocabulários e do esboço, não do número de linhas já acumuladas.
+    """
+    return {
+        'n_rows': left['n_rows'] + right['n_rows'],
+        'total_sales': left['total_sales'] + right['total_sales'],
+        'visibility_min': min(left['visibility_min'], right['visibility_min']),
+        'visibility_max': max(left['visibility_max'], right['visibility_max']),
+        'sales_by_type': left['sales_by_type'] + right['sales_by_type'],
+        'outlet_type_sales': left['outlet_type_sales'] + right['outlet_type_sales'],
+        'outlet_type_count': left['outlet_type_count'] + right['outlet_type_count'],
+        'outlet_size': np.where(pd.isna(left['outlet_size']), right['outlet_size'], left['outlet_size']),
+        'outlet_location': np.where(pd.isna(left['outlet_location']), right['outlet_location'], left['outlet_location']),
+        'visibility_counts': left['visibility_counts'] + right['visibility_counts'],
+        'visibility_bin_min': np.minimum(left['visibility_bin_min'], right['visibility_bin_min']),
+        'visibility_bin_max': np.maximum(left['visibility_bin_max'], right['visibility_bin_max']),
+    }
 
-def plotly_sales_by_category(df):
-    # Calculando as porcentagens de vendas
-    total_sales = df['Item_Outlet_Sales'].sum()
-    df['Sales Percentage'] = df['Item_Outlet_Sales'] / total_sales * 100
 
-    # Ordenando as categorias por porcentagem de vendas
-    df = df.sort_values('Sales Percentage', ascending=False)
+def _sketch_order_statistic(cumulative, counts, bin_min, bin_max, k):
+    """
+    Estimativa do k-ésimo menor valor (base 0): localiza a faixa pela contagem acumulada e
+    interpola entre os extremos observados nela. Exata para faixas com até dois valores.
+    """
+    b = int(np.searchsorted(cumulative, k, side='right'))
+    position = k - (cumulative[b] - counts[b])
+    fraction = position / (counts[b] - 1) if counts[b] > 1 else 0.0
+    return bin_min[b] + (bin_max[b] - bin_min[b]) * fraction
+
+
+def _sketch_quantile(counts, bin_min, bin_max, q):
+    """
+    Quantil `q` estimado a partir do esboço, com a mesma interpolação linear de `np.quantile`
+    entre as duas estatísticas de ordem vizinhas.
+    """
+    cumulative = np.cumsum(counts)
+    rank = q * (cumulative[-1] - 1)
+    below, fraction = int(np.floor(rank)), rank - np.floor(rank)
+    lower = _sketch_order_statistic(cumulative, counts, bin_min, bin_max, below)
+    if fraction == 0:
+        return lower
+    upper = _sketch_order_statistic(cumulative, counts, bin_min, bin_max, below + 1)
+    return lower + (upper - lower) * fraction
+
+
+def _visibility_stats(counts, bin_min, bin_max):
+    """
+    Quartis e limites (1,5 IQR) da visibilidade de um tipo de produto, a partir do esboço.
+    Os limites são o menor e o maior valor observados dentro do intervalo, com erro máximo de
+    uma faixa quando o intervalo termina no meio dela.
+
+    'outliers' são os valores fora do intervalo entre os extremos observados de cada faixa: cada
+    faixa com outliers aparece pelos seus valores reais mínimo e máximo (no máximo dois pontos por
+    faixa, de largura menor que um pixel no gráfico), o que limita a lista ao tamanho do esboço.
+    """
+    q1, median, q3 = (_sketch_quantile(counts, bin_min, bin_max, q) for q in (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    occupied = counts > 0
+    inside_low = occupied & (bin_max >= lower)
+    inside_high = occupied & (bin_min <= upper)
+    first, last = np.argmax(inside_low), len(counts) - 1 - np.argmax(inside_high[::-1])
+    observed = np.unique(np.concatenate([bin_min[occupied], bin_max[occupied]]))
+    return {
+        'q1': q1, 'median': median, 'q3': q3,
+        'lowerfence': max(bin_min[first], lower), 'upperfence': min(bin_max[last], upper),
+        'outliers': observed[(observed < lower) | (observed > upper)],
+    }
+
+
+def finalize_sales_aggregates(partial):
+    """
+    Converte os agregados parciais no formato usado pelos gráficos do dashboard, restrito aos
+    tipos de produto e lojas presentes:
+
+        - 'item_types': tipos de produto presentes;
+        - 'sales_by_type': vendas totais por tipo de produto;
+        - 'outlets': lojas presentes, com 'outlet_size' e 'outlet_location' de cada uma;
+        - 'outlet_type_sales' / 'outlet_type_count': soma e contagem de vendas por (loja, tipo);
+        - 'visibility_stats': quartis e limites (1,5 IQR) da visibilidade por tipo de produto;
+        - 'visibility_min' / 'visibility_max': extremos da visibilidade (linha de tendência);
+        - 'total_sales', 'mean_sales', 'n_rows' e 'color_map'.
+    """
+    type_present = partial['visibility_counts'].sum(axis=1) > 0
+    outlet_present = partial['outlet_type_count'].sum(axis=1) > 0
+    item_types = np.asarray(CATEGORY_DTYPES['Item_Type'].categories)[type_present]
+    n_rows = partial['n_rows']
+    visibility_stats = [
+        _visibility_stats(counts, bin_min, bin_max)
+        for counts, bin_min, bin_max in zip(partial['visibility_counts'][type_present],
+                                            partial['visibility_bin_min'][type_present],
+                                            partial['visibility_bin_max'][type_present])
+    ]
+    return {
+        'item_types': item_types,
+        'sales_by_type': partial['sales_by_type'][type_present],
+        'outlets': np.asarray(CATEGORY_DTYPES['Outlet_Identifier'].categories)[outlet_present],
+        'outlet_size': partial['outlet_size'][outlet_present],
+        'outlet_location': partial['outlet_location'][outlet_present],
+        'outlet_type_sales': partial['outlet_type_sales'][np.ix_(outlet_present, type_present)],
+        'outlet_type_count': partial['outlet_type_count'][np.ix_(outlet_present, type_present)],
+        'visibility_stats': visibility_stats,
+        'total_sales': partial['total_sales'],
+        'mean_sales': partial['total_sales'] / n_rows if n_rows else 0.0,
+        'visibility_min': partial['visibility_min'] if n_rows else 0.0,
+        'visibility_max': partial['visibility_max'] if n_rows else 0.0,
+        'n_rows': n_rows,
+        'color_map': _color_map(item_types),
+    }
+
+
+def build_sales_aggregates(df):
+    """
+    Calcula todos os agregados usados pelos gráficos do dashboard em uma única passada sobre `df`
+    (ver `finalize_sales_aggregates` para o formato), de forma que os gráficos não precisem varrer
+    o DataFrame completo novamente.
+    """
+    return finalize_sales_aggregates(partial_sales_aggregates(df))
+
+
+# Lotes incrementais: vários arquivos enviados na mesma sessão, pontuados à medida que chegam.
+# O gráfico de dispersão usa uma amostra uniforme de tamanho fixo das linhas já pontuadas
+BATCH_SAMPLE_ROWS = int(os.environ.get('BIGMART_SAMPLE_ROWS', 100_000))
+BATCH_SAMPLE_COLUMNS = ['Item_Visibility', 'Item_Outlet_Sales', 'Item_Type', 'Item_Identifier',
+                        'Outlet_Identifier', 'Outlet_Type']
+
+
+class SalesBatch:
+    """
+    Lote de arquivos enviados na mesma sessão, apenas com acréscimos. Para os arquivos já
+    pontuados, mantém os agregados parciais mesclados (ver `partial_sales_aggregates`) e uma
+    amostra uniforme de até `sample_rows` linhas (reservoir sampling) para o gráfico de dispersão,
+    de forma que acrescentar um arquivo custe proporcionalmente ao tamanho dele, e não ao total
+    de linhas do lote.
+
+    Cada arquivo é um dicionário com 'key' (chave no `upload_store`), 'name', 'n_rows',
+    'n_invalid', 'summary' / 'missing_columns' (da validação) e 'scored'.
+
+    Os agregados e a amostra ('partial' / 'sample') não fazem parte do pickle do lote: o
+    `BatchStore` os grava à parte, sob `data_key`, e os lê apenas no primeiro acesso.
+    """
+
+    def __init__(self, sample_rows=BATCH_SAMPLE_ROWS, seed=None):
+        self.id = os.urandom(8).hex()
+        self.sample_rows = sample_rows
+        self.files = []
+        self.n_seen = 0
+        self._rng = np.random.default_rng(seed)
+        self._data = None
+        self._data_loader = None
+        self._data_changed = False
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.update(_data=None, _data_loader=None, _data_changed=False)
+        return state
+
+    def add_file(self, key, name, report):
+        """
+        Acrescenta um arquivo validado ao lote. Retorna False se o arquivo já faz parte dele.
+        """
+        if any(file['key'] == key for file in self.files):
+            return False
+        self.files.append({
+            'key': key, 'name': name, 'n_rows': report['n_rows'], 'n_invalid': report['n_invalid'],
+            'summary': report['summary'], 'missing_columns': report['missing_columns'], 'scored': False,
+        })
+        return True
+
+    def pending(self):
+        return [file for file in self.files if not file['scored']]
+
+    def scored(self):
+        return [file for file in self.files if file['scored']]
+
+    @property
+    def version(self):
+        """
+        Identifica o conteúdo pontuado do lote (chave dos resultados concatenados em cache).
+        """
+        return f"{self.id}:{len(self.scored())}"
+
+    @property
+    def data_key(self):
+        """
+        Identifica os agregados e a amostra do lote: muda a cada arquivo com linhas pontuadas.
+        """
+        return f"{self.id}:{self.n_seen}"
+
+    @property
+    def fingerprint(self):
+        """
+        Hash do conteúdo dos arquivos pontuados, na ordem em que entraram no lote. Não depende da
+        sessão: o mesmo conjunto de arquivos enviado de novo (ex.: após recarregar a página) tem
+        a mesma impressão digital.
+        """
+        digests = [file['key'].rsplit(':', 1)[-1] for file in self.scored()]
+        return hashlib.sha256('\n'.join(digests).encode('ascii')).hexdigest()
+
+    @property
+    def n_rows(self):
+        """
+        Número de linhas pontuadas (válidas) no lote.
+        """
+        return self.n_seen
+
+    def set_data_loader(self, loader):
+        """
+        Define a função que lê os agregados e a amostra do lote, chamada apenas no primeiro acesso.
+        """
+        if self._data is None:
+            self._data_loader = loader
+
+    def _stored_data(self):
+        if self._data is None and self._data_loader is not None:
+            self._data, self._data_loader = self._data_loader(), None
+        return self._data or {'partial': None, 'sample': None}
+
+    @property
+    def partial(self):
+        return self._stored_data()['partial']
+
+    @property
+    def sample(self):
+        """
+        Amostra da dispersão: {coluna: valores}, com as colunas de texto como `pd.Categorical`.
+        """
+        return self._stored_data()['sample']
+
+    def pop_data_changes(self):
+        """
+        Retorna os agregados e a amostra se mudaram desde a última chamada (para serem gravados
+        pelo `BatchStore`), ou None.
+        """
+        if not self._data_changed:
+            return None
+        self._data_changed = False
+        return self._data
+
+    def add_scored(self, key, partial=None, result_df=None):
+        """
+        Registra a pontuação do arquivo `key`: mescla os agregados parciais e atualiza a amostra
+        com as linhas de `result_df` (ambos None quando nenhuma linha do arquivo é válida).
+        Retorna False se o arquivo não pertence ao lote ou já foi pontuado.
+        """
+        file = next((file for file in self.files if file['key'] == key), None)
+        if file is None or file['scored']:
+            return False
+        if partial is not None:
+            merged = partial if self.partial is None else merge_sales_aggregates(self.partial, partial)
+            self._data = {'partial': merged, 'sample': self._updated_sample(result_df)}
+            self._data_changed = True
+        file['scored'] = True
+        return True
+
+    def _updated_sample(self, rows):
+        # Reservoir sampling (algoritmo R) vetorizado: a i-ésima linha vista ocupa uma posição
+        # livre enquanto a amostra não está cheia; depois substitui uma posição sorteada com
+        # probabilidade sample_rows / (i + 1). Apenas as linhas escolhidas são convertidas
+        positions = self.n_seen + np.arange(len(rows))
+        draws = self._rng.integers(0, positions + 1)
+        fill = positions < self.sample_rows
+        take = np.flatnonzero(fill | (draws < self.sample_rows))
+        slots = np.where(fill[take], positions[take], draws[take])
+
+        size = min(self.sample_rows, self.n_seen + len(rows))
+        selected = rows.iloc[take]
+        sample = {}
+        for column in BATCH_SAMPLE_COLUMNS:
+            values = selected[column]
+            values = values.to_numpy(dtype=object) if isinstance(values.dtype, pd.CategoricalDtype) else values.to_numpy()
+            current = self.sample[column] if self.sample is not None else np.empty(0, dtype=values.dtype)
+            current = np.asarray(current, dtype=object) if isinstance(current, pd.Categorical) else current
+            if len(current) < size:
+                current = np.concatenate([current, np.empty(size - len(current), dtype=current.dtype)])
+            current[slots] = values
+            # Colunas de texto guardadas como códigos: o pickle da amostra não percorre objetos Python
+            sample[column] = pd.Categorical(current) if current.dtype == object else current
+        self.n_seen += len(rows)
+        return sample
+
+    def sample_frame(self):
+        """
+        Amostra uniforme das linhas pontuadas, com as colunas do gráfico de dispersão.
+        """
+        return pd.DataFrame(self.sample if self.sample is not None else {column: [] for column in BATCH_SAMPLE_COLUMNS})
+
+    def aggregates(self):
+        return finalize_sales_aggregates(self.partial)
+
+    def validation_report(self):
+        """
+        Relatório de validação combinado dos arquivos pontuados, no formato de `validation_summary`.
+        """
+        files = self.scored()
+        # Arquivos sem problemas têm resumo vazio (de tipo object), que converteria as contagens em float
+        summaries = [file['summary'] for file in files if len(file['summary'])]
+        summary = pd.concat(summaries, ignore_index=True) if summaries else pd.DataFrame(
+            columns=['Coluna', 'Problema', 'Linhas', 'Exemplos'])
+        summary = summary.groupby(['Coluna', 'Problema'], sort=False, as_index=False).agg(
+            {'Linhas': 'sum', 'Exemplos': 'first'}).astype({'Linhas': int})
+        return {
+            'n_rows': sum(file['n_rows'] for file in files),
+            'n_invalid': sum(file['n_invalid'] for file in files),
+            # Colunas ausentes em apenas alguns arquivos aparecem na tabela de problemas
+            'missing_columns': files[0]['missing_columns'] if files and all(file['missing_columns'] for file in files) else [],
+            'summary': summary,
+        }
+
+
+# Tempo durante o qual os agregados e a amostra substituídos continuam legíveis, para as leituras
+# sem transação (ver BatchStore.get) que ainda apontam para eles
+BATCH_DATA_GRACE_SECONDS = 60
+
+
+class BatchStore:
+    """
+    Armazena o lote (`SalesBatch`) de cada sessão. Com `disk_cache`, os lotes são compartilhados
+    entre processos (o job de previsões roda fora do worker que recebe os uploads) e as alterações
+    são feitas em transação; sem ele, ficam na memória do processo.
+
+    O lote guarda apenas a lista de arquivos e alguns contadores; os agregados e a amostra da
+    dispersão ficam em uma chave própria, lida somente por quem os usa (gráficos e novas
+    pontuações), de modo que a paginação das tabelas e o download leiam só alguns KB.
+    """
+
+    def __init__(self, ttl=UPLOAD_STORE_TTL_SECONDS, disk_cache=None):
+        self.ttl = ttl
+        self.disk_cache = disk_cache
+        self._lock = threading.Lock()
+        self._items = {}
+
+    @staticmethod
+    def make_key(session_id):
+        return f"{session_id}:batch"
+
+    @staticmethod
+    def _data_key(key, batch):
+        return f"{key}:data:{batch.data_key}"
+
+    def _get(self, key):
+        if self.disk_cache is not None:
+            return self.disk_cache.get(key)
+        batch, expires = self._items.get(key, (None, 0.0))
+        return batch if expires > time.monotonic() else None
+
+    def _set(self, key, batch):
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, batch, expire=self.ttl)
+        else:
+            self._items[key] = (batch, time.monotonic() + self.ttl)
+
+    def _expire(self, key, seconds):
+        if self.disk_cache is not None:
+            self.disk_cache.touch(key, expire=seconds)
+            return
+        now = time.monotonic()
+        if key in self._items:
+            self._items[key] = (self._items[key][0], min(self._items[key][1], now + seconds))
+        # Na memória, os itens vencidos são descartados aqui
+        self._items = {item_key: item for item_key, item in self._items.items() if item[1] > now}
+
+    def _delete(self, key):
+        if self.disk_cache is not None:
+            self.disk_cache.delete(key)
+        else:
+            self._items.pop(key, None)
+
+    @contextmanager
+    def _transaction(self):
+        if self.disk_cache is not None:
+            with self.disk_cache.transact():
+                yield
+        else:
+            with self._lock:
+                yield
+
+    def _with_data_loader(self, key, batch):
+        if batch is not None:
+            data_key = self._data_key(key, batch)
+            batch.set_data_loader(lambda: self._get(data_key))
+        return batch
+
+    def get(self, key):
+        """
+        Retorna o lote armazenado sob `key`, ou None se não existe ou expirou. A leitura não
+        toma a transação e não inclui os agregados nem a amostra, lidos só se forem acessados.
+        """
+        return self._with_data_loader(key, self._get(key))
+
+    def update(self, key, func, batch_id=None):
+        """
+        Aplica `func(lote)` e grava o lote, como uma única operação de leitura e escrita. Cria um
+        lote novo se não houver nenhum; com `batch_id`, altera apenas esse lote (retorna
+        (None, None) se ele foi substituído ou expirou). Retorna (lote, resultado de `func`).
+        """
+        with self._transaction():
+            batch = self._with_data_loader(key, self._get(key))
+            if batch_id is not None and (batch is None or batch.id != batch_id):
+                return None, None
+            if batch is None:
+                batch = SalesBatch()
+            previous_data_key = self._data_key(key, batch)
+            result = func(batch)
+            data = batch.pop_data_changes()
+            if data is not None:
+                # Os novos dados são gravados antes do lote que aponta para eles; os anteriores
+                # expiram após BATCH_DATA_GRACE_SECONDS
+                self._set(self._data_key(key, batch), data)
+                self._expire(previous_data_key, BATCH_DATA_GRACE_SECONDS)
+            self._set(key, batch)
+            return batch, result
+
+    def clear(self, key):
+        with self._transaction():
+            batch = self._get(key)
+            if batch is not None:
+                self._delete(self._data_key(key, batch))
+            self._delete(key)
+
+
+batch_store = BatchStore(disk_cache=open_disk_cache('batches'))
+
+
+def _stored_frames(keys):
+    """
+    Quadros armazenados no `upload_store` sob `keys`, ou None se algum deles expirou.
+    """
+    frames = [upload_store.get(key) for key in keys]
+    return None if any(frame is None for frame in frames) else frames
+
+
+def batch_predictions_head(batch, n_rows=TABLE_PAGE_SIZE):
+    """
+    Primeiras `n_rows` previsões do lote, lidas apenas dos primeiros arquivos necessários.
+    """
+    frames, total = [], 0
+    for file in batch.scored():
+        frame = upload_store.get(f"{file['key']}:predictions")
+        if frame is None:
+            return None
+        if len(frame):
+            frames.append(frame.iloc[:n_rows - total].copy(deep=False))
+            total += len(frames[-1])
+        if total >= n_rows:
+            break
+    return concat_frames(frames) if frames else None
+
+
+def batch_predictions(batch):
+    """
+    Retorna (chave, previsões de todos os arquivos pontuados do lote). A concatenação só é feita
+    sob demanda (paginação com filtro/ordenação e download) e fica no `upload_store` sob uma chave
+    que muda a cada arquivo pontuado.
+    """
+    results_key = f"{batch.id}:predictions:{batch.version}"
+    frame = upload_store.get(results_key)
+    if frame is None:
+        frames = _stored_frames([f"{file['key']}:predictions" for file in batch.scored()])
+        if not frames:
+            return results_key, None
+        frame = concat_frames([frame.copy(deep=False) for frame in frames])
+        upload_store.put(results_key, frame)
+    return results_key, frame
+
+
+def batch_validation_errors(batch):
+    """
+    Retorna (chave, linhas descartadas de todos os arquivos pontuados, com o nome do arquivo),
+    ou (chave, None) se nenhum arquivo tem linhas inválidas ou os detalhes expiraram.
+    """
+    errors_key = f"{batch.id}:errors:{batch.version}"
+    frame = upload_store.get(errors_key)
+    if frame is None:
+        files = [file for file in batch.scored() if file['n_invalid'] and not file['missing_columns']]
+        frames = _stored_frames([f"{file['key']}:errors" for file in files])
+        if not frames:
+            return errors_key, None
+        frames = [frame.copy(deep=False) for frame in frames]
+        for file, errors in zip(files, frames):
+            errors.insert(0, 'Arquivo', file['name'])
+        frame = concat_frames(frames)
+        upload_store.put(errors_key, frame)
+    return errors_key, frame
+
+
+
+@timed_stage('figure_sales_by_category')
+def plotly_sales_by_category(aggregates):
+    import plotly.graph_objects as go
+
+    # Ordenando os tipos de produto por vendas totais (no máximo uma fatia por tipo)
+    order = np.argsort(-aggregates['sales_by_type'], kind='stable')
+    item_types = aggregates['item_types'][order]
 
-    # Garantir que todas as categorias têm cores atribuídas
-    assign_colors(df, 'Item_Type')
+    # Calculando as porcentagens de vendas
+    sales_percentage = aggregates['sales_by_type'][order] / aggregates['total_sales'] * 100
 
     # Criando um gráfico de anel (donut chart)
     fig = go.Figure()
 
     fig.add_trace(go.Pie(
-        labels=df['Item_Type'],
-        values=df['Sales Percentage'],
+        labels=item_types,
+        values=sales_percentage,
         hole=0.7,  # Tamanho do buraco no meio do anel
         textinfo='percent',
         insidetextfont=dict(color='black'),  # Cor do texto dentro das fatias
-        marker=dict(colors=[CATEGORY_COLORS[cat] for cat in df['Item_Type']],
+        marker=dict(colors=[aggregates['color_map'][cat] for cat in item_types],
                     line=dict(color='white', width=2)),  # Aplicar cores consistentes
     ))
 
@@ -304,18 +3140,24 @@ def plotly_sales_by_category(df):
 
 
 # @title
-def plotly_sales_over_outlet(df, top_n=10):
-    # Agrupar as features com a previsão
-    sales_by_category = df.groupby(['Item_Type', 'Outlet_Identifier', 'Outlet_Size', 'Outlet_Location_Type']).agg(
-        {'Item_Outlet_Sales': 'sum', 'Item_Type': 'count'}).rename(columns={'Item_Type': 'Item_Count'}).reset_index()
-
-    # Garantir que todas as categorias têm cores atribuídas
-    assign_colors(sales_by_category, 'Item_Type')
-
-    # Calcular a soma total de vendas para cada tipo de produto
-    total_sales_by_item = sales_by_category.groupby('Item_Type')['Item_Outlet_Sales'].sum().reset_index()
-    total_sales_by_item = total_sales_by_item.sort_values(by='Item_Outlet_Sales', ascending=False)
-    sorted_item_types = total_sales_by_item['Item_Type'].tolist()
+@timed_stage('figure_sales_over_outlet')
+def plotly_sales_over_outlet(aggregates, top_n=10):
+    import plotly.express as px
+
+    # Tabela (loja, tipo de produto) a partir dos agregados: no máximo n_lojas x n_tipos linhas
+    n_outlets, n_types = aggregates['outlet_type_sales'].shape
+    sales_by_category = pd.DataFrame({
+        'Item_Type': np.tile(aggregates['item_types'], n_outlets),
+        'Outlet_Identifier': np.repeat(aggregates['outlets'], n_types),
+        'Outlet_Size': np.repeat(aggregates['outlet_size'], n_types),
+        'Outlet_Location_Type': np.repeat(aggregates['outlet_location'], n_types),
+        'Item_Outlet_Sales': aggregates['outlet_type_sales'].ravel(),
+        'Item_Count': aggregates['outlet_type_count'].ravel(),
+    })
+    sales_by_category = sales_by_category[sales_by_category['Item_Count'] > 0]
+
+    # Tipos de produto ordenados pela soma total de vendas
+    sorted_item_types = aggregates['item_types'][np.argsort(-aggregates['sales_by_type'], kind='stable')].tolist()
 
     # Filtrar para incluir apenas os top 10 produtos mais vendidos em cada tipo de loja
     top_items = (
@@ -348,11 +3190,8 @@ def plotly_sales_over_outlet(df, top_n=10):
     )
 
     # Adicionar anotações de Outlet_Size e Outlet_Location_Type no eixo X
-    outlet_info_map = sales_by_category[['Outlet_Identifier', 'Outlet_Size', 'Outlet_Location_Type']].drop_duplicates().set_index('Outlet_Identifier').to_dict()
-
-    for outlet_id, info in outlet_info_map['Outlet_Size'].items():
-        location_type = outlet_info_map['Outlet_Location_Type'][outlet_id]
-        size = info
+    for outlet_id, size, location_type in zip(aggregates['outlets'], aggregates['outlet_size'],
+                                              aggregates['outlet_location']):
         fig_bar_grouped.add_annotation(
             x=outlet_id,  # Posição no eixo X (identificador da loja)
             y=-0.12,  # Coloca a anotação mais baixa
@@ -393,27 +3232,34 @@ def plotly_sales_over_outlet(df, top_n=10):
     return fig_bar_grouped
 
 # @title
-def plot_visibility_boxplot(df):
+@timed_stage('figure_visibility_boxplot')
+def plot_visibility_boxplot(aggregates):
     """
     Cria um gráfico de boxplot mostrando a distribuição da visibilidade por tipo de produto,
-    com cores consistentes atribuídas a cada categoria.
+    com cores consistentes atribuídas a cada categoria. As caixas e os outliers são desenhados a
+    partir de 'visibility_stats' dos agregados finalizados (ver `finalize_sales_aggregates`).
     """
-    # Garantir que todas as categorias têm cores atribuídas
-    color_map = assign_colors(df, 'Item_Type')
-
-    # Criar o Boxplot para distribuição de visibilidade por tipo de produto
-    fig_box = px.box(
-        df,
-        x='Item_Type',
-        y='Item_Visibility',
-        color='Item_Type',
-        title="Distribuição de Visibilidade por Tipo de Produto",
-        labels={"Item_Visibility": "Visibilidade do Produto", "Item_Type": "Tipo de Produto"},
-        color_discrete_map=color_map  # Aplicar cores consistentes da paleta
-    )
+    import plotly.graph_objects as go
+
+    color_map = aggregates['color_map']
+
+    # Criar o Boxplot para distribuição de visibilidade por tipo de produto: estatísticas
+    # pré-calculadas, com os outliers passados como amostra (y em 2D: uma lista por caixa)
+    fig_box = go.Figure()
+    for item_type, stats in zip(aggregates['item_types'], aggregates['visibility_stats']):
+        outliers = {'y': [stats['outliers']], 'boxpoints': 'outliers'} if len(stats['outliers']) else {}
+        fig_box.add_trace(go.Box(
+            name=item_type,
+            x=[item_type],
+            q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+            lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']],
+            marker_color=color_map[item_type],
+            **outliers,
+        ))
 
     # Atualizar o layout do gráfico
     fig_box.update_layout(
+        title="Distribuição de Visibilidade por Tipo de Produto",
         xaxis_title="Tipo de Produto",
         yaxis_title="Visibilidade do Produto",
         title_x=0.5,
@@ -430,21 +3276,35 @@ def plot_visibility_boxplot(df):
 
 
 # @title
-def plotly_visibility_vs_sales(df):
+@timed_stage('figure_visibility_vs_sales')
+def plotly_visibility_vs_sales(df, aggregates):
     """
     Plota a relação entre a visibilidade dos itens na loja e as vendas totais usando um gráfico de matriz de bolhas.
-    As cores das bolhas representam o tipo de item ('Item_Type'), usando a função `assign_colors`.
+    As cores das bolhas representam o tipo de item ('Item_Type'), usando o mapa de cores dos agregados.
+    `df` não é modificado.
     """
-
-    # Calcular a porcentagem de vendas
-    df['Sales Percentage'] = df['Item_Outlet_Sales'] / df['Item_Outlet_Sales'].sum() * 100
-
-    # Garantir que todas as categorias de 'Item_Type' têm cores atribuídas
-    color_map = assign_colors(df, 'Item_Type')
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    # Apenas as colunas usadas pelo gráfico, sem copiar os dados e sem alterar `df`; a porcentagem
+    # de vendas é a única coluna nova
+    sales = df['Item_Outlet_Sales']
+    plot_data = pd.DataFrame({
+        'Item_Visibility': df['Item_Visibility'],
+        'Item_Outlet_Sales': sales,
+        'Sales Percentage': sales.to_numpy() / aggregates['total_sales'] * 100,
+        'Item_Type': df['Item_Type'],
+        'Item_Identifier': df['Item_Identifier'],
+        'Outlet_Identifier': df['Outlet_Identifier'],
+        'Outlet_Type': df['Outlet_Type'],
+    }, copy=False)
+
+    # Mapa de cores de 'Item_Type' já calculado nos agregados
+    color_map = aggregates['color_map']
 
     # Criar o Bubble Matrix Plot
     fig_matrix_bubble = px.scatter(
-        df,
+        plot_data,
         x='Item_Visibility',
         y='Item_Outlet_Sales',
         size='Sales Percentage',  # Tamanho da bolha representando a porcentagem de vendas
@@ -459,11 +3319,12 @@ def plotly_visibility_vs_sales(df):
         category_orders={"Outlet_Type": ['Grocery_Store', 'Supermarket_Type1', 'Supermarket_Type2', 'Supermarket_Type3']}  # Ordem dos gráficos
     )
 
-    # Adicionar uma linha de tendência hipotética
+    # Adicionar uma linha de tendência hipotética (uma reta: bastam os dois extremos da visibilidade)
+    visibility_range = np.array([aggregates['visibility_min'], aggregates['visibility_max']])
     fig_matrix_bubble.add_trace(
         go.Scatter(
-            x=df['Item_Visibility'],
-            y=df['Item_Visibility'] * df['Item_Outlet_Sales'].mean(),  # Linha de tendência hipotética
+            x=visibility_range,
+            y=visibility_range * aggregates['mean_sales'],  # Linha de tendência hipotética
             mode="lines",
             name="Linha de Tendência Hipotética",
             line=dict(color="red", dash="dot")
@@ -489,4 +3350,213 @@ def plotly_visibility_vs_sales(df):
         height=900  # Aumenta a altura do gráfico
     )
 
-    return fig_matrix_bubble
\ No newline at end of file
+    return fig_matrix_bubble
+
+
+# Cache das figuras do lote, já serializadas em JSON
+FIGURE_CACHE_MEMORY_BYTES = 64 << 20
+FIGURE_CACHE_DISK_BYTES = int(os.environ.get('BIGMART_FIGURE_CACHE_MB', 512)) << 20
+
+
+def orjson_available():
+    """
+    Indica se o pacote opcional `orjson` (serialização JSON rápida das figuras) pode ser importado.
+    """
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _orjson_compatible(value):
+    """
+    Converte, na estrutura de `fig.to_plotly_json()`, apenas o que o orjson não serializa
+    diretamente: arrays numéricos seguem como estão (serializados em C), arrays de texto ou de
+    objetos viram listas.
+    """
+    if isinstance(value, dict):
+        return {key: _orjson_compatible(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_orjson_compatible(item) for item in value]
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'f' and value.dtype.itemsize < 8:
+            # Mesmo texto que o plotly gera (float32 ampliado para float64, e não o repr curto do float32)
+            return value.astype(np.float64)
+        return np.ascontiguousarray(value) if value.dtype.kind in 'biuf' else value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def figure_to_json(fig):
+    """
+    Serializa a figura plotly `fig` em JSON (bytes). Com o orjson, os arrays numéricos são
+    gravados sem passar por listas Python (o motor 'orjson' do plotly.io percorre cada valor);
+    sem ele, usa o codificador padrão do plotly.
+    """
+    if orjson_available():
+        import orjson
+        return orjson.dumps(_orjson_compatible(fig.to_plotly_json()), option=orjson.OPT_SERIALIZE_NUMPY)
+    import plotly.io as pio
+    return pio.to_json(fig, validate=False, engine='json').encode()
+
+
+class FigureCache:
+    """
+    Figuras serializadas (bytes JSON) indexadas por (impressão digital do lote, versão do modelo,
+    gráfico): ver `make_key`. Uma exibição repetida, inclusive de outra sessão ou após recarregar
+    a página, não monta nem serializa a figura de novo; os bytes são entregues como estão pela
+    rota /figures (a chave depende só do conteúdo, então o navegador também pode guardá-los).
+
+    A camada em memória é um LRU limitado a `max_bytes`; `disk_cache` (um `diskcache.Cache`,
+    limitado pelo próprio `size_limit`) é a segunda camada, compartilhada entre os workers e os
+    jobs em segundo plano.
+    """
+
+    def __init__(self, max_bytes=FIGURE_CACHE_MEMORY_BYTES, disk_cache=None):
+        self.max_bytes = max_bytes
+        self.disk_cache = disk_cache
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._total_bytes = 0
+
+    key_prefix = 'figure:'
+
+    @classmethod
+    def make_key(cls, fingerprint, model_digest, chart_id):
+        # O hash do código invalida as figuras montadas por uma versão anterior dos gráficos
+        return f"{cls.key_prefix}{CODE_DIGEST}:{fingerprint}:{model_digest}:{chart_id}"
+
+    def _insert(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._total_bytes -= len(self._items.pop(key))
+            self._items[key] = data
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes:
+                self._total_bytes -= len(self._items.pop(next(iter(self._items))))
+
+    def get(self, key):
+        """
+        Retorna a figura serializada sob `key`, ou None.
+        """
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                return data
+        if self.disk_cache is None:
+            return None
+        data = self.disk_cache.get(key)
+        if data is not None:
+            self._insert(key, data)
+        return data
+
+    def put(self, key, data):
+        self._insert(key, data)
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, data)
+
+    def clear(self):
+        """
+        Remove todas as figuras. No cache em disco, apenas as chaves de figuras são apagadas.
+        """
+        with self._lock:
+            self._items.clear()
+            self._total_bytes = 0
+        if self.disk_cache is not None:
+            for key in list(self.disk_cache.iterkeys()):
+                if isinstance(key, str) and key.startswith(self.key_prefix):
+                    self.disk_cache.delete(key)
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+
+figure_cache = FigureCache(disk_cache=open_disk_cache('figures', size_limit=FIGURE_CACHE_DISK_BYTES,
+                                                      eviction_policy='least-recently-used'))
+
+# Gráficos do lote, na ordem da página: id -> função(lote, agregados) que monta a figura
+BATCH_FIGURES = {
+    'sales_by_category': lambda batch, aggregates: plotly_sales_by_category(aggregates),
+    'sales_over_outlet': lambda batch, aggregates: plotly_sales_over_outlet(aggregates),
+    'visibility_boxplot': lambda batch, aggregates: plot_visibility_boxplot(aggregates),
+    'visibility_vs_sales': lambda batch, aggregates: plotly_visibility_vs_sales(batch.sample_frame(), aggregates),
+}
+
+
+def batch_figure_keys(batch, model=DEFAULT_MODEL):
+    """
+    Retorna {gráfico: chave no `figure_cache`} para os gráficos do lote (na ordem de
+    BATCH_FIGURES), montando e serializando apenas os que ainda não estão no cache. Os agregados
+    só são finalizados se algum gráfico faltar.
+    """
+    model_digest = model_registry.digest(get_model_spec(model).path)
+    fingerprint = batch.fingerprint
+    aggregates, keys = None, {}
+    for chart_id, build in BATCH_FIGURES.items():
+        key = keys[chart_id] = figure_cache.make_key(fingerprint, model_digest, chart_id)
+        hit = figure_cache.get(key) is not None
+        metrics.inc('bigmart_figure_cache_requests_total', chart=chart_id, result='hit' if hit else 'miss')
+        if not hit:
+            if aggregates is None:
+                aggregates = batch.aggregates()
+            figure_cache.put(key, figure_to_json(build(batch, aggregates)))
+    return keys
+
+
+@timed_stage('figure_sweep')
+def plotly_sweep(sweep, user_input):
+    """
+    Gráficos da simulação de cenários (ver `sweep_predictions`): mapa de calor das vendas previstas
+    por preço x visibilidade na loja escolhida e curvas de resposta ao preço de cada loja simulada.
+    Retorna (mapa de calor, curvas).
+    """
+    import plotly.graph_objects as go
+
+    # A grade tem `points` x `points` cenários (linha = visibilidade, coluna = preço); o formato vem
+    # do número de cenários, e não dos valores distintos, que se repetem em faixas degeneradas
+    grid = sweep[sweep['Scenario'] == 'grid']
+    points = math.isqrt(len(grid))
+    mrp_values = grid['Item_MRP'].to_numpy()[:points]
+    visibility_values = grid['Item_Visibility'].to_numpy()[::points]
+    sales = grid['Item_Outlet_Sales'].to_numpy().reshape(points, points)
+
+    fig_heatmap = go.Figure(go.Heatmap(
+        x=mrp_values,
+        y=visibility_values,
+        z=sales,
+        colorscale='Oranges',
+        colorbar=dict(title='Vendas'),
+        hovertemplate='Item_MRP: %{x:.2f}<br>Item_Visibility: %{y:.3f}<br>Vendas: %{z:,.2f}<extra></extra>',
+    ))
+    # Marca o cenário informado pelo usuário
+    if user_input.get('Item_MRP') is not None and user_input.get('Item_Visibility') is not None:
+        fig_heatmap.add_trace(go.Scatter(
+            x=[user_input['Item_MRP']], y=[user_input['Item_Visibility']], mode='markers',
+            marker=dict(symbol='x', size=12, color='black'), name='Cenário atual', showlegend=False,
+        ))
+    fig_heatmap.update_layout(
+        title=f"Vendas previstas por preço e visibilidade ({user_input['Outlet_Identifier']})",
+        xaxis_title='Item_MRP', yaxis_title='Item_Visibility', template='plotly_white',
+    )
+
+    curves = sweep[sweep['Scenario'] == 'curve']
+    fig_curves = go.Figure()
+    for outlet, group in curves.groupby('Outlet_Identifier', observed=True, sort=True):
+        fig_curves.add_trace(go.Scatter(
+            x=group['Item_MRP'], y=group['Item_Outlet_Sales'], mode='lines', name=outlet,
+            line=dict(width=3 if outlet == user_input['Outlet_Identifier'] else 1.5),
+        ))
+    fig_curves.update_layout(
+        title=f"Curva de resposta ao preço (visibilidade {curves['Item_Visibility'].iloc[0]:.3f})",
+        xaxis_title='Item_MRP', yaxis_title='Vendas previstas', template='plotly_white',
+    )
+    return fig_heatmap, fig_curves
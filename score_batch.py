@@ -0,0 +1,129 @@
+"""
+Pontuação em lote pela linha de comando (sem o navegador), com o mesmo pipeline do dashboard.
+
+Lê um ou mais arquivos .csv, .csv.gz ou .parquet em blocos (as mesmas regras de leitura dos
+uploads), valida as linhas (validate_upload), pontua as linhas válidas em um pool de processos
+e grava as previsões de forma incremental: a memória fica limitada a algumas fatias, qualquer
+que seja o tamanho dos arquivos.
+
+O arquivo gerado é idêntico ao "Baixar Previsões" do dashboard depois de enviar os mesmos
+arquivos, na mesma ordem, em um lote: as linhas válidas de cada arquivo são pontuadas nas
+mesmas fatias de BIGMART_SHARD_ROWS linhas usadas pelo dashboard, e a previsão de cada linha
+não depende das demais linhas da fatia.
+
+Uso:
+    python score_batch.py entrada.csv [outra.parquet ...] -o previsoes.csv[.gz|.parquet]
+                          [--workers N] [--chunk-rows 100000] [--max-pending N]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from helpers import (BATCH_SHARD_ROWS, DOWNLOAD_FORMATS, UPLOAD_CHUNK_ROWS, concat_frames, iter_download_frames,
+                     iter_file_chunks, score_output_shard, validate_upload, warm_up_model)
+
+
+def output_format(path):
+    """
+    Formato de saída (ver DOWNLOAD_FORMATS) a partir da extensão do arquivo.
+    """
+    for file_format in sorted(DOWNLOAD_FORMATS, key=len, reverse=True):
+        if path.endswith(f".{file_format}"):
+            return file_format
+    raise ValueError(f"Extensão de saída desconhecida: {path} (use {', '.join(DOWNLOAD_FORMATS)})")
+
+
+def iter_valid_shards(path, stats, chunk_rows=UPLOAD_CHUNK_ROWS, shard_rows=BATCH_SHARD_ROWS):
+    """
+    Linhas válidas de `path` em fatias de `shard_rows` linhas, contadas a partir do início do
+    arquivo como no dashboard (a última fatia pode ser menor). Acumula em `stats` o total de
+    linhas lidas e de linhas inválidas.
+    """
+    buffer, buffered = [], 0
+    for chunk in iter_file_chunks(path, chunk_rows):
+        report = validate_upload(chunk)
+        stats['rows'] += report['n_rows']
+        stats['invalid'] += report['n_invalid']
+        if report['n_invalid']:
+            chunk = chunk[report['valid']]
+        buffer.append(chunk.reset_index(drop=True))
+        buffered += len(chunk)
+        while buffered >= shard_rows:
+            frame = concat_frames(buffer)
+            yield frame.iloc[:shard_rows]
+            buffer = [frame.iloc[shard_rows:].reset_index(drop=True)]
+            buffered -= shard_rows
+    if buffered:
+        yield concat_frames(buffer)
+
+
+def iter_scored(paths, pool, stats, max_pending, **shard_options):
+    """
+    Submete as fatias de todos os arquivos ao pool e gera as previsões na ordem original,
+    com no máximo `max_pending` fatias em processamento ou aguardando gravação.
+    """
+    pending = deque()
+    for path in paths:
+        for shard in iter_valid_shards(path, stats, **shard_options):
+            pending.append(pool.submit(score_output_shard, shard))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Previsões de vendas em lote, com o mesmo pipeline do dashboard.')
+    parser.add_argument('inputs', nargs='+', help='arquivos .csv, .csv.gz ou .parquet, pontuados na ordem dada')
+    parser.add_argument('-o', '--output', required=True, help='arquivo de saída (.csv, .csv.gz ou .parquet)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processos de pontuação')
+    parser.add_argument('--chunk-rows', type=int, default=UPLOAD_CHUNK_ROWS, help='linhas por bloco de leitura')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='fatias em processamento ao mesmo tempo (padrão: 2 x workers)')
+    args = parser.parse_args(argv)
+
+    try:
+        file_format = output_format(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+    missing = [path for path in args.inputs if not os.path.exists(path)]
+    if missing:
+        parser.error(f"arquivos não encontrados: {', '.join(missing)}")
+
+    stats = {'rows': 0, 'invalid': 0, 'scored': 0}
+    start = time.perf_counter()
+    temporary = f"{args.output}.tmp"
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=warm_up_model) as pool:
+        scored = iter_scored(args.inputs, pool, stats, args.max_pending or 2 * args.workers, chunk_rows=args.chunk_rows)
+
+        def counted(frames):
+            for frame in frames:
+                stats['scored'] += len(frame)
+                yield frame
+
+        # Grava em um arquivo temporário, renomeado apenas no fim: uma execução interrompida
+        # não deixa um arquivo de previsões incompleto no lugar do anterior
+        try:
+            with open(temporary, 'wb') as output:
+                for data in iter_download_frames(counted(scored), file_format):
+                    output.write(data)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        os.replace(temporary, args.output)
+
+    elapsed = time.perf_counter() - start
+    print(f"{stats['rows']:,} linhas lidas de {len(args.inputs)} arquivo(s), {stats['invalid']:,} inválidas; "
+          f"{stats['scored']:,} previsões gravadas em {args.output} em {elapsed:.2f} s "
+          f"({stats['rows'] / max(elapsed, 1e-9):,.0f} linhas/s, {args.workers} worker(s))")
+    if not stats['scored']:
+        print("Aviso: nenhuma linha válida para pontuar.", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
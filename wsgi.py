@@ -0,0 +1,10 @@
+"""
+Ponto de entrada WSGI para produção.
+
+Exemplo (configurações em gunicorn.conf.py, ajustáveis por variáveis de ambiente):
+    gunicorn -c gunicorn.conf.py wsgi:server
+"""
+from app import app
+
+# Aplicação Flask subjacente ao Dash, usada pelo servidor WSGI
+server = app.server